@@ -4,22 +4,32 @@ Finds property managers / asset managers at target buildings using:
   1. Apollo.io API (primary — best for B2B contact data)
   2. Website scraping (fallback)
   3. Manual entry via CLI
+
+Apollo results are cached per organization, so a company seeded in several
+cities costs one search; people are matched to each city locally.
+
+Buildings are enriched by a pool of worker threads. Apollo calls share a
+token bucket sized to the API quota, website fetches are spaced per domain,
+and contacts / building statuses are written in batches.
 """
 
-import httpx
 from bs4 import BeautifulSoup
+from concurrent.futures import ThreadPoolExecutor
 import re
+import threading
 import time
 import json
 import sys
 import os
 sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
-from utils.db import get_buildings, insert_contact, update_building
+from utils.db import iter_buildings, insert_contact, upsert_contacts, transition_many, print_payload_stats
 from utils.config import TARGET_CITIES
-
-HEADERS = {
-    'User-Agent': 'Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36'
-}
+from utils import http_cache
+from utils.http import get_http_client, print_stats
+from utils.email_extract import fetch_emails
+from utils.ratelimit import HostThrottle, TokenBucket
+from utils.kvcache import DiskCache
+from utils.pipeline import iter_completed
 
 TARGET_TITLES = [
     'property manager', 'asset manager', 'head of leasing',
@@ -30,14 +40,38 @@ TARGET_TITLES = [
 ]
 
 APOLLO_API_KEY = os.getenv('APOLLO_API_KEY', '')
+APOLLO_REQUESTS_PER_MINUTE = int(os.getenv('APOLLO_REQUESTS_PER_MINUTE', '50'))
 
+WORKERS = 4
+WRITE_BATCH_SIZE = 25  # buildings per bulk write
 
-def search_apollo(company: str, city: str = None) -> list:
-    """Search Apollo.io for contacts at a company with relevant titles."""
-    if not APOLLO_API_KEY:
-        return []
+# Shared by all workers: Apollo quota, and one request per second per website domain
+apollo_bucket = TokenBucket(APOLLO_REQUESTS_PER_MINUTE / 60, capacity=5)
+site_throttle = HostThrottle(default_interval=1.0)
 
-    contacts = []
+# Apollo results are memoized per organization; people are filtered by city locally
+APOLLO_ORG_PAGE_SIZE = 25
+APOLLO_CACHE_TTL_DAYS = int(os.getenv('APOLLO_CACHE_TTL_DAYS', '30'))
+APOLLO_PERSON_FIELDS = ('first_name', 'last_name', 'title', 'email', 'linkedin_url', 'city', 'state')
+ORG_SUFFIXES = {'and', 'inc', 'llc', 'ltd', 'lp', 'llp', 'plc', 'co', 'corp', 'corporation', 'company'}
+
+apollo_cache = DiskCache('apollo_orgs', ttl=APOLLO_CACHE_TTL_DAYS * 86400, max_entries=5000)
+apollo_stats = {'api_calls': 0}
+_stats_lock = threading.Lock()
+_inflight = {}  # org key -> [lock, workers using it]; dropped when the last one is done
+_inflight_lock = threading.Lock()
+
+
+def normalize_org(name: str) -> str:
+    """Cache key form of an organization name: 'Greystar Real Estate Partners, LLC' → 'greystar real estate partners'."""
+    words = re.sub(r'[^a-z0-9 ]+', ' ', name.lower().replace('&', ' and ')).split()
+    while words and words[-1] in ORG_SUFFIXES:
+        words.pop()
+    return ' '.join(words)
+
+
+def query_apollo(company: str, location: str = None, per_page: int = 10) -> list:
+    """One Apollo people search. Returns the raw people (trimmed), or None on error."""
     url = 'https://api.apollo.io/v1/mixed_people/search'
 
     headers = {
@@ -54,76 +88,161 @@ def search_apollo(company: str, city: str = None) -> list:
             'Regional Manager', 'VP of Operations', 'General Manager',
             'Director of Leasing', 'Vice President Leasing',
         ],
-        'per_page': 10,
+        'per_page': per_page,
         'page': 1,
     }
 
-    if city:
-        payload['person_locations'] = [city]
+    if location:
+        payload['person_locations'] = [location]
 
     try:
-        resp = httpx.post(url, json=payload, headers=headers, timeout=15)
+        for attempt in range(3):
+            apollo_bucket.acquire()
+            resp = get_http_client().post(url, json=payload, headers=headers, timeout=15)
+            if resp.status_code != 429:
+                break
+            retry_after = float(resp.headers.get('retry-after') or 2 ** (attempt + 1))
+            print(f"  Apollo rate limited, retrying in {retry_after:.0f}s")
+            time.sleep(retry_after)
+
         if resp.status_code != 200:
             print(f"  Apollo API error: {resp.status_code}")
-            return []
+            return None
 
-        data = resp.json()
-        people = data.get('people', [])
-
-        for person in people:
-            contact = {
-                'full_name': f"{person.get('first_name', '')} {person.get('last_name', '')}".strip(),
-                'title': person.get('title', ''),
-                'email': person.get('email', ''),
-                'linkedin_url': person.get('linkedin_url', ''),
-                'source': 'apollo',
-            }
-            if contact['full_name'] and contact['full_name'] != ' ':
-                contacts.append(contact)
-
-        print(f"  Apollo: found {len(contacts)} contacts")
+        with _stats_lock:
+            apollo_stats['api_calls'] += 1
+        return [
+            {field: person.get(field) for field in APOLLO_PERSON_FIELDS}
+            for person in resp.json().get('people', [])
+        ]
 
     except Exception as e:
         print(f"  Apollo error: {e}")
+        return None
+
 
+def fetch_org_people(company: str, location: str = None) -> list:
+    """Apollo people for an organization (optionally one location), memoized on disk.
+
+    Concurrent workers asking for the same organization share one API call.
+    """
+    key = normalize_org(company)
+    per_page = 10
+    if location:
+        key = f"{key}|{location.strip().lower()}"
+    else:
+        per_page = APOLLO_ORG_PAGE_SIZE
+
+    with _inflight_lock:
+        entry = _inflight.setdefault(key, [threading.Lock(), 0])
+        entry[1] += 1
+
+    try:
+        with entry[0]:
+            people = apollo_cache.get(key)
+            if people is not None:
+                return people
+            people = query_apollo(company, location, per_page)
+            if people is None:
+                return []
+            apollo_cache.set(key, people)
+            return people
+    finally:
+        with _inflight_lock:
+            entry[1] -= 1
+            if not entry[1]:
+                del _inflight[key]
+
+
+# Buildings carry postal abbreviations; Apollo people carry full state names
+US_STATES = {
+    'AL': 'Alabama', 'AK': 'Alaska', 'AZ': 'Arizona', 'AR': 'Arkansas', 'CA': 'California', 'CO': 'Colorado',
+    'CT': 'Connecticut', 'DE': 'Delaware', 'DC': 'District of Columbia', 'FL': 'Florida', 'GA': 'Georgia',
+    'HI': 'Hawaii', 'ID': 'Idaho', 'IL': 'Illinois', 'IN': 'Indiana', 'IA': 'Iowa', 'KS': 'Kansas',
+    'KY': 'Kentucky', 'LA': 'Louisiana', 'ME': 'Maine', 'MD': 'Maryland', 'MA': 'Massachusetts',
+    'MI': 'Michigan', 'MN': 'Minnesota', 'MS': 'Mississippi', 'MO': 'Missouri', 'MT': 'Montana',
+    'NE': 'Nebraska', 'NV': 'Nevada', 'NH': 'New Hampshire', 'NJ': 'New Jersey', 'NM': 'New Mexico',
+    'NY': 'New York', 'NC': 'North Carolina', 'ND': 'North Dakota', 'OH': 'Ohio', 'OK': 'Oklahoma',
+    'OR': 'Oregon', 'PA': 'Pennsylvania', 'RI': 'Rhode Island', 'SC': 'South Carolina', 'SD': 'South Dakota',
+    'TN': 'Tennessee', 'TX': 'Texas', 'UT': 'Utah', 'VT': 'Vermont', 'VA': 'Virginia', 'WA': 'Washington',
+    'WV': 'West Virginia', 'WI': 'Wisconsin', 'WY': 'Wyoming',
+}
+
+
+def in_city(person: dict, city: str, state: str = None) -> bool:
+    """Whether an Apollo person is based in `city` (and, when both sides know it, `state`)."""
+    if city.strip().lower() != (person.get('city') or '').strip().lower():
+        return False
+    person_state = (person.get('state') or '').strip().lower()
+    if not state or not person_state:
+        return True
+    state = state.strip()
+    return person_state in {state.lower(), US_STATES.get(state.upper(), '').lower()}
+
+
+def search_apollo(company: str, city: str = None, state: str = None) -> list:
+    """Search Apollo.io for contacts at a company with relevant titles.
+
+    The organization is fetched once (org-wide) and cached; people are then
+    filtered by city locally. Only when the org-wide page was truncated and
+    nobody matched locally do we spend a city-scoped query.
+    """
+    if not APOLLO_API_KEY:
+        return []
+
+    people = fetch_org_people(company)
+    if city:
+        local = [person for person in people if in_city(person, city, state)]
+        if not local and len(people) >= APOLLO_ORG_PAGE_SIZE:
+            local = fetch_org_people(company, city)
+        people = local
+
+    contacts = []
+    for person in people:
+        contact = {
+            'full_name': f"{person.get('first_name') or ''} {person.get('last_name') or ''}".strip(),
+            'title': person.get('title') or '',
+            'email': person.get('email') or '',
+            'linkedin_url': person.get('linkedin_url') or '',
+            'source': 'apollo',
+        }
+        if contact['full_name'] and contact['full_name'] != ' ':
+            contacts.append(contact)
+
+    print(f"  Apollo: found {len(contacts)} contacts")
     return contacts
 
 
+def print_apollo_stats():
+    lookups = apollo_cache.stats['hits'] + apollo_cache.stats['misses']
+    if not lookups:
+        return
+    print(f"Apollo cache: {apollo_cache.stats['hits']}/{lookups} hits ({apollo_cache.hit_rate():.0%}), "
+          f"{apollo_stats['api_calls']} API calls, ~{apollo_cache.stats['hits']} credits saved")
+
+
+def set_cache_mode(mode: str):
+    """Apply --no-cache / --refresh to both the HTTP cache and the Apollo cache."""
+    http_cache.set_cache_mode(mode)
+    apollo_cache.mode = mode
+
+
 def extract_emails_from_website(url: str) -> list:
     """Scrape a website for email addresses."""
     contacts = []
     try:
-        resp = httpx.get(url, headers=HEADERS, timeout=10, follow_redirects=True)
-        if resp.status_code != 200:
+        status, filtered, _ = fetch_emails(get_http_client(), url, throttle=site_throttle, timeout=10)
+        if status != 200:
             return []
 
-        # Extract emails
-        emails = re.findall(r'[a-zA-Z0-9._%+-]+@[a-zA-Z0-9.-]+\.[a-zA-Z]{2,}', resp.text)
-        filtered = set()
-        for email in emails:
-            email = email.lower()
-            if not any(skip in email for skip in [
-                'example.com', 'sentry', 'webpack', '.png', '.jpg',
-                'wixpress', 'schema.org', 'googleapis', 'cloudflare',
-                'noreply', 'no-reply', '@w3.org',
-            ]):
-                filtered.add(email)
-
         # Also try common contact pages
         base = url.rstrip('/')
         for path in ['/contact', '/about', '/team', '/leadership']:
             try:
-                page_resp = httpx.get(f"{base}{path}", headers=HEADERS, timeout=8, follow_redirects=True)
-                if page_resp.status_code == 200:
-                    page_emails = re.findall(r'[a-zA-Z0-9._%+-]+@[a-zA-Z0-9.-]+\.[a-zA-Z]{2,}', page_resp.text)
-                    for email in page_emails:
-                        email = email.lower()
-                        if not any(skip in email for skip in [
-                            'example.com', 'sentry', 'webpack', '.png',
-                            'wixpress', 'schema.org', '@w3.org',
-                        ]):
-                            filtered.add(email)
-                time.sleep(1)
+                status, page_emails, _ = fetch_emails(get_http_client(), f"{base}{path}",
+                                                      throttle=site_throttle, timeout=8)
+                if status == 200:
+                    filtered |= page_emails
             except Exception:
                 continue
 
@@ -171,67 +290,98 @@ def add_manual_contact(building_id: str):
         return None
 
 
-def run(limit: int = 50, use_apollo: bool = True):
-    """Enrich all 'new' buildings with contacts."""
-    buildings = get_buildings(status='new', limit=limit)
+def enrich_building(building: dict, use_apollo: bool = True) -> list:
+    """Find contacts for one building (Apollo first, website fallback). Safe to call from workers."""
+    name = building['name']
+    company = building.get('company') or name
+    property_url = building.get('property_url')
 
-    if not buildings:
-        print("No new buildings to enrich. Run seed or lead_sourcer first.")
+    contacts = []
+
+    # Method 1: Apollo.io (best for B2B)
+    if use_apollo:
+        contacts.extend(search_apollo(company, building['city'], building.get('state')))
+
+    # Method 2: Website scraping (fallback)
+    if not contacts and property_url:
+        contacts.extend(extract_emails_from_website(property_url))
+
+    for contact in contacts:
+        contact['building_id'] = building['id']
+        contact['status'] = 'new'
+    return contacts
+
+
+def save_batch(results: list) -> int:
+    """Bulk write contacts for a batch of (building, contacts) results and mark buildings enriched.
+
+    Saved contacts get their row 'id' filled in.
+    """
+    contacts = [contact for _, found in results for contact in found]
+    try:
+        ids = upsert_contacts(contacts)
+    except Exception as e:
+        print(f"  Error saving contacts: {e}")
         return 0
 
+    saved_by_building = {}
+    for contact, contact_id in zip(contacts, ids):
+        if contact_id:
+            contact['id'] = contact_id
+            saved_by_building[contact['building_id']] = saved_by_building.get(contact['building_id'], 0) + 1
+
+    enriched = [building['id'] for building, _ in results if saved_by_building.get(building['id'])]
+    if enriched:
+        transition_many('buildings', enriched, 'new', 'enriched')
+
+    for building, found in results:
+        saved = saved_by_building.get(building['id'], 0)
+        print(f"  {'✓' if saved else '·'} {building['name']} ({building['city']}): {saved} contacts")
+    return sum(saved_by_building.values())
+
+
+def run(limit: int = 50, use_apollo: bool = True, workers: int = WORKERS):
+    """Enrich 'new' buildings with contacts (up to `limit`; None = all), streaming them from the database."""
     if use_apollo and not APOLLO_API_KEY:
         print("Note: APOLLO_API_KEY not set. Using website scraping only.")
         print("For better results, get a free key at app.apollo.io\n")
         use_apollo = False
 
-    print(f"Enriching {len(buildings)} buildings...\n")
+    print(f"Enriching {'all' if limit is None else f'up to {limit}'} new buildings with {workers} workers...\n")
+    started = time.monotonic()
+    processed = 0
     total_contacts = 0
+    pending = []
 
-    for building in buildings:
-        name = building['name']
-        city = building['city']
-        company = building.get('company') or name
-        property_url = building.get('property_url')
-
-        print(f"\n{'─'*40}")
-        print(f"Building: {name} ({city})")
-
-        contacts = []
-
-        # Method 1: Apollo.io (best for B2B)
-        if use_apollo:
-            apollo_contacts = search_apollo(company, city)
-            contacts.extend(apollo_contacts)
-            time.sleep(1)  # Rate limit
-
-        # Method 2: Website scraping (fallback)
-        if not contacts and property_url:
-            print(f"  Scraping website: {property_url}")
-            website_contacts = extract_emails_from_website(property_url)
-            contacts.extend(website_contacts)
-            print(f"  Website: found {len(website_contacts)} emails")
-
-        # Save contacts
-        saved = 0
-        for contact in contacts:
-            contact['building_id'] = building['id']
-            contact['status'] = 'new'
+    buildings = iter_buildings(status='new', limit=limit, prefetch=True, projection='enrich')
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        for building, future in iter_completed(pool, lambda b: enrich_building(b, use_apollo), buildings,
+                                               max_pending=2 * workers):
+            processed += 1
             try:
-                insert_contact(contact)
-                saved += 1
+                pending.append((building, future.result()))
             except Exception as e:
-                print(f"  Error saving contact: {e}")
+                print(f"  ✗ {building['name']}: {e}")
 
-        # Update building status
-        new_status = 'enriched' if saved > 0 else 'new'
-        update_building(building['id'], {'status': new_status})
+            if len(pending) >= WRITE_BATCH_SIZE:
+                total_contacts += save_batch(pending)
+                pending = []
 
-        print(f"  Total saved: {saved} contacts")
-        total_contacts += saved
-        time.sleep(1)
+    if pending:
+        total_contacts += save_batch(pending)
+
+    if not processed:
+        print("No new buildings to enrich. Run seed or lead_sourcer first.")
+        return 0
 
+    elapsed = time.monotonic() - started
     print(f"\n{'='*50}")
     print(f"Total contacts found: {total_contacts}")
+    print(f"Time: {elapsed:.1f}s ({processed / max(elapsed, 1e-6):.2f} buildings/s)")
+    http_cache.print_summary()
+    print_apollo_stats()
+    print_stats()
+    print_payload_stats()
     print(f"{'='*50}")
     return total_contacts
 
@@ -239,9 +389,13 @@ def run(limit: int = 50, use_apollo: bool = True):
 if __name__ == '__main__':
     import argparse
     parser = argparse.ArgumentParser(description='Contact Enricher — find people at buildings')
-    parser.add_argument('--limit', type=int, default=50, help='Max buildings to enrich')
+    parser.add_argument('--limit', type=int, default=50, help='Max buildings to enrich (0 = all)')
     parser.add_argument('--no-apollo', action='store_true', help='Skip Apollo, use website scraping only')
+    parser.add_argument('--workers', type=int, default=WORKERS, help='Concurrent enrichment workers')
+    parser.add_argument('--no-cache', action='store_true', help='Bypass the HTTP and Apollo caches')
+    parser.add_argument('--refresh', action='store_true', help='Revalidate cached pages, re-query Apollo')
     args = parser.parse_args()
+    set_cache_mode('off' if args.no_cache else 'refresh' if args.refresh else 'use')
 
     # Reload env since we might be running standalone
     from dotenv import load_dotenv
@@ -249,4 +403,4 @@ if __name__ == '__main__':
     load_dotenv(Path(__file__).parent.parent / '.env')
     APOLLO_API_KEY = os.getenv('APOLLO_API_KEY', '')
 
-    run(limit=args.limit, use_apollo=not args.no_apollo)
+    run(limit=args.limit or None, use_apollo=not args.no_apollo, workers=args.workers)
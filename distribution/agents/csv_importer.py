@@ -11,13 +11,21 @@ Expected columns (flexible — matches common exports):
   - LinkedIn URL / linkedin_url / Person Linkedin Url
   - City / city
   - State / state
+
+Files are streamed in fixed-size chunks: each chunk is deduped in memory and
+written with one bulk upsert for companies and one for contacts, so memory
+stays bounded no matter how large the export is.
 """
 
 import csv
+import glob
+import time
 import sys
 import os
 sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
-from utils.db import insert_building, insert_contact, get_db
+from utils.db import upsert_buildings, upsert_contacts
+
+CHUNK_SIZE = 1000  # rows parsed and bulk-written together
 
 
 def normalize_headers(headers: list) -> dict:
@@ -50,101 +58,191 @@ def normalize_headers(headers: list) -> dict:
     return mapping
 
 
-def run(csv_path: str, default_city: str = 'New York', default_state: str = 'NY'):
-    """Import contacts from a CSV file."""
+def parse_row(row: list, mapping: dict, default_city: str, default_state: str) -> dict:
+    """Turn one CSV row into a contact dict (plus its company/city/state). Returns None for blank rows."""
+    if not row or all(not cell.strip() for cell in row):
+        return None
+
+    def cell(field, default=''):
+        if field in mapping and mapping[field] < len(row):
+            return row[mapping[field]].strip()
+        return default
+
+    # Extract name
+    full_name = ''
+    if 'full_name' in mapping:
+        full_name = cell('full_name')
+    elif 'first_name' in mapping:
+        full_name = f"{cell('first_name')} {cell('last_name')}".strip()
+
+    return {
+        'full_name': full_name or 'Unknown',
+        'email': cell('email').lower(),
+        'title': cell('title'),
+        'company': cell('company'),
+        'linkedin_url': cell('linkedin_url'),
+        'city': cell('city', default_city),
+        'state': cell('state', default_state),
+    }
+
+
+def save_parsed(parsed: list) -> list:
+    """Bulk write parsed rows: one upsert for their companies, one for the contacts.
+
+    Returns contact ids in input order (None where the row wasn't saved).
+    """
+    buildings = {}
+    for p in parsed:
+        if p['company']:
+            buildings.setdefault((p['company'], p['city']), {
+                'name': p['company'],
+                'company': p['company'],
+                'city': p['city'],
+                'state': p['state'],
+                'source': 'csv_import',
+                'status': 'enriched',
+            })
+
+    keys = list(buildings)
+    building_ids = dict(zip(keys, upsert_buildings([buildings[k] for k in keys]))) if keys else {}
+
+    contacts = []
+    for p in parsed:
+        contact_data = {
+            'full_name': p['full_name'],
+            'email': p['email'] or None,
+            'title': p['title'] or None,
+            'linkedin_url': p['linkedin_url'] or None,
+            'source': 'csv_import',
+            'status': 'new',
+            'building_id': building_ids.get((p['company'], p['city'])),
+        }
+        contacts.append(contact_data)
+
+    return upsert_contacts(contacts)
+
+
+def expand_paths(patterns) -> list:
+    """Expand file paths / glob patterns into a sorted, de-duplicated list of files."""
+    if isinstance(patterns, str):
+        patterns = [patterns]
+    paths = []
+    for pattern in patterns:
+        matches = sorted(glob.glob(pattern)) if glob.has_magic(pattern) else [pattern]
+        for path in matches:
+            if path not in paths:
+                paths.append(path)
+    return paths
+
+
+def dedupe_chunk(parsed: list) -> list:
+    """Drop rows whose email (or LinkedIn URL, for email-less rows) already appeared in the chunk."""
+    seen = set()
+    unique = []
+    for p in parsed:
+        key = ('email', p['email']) if p['email'] else ('linkedin', p['linkedin_url'])
+        if key in seen:
+            continue
+        seen.add(key)
+        unique.append(p)
+    return unique
+
+
+def iter_chunks(reader, mapping: dict, default_city: str, default_state: str, chunk_size: int, stats: dict):
+    """Yield lists of up to chunk_size parsed, importable rows from a csv reader."""
+    chunk = []
+    for row in reader:
+        p = parse_row(row, mapping, default_city, default_state)
+        if p is None:
+            continue
+        stats['rows'] += 1
+
+        if not p['email'] and not p['linkedin_url']:
+            stats['skipped'] += 1
+            continue
+
+        chunk.append(p)
+        if len(chunk) >= chunk_size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def import_file(csv_path: str, default_city: str, default_state: str, chunk_size: int, stats: dict) -> int:
+    """Stream one CSV into the database chunk by chunk. Updates stats in place."""
     if not os.path.exists(csv_path):
         print(f"File not found: {csv_path}")
         return 0
 
-    with open(csv_path, 'r', encoding='utf-8-sig') as f:
+    with open(csv_path, 'r', encoding='utf-8-sig', newline='') as f:
         reader = csv.reader(f)
-        headers = next(reader)
+        headers = next(reader, None)
+        if not headers:
+            print(f"Empty file: {csv_path}")
+            return 0
         mapping = normalize_headers(headers)
 
-        print(f"Detected columns: {list(mapping.keys())}")
-        print(f"Total columns in CSV: {len(headers)}\n")
+        print(f"\n{csv_path}")
+        print(f"  Detected columns: {list(mapping.keys())}")
 
         if 'email' not in mapping and 'full_name' not in mapping and 'first_name' not in mapping:
-            print("ERROR: CSV must have at least an email or name column.")
-            print(f"Found headers: {headers}")
+            print("  ERROR: CSV must have at least an email or name column.")
+            print(f"  Found headers: {headers}")
             return 0
 
         imported = 0
-        skipped = 0
-
-        for row in reader:
-            if not row or all(not cell.strip() for cell in row):
-                continue
-
-            # Extract name
-            full_name = ''
-            if 'full_name' in mapping:
-                full_name = row[mapping['full_name']].strip()
-            elif 'first_name' in mapping:
-                first = row[mapping['first_name']].strip() if 'first_name' in mapping else ''
-                last = row[mapping['last_name']].strip() if 'last_name' in mapping else ''
-                full_name = f"{first} {last}".strip()
-
-            if not full_name:
-                full_name = 'Unknown'
-
-            email = row[mapping['email']].strip().lower() if 'email' in mapping and mapping['email'] < len(row) else ''
-            title = row[mapping['title']].strip() if 'title' in mapping and mapping['title'] < len(row) else ''
-            company = row[mapping['company']].strip() if 'company' in mapping and mapping['company'] < len(row) else ''
-            linkedin = row[mapping['linkedin_url']].strip() if 'linkedin_url' in mapping and mapping['linkedin_url'] < len(row) else ''
-            city = row[mapping['city']].strip() if 'city' in mapping and mapping['city'] < len(row) else default_city
-            state = row[mapping['state']].strip() if 'state' in mapping and mapping['state'] < len(row) else default_state
-
-            if not email and not linkedin:
-                print(f"  Skipping {full_name} — no email or LinkedIn")
-                skipped += 1
-                continue
-
-            # Find or create the building/company
-            building_id = None
-            if company:
-                building = insert_building({
-                    'name': company,
-                    'company': company,
-                    'city': city,
-                    'state': state,
-                    'source': 'csv_import',
-                    'status': 'enriched',
-                })
-                building_id = building.get('id')
-
-            # Insert contact
+        for chunk in iter_chunks(reader, mapping, default_city, default_state, chunk_size, stats):
+            unique = dedupe_chunk(chunk)
+            stats['duplicates'] += len(chunk) - len(unique)
+
             try:
-                contact_data = {
-                    'full_name': full_name,
-                    'email': email or None,
-                    'title': title or None,
-                    'linkedin_url': linkedin or None,
-                    'source': 'csv_import',
-                    'status': 'new',
-                }
-                if building_id:
-                    contact_data['building_id'] = building_id
-
-                insert_contact(contact_data)
-                imported += 1
-                print(f"  ✓ {full_name} — {title} @ {company} ({email})")
+                ids = save_parsed(unique)
+                saved = sum(1 for contact_id in ids if contact_id)
             except Exception as e:
-                print(f"  ✗ {full_name}: {e}")
-                skipped += 1
+                print(f"  ✗ Chunk failed: {e}")
+                saved = 0
+            imported += saved
+            stats['imported'] += saved
+            stats['skipped'] += len(unique) - saved
+
+            elapsed = max(time.monotonic() - stats['started'], 1e-6)
+            print(f"  {stats['rows']:,} rows read, {stats['imported']:,} imported, "
+                  f"{stats['skipped']:,} skipped, {stats['duplicates']:,} duplicates "
+                  f"({stats['rows'] / elapsed:,.0f} rows/s)")
+
+    return imported
+
+
+def run(csv_paths, default_city: str = 'New York', default_state: str = 'NY', chunk_size: int = CHUNK_SIZE):
+    """Import contacts from one or more CSV files (paths or glob patterns)."""
+    paths = expand_paths(csv_paths)
+    if not paths:
+        print(f"No files match: {csv_paths}")
+        return 0
+
+    stats = {'rows': 0, 'imported': 0, 'skipped': 0, 'duplicates': 0, 'started': time.monotonic()}
+    print(f"Importing {len(paths)} file(s) in chunks of {chunk_size:,} rows")
+
+    for path in paths:
+        import_file(path, default_city, default_state, chunk_size, stats)
 
-        print(f"\n{'='*50}")
-        print(f"Imported: {imported}")
-        print(f"Skipped:  {skipped}")
-        print(f"{'='*50}")
-        return imported
+    elapsed = time.monotonic() - stats['started']
+    print(f"\n{'='*50}")
+    print(f"Imported:   {stats['imported']:,}")
+    print(f"Skipped:    {stats['skipped']:,}")
+    print(f"Duplicates: {stats['duplicates']:,}")
+    print(f"Time:       {elapsed:.1f}s ({stats['rows'] / max(elapsed, 1e-6):,.0f} rows/s)")
+    print(f"{'='*50}")
+    return stats['imported']
 
 
 if __name__ == '__main__':
     import argparse
     parser = argparse.ArgumentParser(description='Import contacts from CSV')
-    parser.add_argument('csv_file', help='Path to CSV file')
+    parser.add_argument('csv_files', nargs='+', help='CSV files or glob patterns (e.g. "exports/*.csv")')
     parser.add_argument('--city', default='New York', help='Default city if not in CSV')
     parser.add_argument('--state', default='NY', help='Default state if not in CSV')
+    parser.add_argument('--chunk-size', type=int, default=CHUNK_SIZE, help='Rows per bulk write')
     args = parser.parse_args()
-    run(args.csv_file, args.city, args.state)
+    run(args.csv_files, args.city, args.state, chunk_size=args.chunk_size)
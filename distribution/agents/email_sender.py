@@ -2,17 +2,25 @@
 Agent 4 — Email Sender
 Sends queued outreach emails via Resend.
 Enforces daily send limit with warm-up ramp. Tracks delivery status.
+
+Queued emails go out in Resend batch calls, paced by a token bucket that
+spreads the day's warm-up limit over SEND_SPREAD_MINUTES (by default one
+email per SEND_INTERVAL_SECONDS), and their status changes are committed in
+bulk.
 """
 
 import sys
 import os
 import time
+import hashlib
 from datetime import datetime, timezone, date
 sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
 import resend
-from utils.db import get_outreach_emails, update_outreach_email, update_contact, get_db
-from utils.config import RESEND_API_KEY, FROM_EMAIL, DAILY_EMAIL_LIMIT
+from utils.db import iter_outreach_emails, transition_many, get_db, print_payload_stats, PAGE_SIZE
+from utils.config import RESEND_API_KEY, FROM_EMAIL, DAILY_EMAIL_LIMIT, SEND_SPREAD_MINUTES
+from utils.ratelimit import TokenBucket
+from agents.followup_manager import next_followup_at
 
 # Domain created on 2026-02-22 — warm up gradually
 DOMAIN_BIRTH = date(2026, 2, 22)
@@ -25,6 +33,13 @@ WARMUP_SCHEDULE = [
 ]
 # After week 3: use full DAILY_EMAIL_LIMIT
 
+# Resend accepts up to 100 emails per batch call
+BATCH_SIZE = 100
+# Tries for a batch call whose outcome is unknown (timeout, 5xx) or rate-limited (429), always with the same idempotency key
+SEND_ATTEMPTS = 3
+# Average gap between sends when SEND_SPREAD_MINUTES isn't set
+SEND_INTERVAL_SECONDS = 30
+
 
 def get_warmup_limit() -> int:
     """Get the current daily send limit based on domain age."""
@@ -46,10 +61,11 @@ def get_today_send_count() -> int:
     return result.count or 0
 
 
-def send_email(to: str, subject: str, body: str) -> dict:
-    """Send an email via Resend."""
-    resend.api_key = RESEND_API_KEY
+def build_message(to: str, subject: str, body: str, message_id: str = None) -> dict:
+    """Resend send params for one outreach email (plain text body → HTML with signature).
 
+    `message_id` (the row's own Message-ID) lets the inbox poller thread replies back to it.
+    """
     # Convert plain text body to simple HTML
     html_body = body.replace('\n\n', '</p><p>').replace('\n', '<br>')
 
@@ -79,22 +95,149 @@ def send_email(to: str, subject: str, body: str) -> dict:
 
     html_body = f'<div style="font-family: sans-serif; font-size: 14px; color: #333; line-height: 1.6;"><p>{html_body}</p>{signature}</div>'
 
-    response = resend.Emails.send({
+    message = {
         'from': FROM_EMAIL,
         'to': [to],
         'subject': subject,
         'html': html_body,
-    })
-    return response
+    }
+    if message_id:
+        message['headers'] = {'Message-ID': message_id}
+    return message
+
+
+def send_email(to: str, subject: str, body: str) -> dict:
+    """Send an email via Resend."""
+    resend.api_key = RESEND_API_KEY
+    return resend.Emails.send(build_message(to, subject, body))
+
+
+def send_batch(messages: list, idempotency_key: str = None) -> list:
+    """Send up to BATCH_SIZE emails in one Resend batch call. Returns Resend ids in order."""
+    resend.api_key = RESEND_API_KEY
+    response = resend.Batch.send(messages, {'idempotency_key': idempotency_key} if idempotency_key else None)
+    data = response.get('data', []) if isinstance(response, dict) else response
+    return [item.get('id') for item in data or []]
+
+
+def send_pacer(limit: int):
+    """Token bucket for today's sends: the warm-up limit spread over SEND_SPREAD_MINUTES.
+
+    Unset, the spread is `limit` sends SEND_INTERVAL_SECONDS apart. Bursts are
+    capped at one batch, so pacing comes only from this policy. Returns None
+    only when pacing is turned off (SEND_SPREAD_MINUTES=0).
+    """
+    spread_minutes = SEND_SPREAD_MINUTES
+    if spread_minutes is None:
+        spread_minutes = limit * SEND_INTERVAL_SECONDS / 60
+    if spread_minutes <= 0:
+        return None
+    rate = limit / (spread_minutes * 60)
+    return TokenBucket(rate=rate, capacity=max(1, min(BATCH_SIZE, int(rate * 60))))
+
+
+def is_bounce(error: Exception) -> bool:
+    error_str = str(error).lower()
+    return 'bounce' in error_str or 'invalid' in error_str
+
+
+def idempotency_key(email_ids: list) -> str:
+    """Resend Idempotency-Key for sending exactly these outreach rows (honoured for 24 hours)."""
+    return 'outreach-' + hashlib.sha256(','.join(sorted(email_ids)).encode()).hexdigest()[:40]
+
+
+def batch_rejected(error: Exception) -> bool:
+    """Whether Resend answered and refused the batch outright, so none of it was sent.
+
+    Timeouts, connection errors and 5xx leave the outcome unknown. 409 is an
+    idempotency conflict: the same key is already in flight or done. 429 means
+    try later; sending the batch one by one would only hit the same limit.
+    """
+    try:
+        code = int(getattr(error, 'code', None))
+    except (TypeError, ValueError):
+        return False
+    return 400 <= code < 500 and code not in (409, 429)
+
+
+def deliver(batch: list) -> tuple:
+    """Send a batch of (email, contact) pairs. Returns (sent, bounced) pairs.
+
+    One Resend batch call normally; if Resend rejects the batch, fall back to
+    single sends so one bad address doesn't sink the rest. Every call carries
+    an idempotency key, and a call whose outcome is unknown is only retried
+    with the same key, so a batch Resend already accepted is never sent twice.
+    Raises if the outcome is still unknown after SEND_ATTEMPTS; the emails
+    stay queued.
+    """
+    messages = [
+        build_message(contact['email'], email['subject'], email['body'], email.get('message_id'))
+        for email, contact in batch
+    ]
+    key = idempotency_key([email['id'] for email, _ in batch])
+    for attempt in range(SEND_ATTEMPTS):
+        try:
+            send_batch(messages, key)
+            return batch, []
+        except Exception as e:
+            if batch_rejected(e):
+                print(f"  Batch rejected ({e}), sending individually")
+                break
+            if attempt == SEND_ATTEMPTS - 1:
+                raise
+            print(f"  Batch send not confirmed ({e}), retrying with the same idempotency key")
+            time.sleep(2 ** attempt)
+
+    sent, bounced = [], []
+    for (email, contact), message in zip(batch, messages):
+        try:
+            resend.Emails.send(message, {'idempotency_key': idempotency_key([email['id']])})
+            sent.append((email, contact))
+        except Exception as e:
+            if is_bounce(e):
+                bounced.append((email, contact))
+            else:
+                print(f"  ✗ Error sending to {contact['email']}: {e}")
+    return sent, bounced
+
+
+def record_delivery(sent: list, bounced: list):
+    """Commit a delivered batch's (email, contact) pairs in bulk: emails sent / bounced, contacts emailed.
+
+    Each contact's next_action_at is set to when their next follow-up is due,
+    in the same guarded transition, so a contact a reply has moved on is left alone.
+    """
+    now = datetime.now(timezone.utc)
+    if sent:
+        transition_many('outreach_emails', [email['id'] for email, _ in sent], 'queued', 'sent',
+                        {'sent_at': now.isoformat()})
+        by_due = {}
+        for email, contact in sent:
+            by_due.setdefault(next_followup_at(email.get('sequence_number') or 1, now), []).append(contact['id'])
+        for due, ids in by_due.items():
+            # Follow-ups go to contacts who are already 'emailed'; never undo a reply
+            transition_many('contacts', ids, ['new', 'emailed'], 'emailed',
+                            {'next_action_at': due.isoformat() if due else None})
+    if bounced:
+        transition_many('outreach_emails', [email['id'] for email, _ in bounced], 'queued', 'bounced')
+
+    for _, contact in sent:
+        print(f"  ✓ Sent to {contact.get('full_name', 'Unknown')} <{contact['email']}>")
+    for _, contact in bounced:
+        print(f"  ✗ Bounced: {contact['email']}")
 
 
 def queue_drafts():
-    """Move all draft emails to queued status."""
-    drafts = get_outreach_emails(status='draft')
+    """Move all draft emails to queued status, streaming the drafts a page at a time."""
     count = 0
-    for draft in drafts:
-        update_outreach_email(draft['id'], {'status': 'queued'})
-        count += 1
+    ids = []
+    for draft in iter_outreach_emails(status='draft', prefetch=True, projection='ids'):
+        ids.append(draft['id'])
+        if len(ids) >= PAGE_SIZE:
+            count += transition_many('outreach_emails', ids, 'draft', 'queued')
+            ids = []
+    if ids:
+        count += transition_many('outreach_emails', ids, 'draft', 'queued')
     print(f"Queued {count} draft emails for sending")
     return count
 
@@ -125,7 +268,7 @@ def run(auto_queue: bool = False, dry_run: bool = False):
     print(f"Remaining capacity: {remaining}\n")
 
     # Get queued emails
-    queued = get_outreach_emails(status='queued', limit=remaining)
+    queued = list(iter_outreach_emails(status='queued', limit=remaining, projection='send'))
 
     if not queued:
         print("No queued emails to send. Run outreach_writer first, then queue them.")
@@ -133,6 +276,8 @@ def run(auto_queue: bool = False, dry_run: bool = False):
 
     print(f"Sending {len(queued)} emails...\n")
     sent_count = 0
+    no_address = []
+    sendable = []
 
     for email in queued:
         contact = email.get('contacts') or {}
@@ -141,7 +286,7 @@ def run(auto_queue: bool = False, dry_run: bool = False):
 
         if not to_email:
             print(f"  ✗ No email for contact, skipping")
-            update_outreach_email(email['id'], {'status': 'draft'})
+            no_address.append(email['id'])
             continue
 
         if dry_run:
@@ -149,33 +294,36 @@ def run(auto_queue: bool = False, dry_run: bool = False):
             sent_count += 1
             continue
 
-        try:
-            result = send_email(to_email, email['subject'], email['body'])
-            now = datetime.now(timezone.utc).isoformat()
-
-            update_outreach_email(email['id'], {
-                'status': 'sent',
-                'sent_at': now,
-            })
-            update_contact(contact['id'], {'status': 'emailed'})
+        sendable.append((email, contact))
 
-            print(f"  ✓ Sent to {contact_name} <{to_email}>")
-            sent_count += 1
+    if no_address:
+        transition_many('outreach_emails', no_address, 'queued', 'draft')
 
-            # Rate limit: don't blast
-            time.sleep(3)
+    pacer = send_pacer(warmup_limit)
+    batch_size = pacer.capacity if pacer else BATCH_SIZE
+    started = time.monotonic()
 
+    for i in range(0, len(sendable), batch_size):
+        batch = sendable[i:i + batch_size]
+        if pacer:
+            pacer.acquire(len(batch))
+        try:
+            sent, bounced = deliver(batch)
         except Exception as e:
-            error_str = str(e)
-            if 'bounce' in error_str.lower() or 'invalid' in error_str.lower():
-                update_outreach_email(email['id'], {'status': 'bounced'})
-                print(f"  ✗ Bounced: {to_email}")
-            else:
-                print(f"  ✗ Error sending to {to_email}: {e}")
+            print(f"  ✗ Stopping: couldn't confirm a batch of {len(batch)} was sent ({e}); it stays queued")
+            break
+
+        record_delivery(sent, bounced)
+        sent_count += len(sent)
+
+    if sendable:
+        elapsed = time.monotonic() - started
+        print(f"\n  {sent_count} sent in {elapsed:.1f}s")
 
     print(f"\n{'='*50}")
     action = "Would have sent" if dry_run else "Sent"
     print(f"{action} {sent_count} emails")
+    print_payload_stats()
     print(f"{'='*50}")
     return sent_count
 
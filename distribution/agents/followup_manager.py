@@ -6,76 +6,75 @@ Generates and queues follow-up emails based on timing rules.
 
 import sys
 import os
-from datetime import datetime, timezone, timedelta
+from datetime import datetime, timedelta, timezone
 sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
-from utils.db import get_contacts, get_outreach_emails, insert_outreach_email, update_contact, get_db
+from utils.db import insert_outreach_email, get_db
 from templates.emails import SEQUENCE, get_template
 
 
-def get_contacts_needing_followup() -> list:
-    """Find contacts who were emailed but haven't replied and are due for next sequence."""
-    db = get_db()
+FOLLOWUP_PAGE_SIZE = 500
 
-    # Get all contacts with status 'emailed'
-    result = db.table('contacts').select('*, buildings(*)').eq('status', 'emailed').execute()
-    contacts = result.data or []
 
-    needs_followup = []
+def followup_delays() -> dict:
+    """{next sequence number: delay days} for the followups_due RPC."""
+    return {str(t['sequence_number']): t['delay_days'] for t in SEQUENCE if t['sequence_number'] > 1}
 
-    for contact in contacts:
-        # Get their outreach history
-        emails = db.table('outreach_emails').select('*').eq('contact_id', contact['id']).order('sequence_number', desc=True).execute()
-        email_history = emails.data or []
 
-        if not email_history:
-            continue
+def next_followup_at(sequence_number: int, sent_at: datetime):
+    """When the step after `sequence_number` is due for an email sent at `sent_at`, or None if it was the last."""
+    delay = followup_delays().get(str(sequence_number + 1))
+    return sent_at + timedelta(days=delay) if delay is not None else None
 
-        # Skip if they replied to anything
-        if any(e.get('status') == 'replied' for e in email_history):
-            continue
 
-        # Find the latest sequence number sent
-        latest = max(e['sequence_number'] for e in email_history if e['status'] == 'sent')
-
-        # Check if there's a next sequence
-        next_seq = latest + 1
-        next_template = get_template(next_seq)
-        if not next_template:
-            continue  # No more follow-ups in the sequence
-
-        # Check if enough time has passed
-        latest_email = next(e for e in email_history if e['sequence_number'] == latest and e['status'] == 'sent')
-        sent_at = datetime.fromisoformat(latest_email['sent_at'].replace('Z', '+00:00'))
-        delay_days = next_template['delay_days']
-        due_date = sent_at + timedelta(days=delay_days)
-
-        if datetime.now(timezone.utc) >= due_date:
-            needs_followup.append({
-                'contact': contact,
-                'building': contact.get('buildings') or {},
-                'next_sequence': next_seq,
+def refresh_next_actions() -> int:
+    """Recompute every contact's next_action_at from the followups_due RPC. Returns contacts scheduled."""
+    db = get_db()
+    return db.rpc('refresh_next_actions', {'delays': followup_delays()}).execute().data or 0
+
+
+def iter_contacts_needing_followup(page_size: int = FOLLOWUP_PAGE_SIZE):
+    """Yield contacts who were emailed, haven't replied and are due for the next sequence.
+
+    Backed by the followups_due RPC (one set-based query), read in keyset pages
+    so drafts created while consuming the stream don't shift later pages.
+    """
+    db = get_db()
+    now = datetime.now(timezone.utc)
+    params = {'delays': followup_delays(), 'as_of': now.isoformat(), 'page_size': page_size}
+
+    while True:
+        rows = db.rpc('followups_due', params).execute().data or []
+        for row in rows:
+            sent_at = datetime.fromisoformat(row['sent_at'].replace('Z', '+00:00'))
+            yield {
+                'contact': row['contact'],
+                'building': row.get('building') or {},
+                'next_sequence': row['next_sequence'],
                 'last_sent': sent_at,
-                'days_since': (datetime.now(timezone.utc) - sent_at).days,
-            })
+                'due_at': datetime.fromisoformat(row['due_at'].replace('Z', '+00:00')),
+                'days_since': (now - sent_at).days,
+            }
+        if len(rows) < page_size:
+            return
+        params['after_due'] = rows[-1]['due_at']
+        params['after_contact'] = rows[-1]['contact_id']
 
-    return needs_followup
+
+def get_contacts_needing_followup() -> list:
+    """Find contacts who were emailed but haven't replied and are due for next sequence."""
+    return list(iter_contacts_needing_followup())
 
 
 def run(dry_run: bool = False):
     """Check for and generate follow-up emails."""
     print("Checking for contacts needing follow-up...\n")
 
-    needs_followup = get_contacts_needing_followup()
-
-    if not needs_followup:
-        print("No contacts need follow-up right now.")
-        return 0
-
-    print(f"Found {len(needs_followup)} contacts due for follow-up:\n")
     generated = 0
+    due = 0
 
-    for item in needs_followup:
+    for item in iter_contacts_needing_followup():
+        due += 1
         contact = item['contact']
         building = item['building']
         next_seq = item['next_sequence']
@@ -120,16 +119,13 @@ def run(dry_run: bool = False):
         except Exception as e:
             print(f"    ✗ Error: {e}")
 
-    # Check for contacts who've gone through the full sequence with no reply
-    max_sequence = max(t['sequence_number'] for t in SEQUENCE)
-    stale = [item for item in needs_followup if item['next_sequence'] > max_sequence]
-    if stale:
-        print(f"\n{len(stale)} contacts completed full sequence with no reply.")
-        print("Consider manual outreach or removing them from the pipeline.")
+    if not due:
+        print("No contacts need follow-up right now.")
+        return 0
 
     print(f"\n{'='*50}")
     action = "Would generate" if dry_run else "Generated"
-    print(f"{action} {generated} follow-up drafts")
+    print(f"{action} {generated} follow-up drafts ({due} contacts due)")
     print(f"{'='*50}")
     return generated
 
@@ -2,92 +2,119 @@
 Agent 1 — Lead Sourcer
 Finds multifamily buildings via Google search + Apartments.com scraping.
 Stores them in the buildings table.
+
+`run` fetches every city concurrently on one pooled httpx.AsyncClient, each
+city's pages in order until one comes back empty.
+Politeness comes from a per-host rate limiter plus a global concurrency cap,
+so total time is bounded by the slowest host rather than the sum of sleeps.
 """
 
-import httpx
+import asyncio
 from bs4 import BeautifulSoup
 import re
 import time
 import sys
 import os
 sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
-from utils.db import insert_building, get_buildings
+from utils.db import upsert_buildings, get_buildings
 from utils.config import TARGET_CITIES
+from utils.ratelimit import HostRateLimiter
+from utils import http_cache
+from utils.http import get_http_client, make_async_client, print_stats
+
+# Max requests in flight across all hosts
+MAX_CONCURRENCY = 8
 
-HEADERS = {
-    'User-Agent': 'Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36'
+# Minimum seconds between request starts to the same host
+HOST_INTERVALS = {
+    'www.apartments.com': 2.0,
+    'www.google.com': 3.0,
 }
+DEFAULT_HOST_INTERVAL = 1.0
+STOP_POLL_SECONDS = 0.2  # how often source_cities checks its stop event
+
+
+def apartments_com_url(city: str, state: str, page: int) -> str:
+    city_slug = city.lower().replace(' ', '-')
+    state_slug = state.lower().replace(' ', '-')
+    return f"https://www.apartments.com/{city_slug}-{state_slug}/{page}/"
+
+
+def parse_apartments_page(html: str, city: str, state: str) -> tuple:
+    """Parse one Apartments.com results page. Returns (buildings, listing_count)."""
+    buildings = []
+    soup = BeautifulSoup(html, 'html.parser')
+    listings = soup.select('li.mortar-wrapper article.placard')
+
+    if not listings:
+        # Try alternate selector
+        listings = soup.select('article[data-listingid]')
+
+    for listing in listings:
+        try:
+            title_el = listing.select_one('.property-title') or listing.select_one('span.js-placardTitle')
+            address_el = listing.select_one('.property-address') or listing.select_one('div.property-address')
+
+            name = title_el.get_text(strip=True) if title_el else None
+            address = address_el.get_text(strip=True) if address_el else None
+
+            # Try to extract unit count from listing text
+            unit_count = None
+            full_text = listing.get_text()
+            unit_match = re.search(r'(\d+)\s*(?:units?|apartments?|homes?)', full_text, re.IGNORECASE)
+            if unit_match:
+                unit_count = int(unit_match.group(1))
+
+            property_url = None
+            link_el = listing.select_one('a.property-link') or listing.find('a', href=True)
+            if link_el and link_el.get('href'):
+                href = link_el['href']
+                if href.startswith('http'):
+                    property_url = href
+                elif href.startswith('/'):
+                    property_url = f"https://www.apartments.com{href}"
+
+            if name:
+                buildings.append({
+                    'name': name,
+                    'address': address,
+                    'city': city,
+                    'state': state,
+                    'unit_count': unit_count,
+                    'property_url': property_url,
+                    'source': 'apartments_com',
+                    'status': 'new',
+                })
+        except Exception as e:
+            print(f"  Error parsing listing: {e}")
+            continue
+
+    return buildings, len(listings)
 
 
 def scrape_apartments_com(city: str, state: str, max_pages: int = 3) -> list:
     """Scrape Apartments.com for multifamily buildings in a city."""
     buildings = []
-    city_slug = city.lower().replace(' ', '-')
-    state_slug = state.lower().replace(' ', '-')
 
     for page in range(1, max_pages + 1):
-        url = f"https://www.apartments.com/{city_slug}-{state_slug}/{page}/"
+        url = apartments_com_url(city, state, page)
         print(f"  Scraping: {url}")
 
         try:
-            resp = httpx.get(url, headers=HEADERS, timeout=15, follow_redirects=True)
+            resp = http_cache.cached_get(get_http_client(), url, 'apartments_com', timeout=15)
             if resp.status_code != 200:
                 print(f"  Got status {resp.status_code}, skipping page")
                 continue
 
-            soup = BeautifulSoup(resp.text, 'html.parser')
-            listings = soup.select('li.mortar-wrapper article.placard')
-
-            if not listings:
-                # Try alternate selector
-                listings = soup.select('article[data-listingid]')
-
-            if not listings:
+            page_buildings, listing_count = parse_apartments_page(resp.text, city, state)
+            if not listing_count:
                 print(f"  No listings found on page {page}, stopping")
                 break
 
-            for listing in listings:
-                try:
-                    title_el = listing.select_one('.property-title') or listing.select_one('span.js-placardTitle')
-                    address_el = listing.select_one('.property-address') or listing.select_one('div.property-address')
-                    units_el = listing.select_one('.property-pricing') or listing.select_one('.bed-range')
-
-                    name = title_el.get_text(strip=True) if title_el else None
-                    address = address_el.get_text(strip=True) if address_el else None
-
-                    # Try to extract unit count from listing text
-                    unit_count = None
-                    full_text = listing.get_text()
-                    unit_match = re.search(r'(\d+)\s*(?:units?|apartments?|homes?)', full_text, re.IGNORECASE)
-                    if unit_match:
-                        unit_count = int(unit_match.group(1))
-
-                    property_url = None
-                    link_el = listing.select_one('a.property-link') or listing.find('a', href=True)
-                    if link_el and link_el.get('href'):
-                        href = link_el['href']
-                        if href.startswith('http'):
-                            property_url = href
-                        elif href.startswith('/'):
-                            property_url = f"https://www.apartments.com{href}"
-
-                    if name:
-                        buildings.append({
-                            'name': name,
-                            'address': address,
-                            'city': city,
-                            'state': state,
-                            'unit_count': unit_count,
-                            'property_url': property_url,
-                            'source': 'apartments_com',
-                            'status': 'new',
-                        })
-                except Exception as e:
-                    print(f"  Error parsing listing: {e}")
-                    continue
-
-            print(f"  Found {len(listings)} listings on page {page}")
-            time.sleep(2)  # Be respectful
+            buildings.extend(page_buildings)
+            print(f"  Found {listing_count} listings on page {page}")
+            if not getattr(resp, 'from_cache', False):
+                time.sleep(2)  # Be respectful
 
         except Exception as e:
             print(f"  Error scraping page {page}: {e}")
@@ -96,44 +123,151 @@ def scrape_apartments_com(city: str, state: str, max_pages: int = 3) -> list:
     return buildings
 
 
-def scrape_google_maps(city: str, state: str) -> list:
-    """Search Google for property management companies in a city."""
-    buildings = []
+def google_search_url(city: str, state: str) -> str:
     query = f"property management company {city} {state} multifamily"
-    url = f"https://www.google.com/search?q={query.replace(' ', '+')}"
+    return f"https://www.google.com/search?q={query.replace(' ', '+')}"
 
-    try:
-        resp = httpx.get(url, headers=HEADERS, timeout=15, follow_redirects=True)
-        soup = BeautifulSoup(resp.text, 'html.parser')
 
-        # Extract company names from search results
-        for result in soup.select('div.g'):
-            title_el = result.select_one('h3')
-            link_el = result.select_one('a')
-            snippet_el = result.select_one('div.VwiC3b')
+def parse_google_results(html: str, city: str, state: str) -> list:
+    """Extract property management companies from a Google results page."""
+    buildings = []
+    soup = BeautifulSoup(html, 'html.parser')
+
+    # Extract company names from search results
+    for result in soup.select('div.g'):
+        title_el = result.select_one('h3')
+        link_el = result.select_one('a')
 
-            if title_el:
-                name = title_el.get_text(strip=True)
-                # Filter out irrelevant results
-                if any(skip in name.lower() for skip in ['yelp', 'indeed', 'glassdoor', 'wikipedia']):
-                    continue
+        if title_el:
+            name = title_el.get_text(strip=True)
+            # Filter out irrelevant results
+            if any(skip in name.lower() for skip in ['yelp', 'indeed', 'glassdoor', 'wikipedia']):
+                continue
 
-                property_url = link_el['href'] if link_el and link_el.get('href') else None
-                company = name.split(' - ')[0].split(' | ')[0].strip()
+            property_url = link_el['href'] if link_el and link_el.get('href') else None
+            company = name.split(' - ')[0].split(' | ')[0].strip()
 
-                buildings.append({
-                    'name': company,
-                    'company': company,
-                    'city': city,
-                    'state': state,
-                    'property_url': property_url,
-                    'source': 'google',
-                    'status': 'new',
-                })
+            buildings.append({
+                'name': company,
+                'company': company,
+                'city': city,
+                'state': state,
+                'property_url': property_url,
+                'source': 'google',
+                'status': 'new',
+            })
+
+    return buildings
+
+
+def scrape_google_maps(city: str, state: str) -> list:
+    """Search Google for property management companies in a city."""
+    try:
+        resp = http_cache.cached_get(get_http_client(), google_search_url(city, state), 'google', timeout=15)
+        return parse_google_results(resp.text, city, state)
     except Exception as e:
         print(f"  Error searching Google: {e}")
+        return []
 
-    return buildings
+
+async def fetch_page(client, limiter: HostRateLimiter, semaphore: asyncio.Semaphore, url: str, source: str) -> str:
+    """Fetch a page politely. Returns the body, or None on a non-200 / error.
+
+    Fresh cache hits return immediately without waiting on the host's rate limit.
+    """
+    kwargs = {}
+    state, resp = http_cache.begin(url, source, kwargs)
+    if resp is None:
+        await limiter.wait(url)
+        async with semaphore:
+            try:
+                resp = http_cache.finish(state, await client.get(url, **kwargs))
+            except Exception as e:
+                print(f"  Error fetching {url}: {e}")
+                return None
+    if resp.status_code != 200:
+        print(f"  Got status {resp.status_code} for {url}")
+        return None
+    return resp.text
+
+
+async def source_apartments_page(client, limiter, semaphore, city: str, state: str, page: int) -> tuple:
+    """(buildings, listing_count) for one results page, or (None, None) if the page couldn't be fetched."""
+    html = await fetch_page(client, limiter, semaphore, apartments_com_url(city, state, page), 'apartments_com')
+    if html is None:
+        return None, None
+    return parse_apartments_page(html, city, state)
+
+
+async def source_google(client, limiter, semaphore, city: str, state: str) -> list:
+    html = await fetch_page(client, limiter, semaphore, google_search_url(city, state), 'google')
+    if html is None:
+        return None
+    return parse_google_results(html, city, state)
+
+
+async def cancel_when_set(stop, future):
+    """Cancel `future` once the threading.Event `stop` is set (it can be set from another thread)."""
+    while not stop.is_set():
+        await asyncio.sleep(STOP_POLL_SECONDS)
+    future.cancel()
+
+
+async def source_cities(cities: list, max_pages: int = 3, concurrency: int = MAX_CONCURRENCY,
+                        on_page=None, skip: set = frozenset(), stop=None) -> dict:
+    """Fetch all cities concurrently. Returns {city: [apartments_buildings, google_buildings]}.
+
+    A city's Apartments.com pages are fetched in order, stopping at the first
+    page with no listings, so a city with few results doesn't cost max_pages
+    requests. `on_page(page_id, city, buildings)` is called as each page is parsed
+    (buildings is None when the fetch failed), so a caller can stream buildings
+    onward before the rest have been fetched. Page ids in `skip` aren't fetched.
+    Once the threading.Event `stop` is set, fetches still pending are cancelled
+    and what was sourced so far is returned.
+    """
+    limiter = HostRateLimiter(DEFAULT_HOST_INTERVAL, HOST_INTERVALS)
+    semaphore = asyncio.Semaphore(concurrency)
+    results = {city: [[], []] for city in cities}
+
+    async def apartments(city, state):
+        for page in range(1, max_pages + 1):
+            page_id = f"apartments_com:{city}:{page}"
+            if page_id in skip:
+                continue
+            buildings, listing_count = await source_apartments_page(client, limiter, semaphore, city, state, page)
+            results[city][0].extend(buildings or [])
+            if on_page:
+                on_page(page_id, city, buildings)
+            if listing_count == 0:
+                print(f"  No listings found on page {page} for {city}, stopping")
+                break
+
+    async def google(city, state):
+        page_id = f"google:{city}"
+        if page_id in skip:
+            return
+        buildings = await source_google(client, limiter, semaphore, city, state)
+        results[city][1].extend(buildings or [])
+        if on_page:
+            on_page(page_id, city, buildings)
+
+    async with make_async_client() as client:
+        # One page chain per city; the chains take turns at each host's rate limit
+        tasks = [apartments(city, CITY_STATES[city]) for city in cities]
+        tasks += [google(city, CITY_STATES[city]) for city in cities]
+        gathered = asyncio.gather(*tasks)
+        watcher = asyncio.ensure_future(cancel_when_set(stop, gathered)) if stop is not None else None
+        try:
+            await gathered
+        except asyncio.CancelledError:
+            if watcher is None or not stop.is_set():
+                raise
+            print("  Sourcing stopped")
+        finally:
+            if watcher is not None:
+                watcher.cancel()
+
+    return results
 
 
 # Mapping of city names to state abbreviations
@@ -148,43 +282,42 @@ CITY_STATES = {
 }
 
 
-def run(cities: list = None, max_pages: int = 3):
+def run(cities: list = None, max_pages: int = 3, concurrency: int = MAX_CONCURRENCY):
     """Run the lead sourcer for given cities."""
     cities = cities or TARGET_CITIES
-    total_added = 0
-
+    known = []
     for city in cities:
-        state = CITY_STATES.get(city, '')
-        if not state:
+        if city not in CITY_STATES:
             print(f"Unknown city: {city}, skipping (add to CITY_STATES)")
             continue
+        known.append(city)
 
-        print(f"\n{'='*50}")
-        print(f"Sourcing leads in {city}, {state}")
-        print(f"{'='*50}")
+    if not known:
+        return 0
 
-        # Source 1: Apartments.com
-        print(f"\n[Apartments.com]")
-        apt_buildings = scrape_apartments_com(city, state, max_pages)
-        print(f"  Found {len(apt_buildings)} buildings")
+    print(f"Sourcing leads in {len(known)} cities ({max_pages} pages each, {concurrency} concurrent requests)...")
+    started = time.monotonic()
+    results = asyncio.run(source_cities(known, max_pages, concurrency))
+    print(f"Fetched in {time.monotonic() - started:.1f}s")
+    http_cache.print_summary()
+    print_stats()
 
-        # Source 2: Google search for property management companies
-        print(f"\n[Google Search]")
-        google_buildings = scrape_google_maps(city, state)
-        print(f"  Found {len(google_buildings)} companies")
+    total_added = 0
+    for city in known:
+        apt_buildings, google_buildings = results[city]
+        print(f"\n{city}, {CITY_STATES[city]}: "
+              f"{len(apt_buildings)} from Apartments.com, {len(google_buildings)} from Google")
 
         # Save to database
         all_buildings = apt_buildings + google_buildings
         added = 0
-        for building in all_buildings:
-            try:
-                result = insert_building(building)
-                if result:
-                    added += 1
-            except Exception as e:
-                print(f"  Error saving {building.get('name')}: {e}")
+        try:
+            ids = upsert_buildings(all_buildings)
+            added = sum(1 for building_id in ids if building_id)
+        except Exception as e:
+            print(f"  Error saving leads for {city}: {e}")
 
-        print(f"\nSaved {added} new leads for {city}")
+        print(f"  Saved {added} new leads for {city}")
         total_added += added
 
     print(f"\n{'='*50}")
@@ -198,5 +331,9 @@ if __name__ == '__main__':
     parser = argparse.ArgumentParser(description='Lead Sourcer — find multifamily buildings')
     parser.add_argument('--cities', nargs='+', help='Cities to search')
     parser.add_argument('--pages', type=int, default=3, help='Max pages per city on Apartments.com')
+    parser.add_argument('--concurrency', type=int, default=MAX_CONCURRENCY, help='Max requests in flight')
+    parser.add_argument('--no-cache', action='store_true', help='Bypass the HTTP response cache')
+    parser.add_argument('--refresh', action='store_true', help='Revalidate every cached page')
     args = parser.parse_args()
-    run(cities=args.cities, max_pages=args.pages)
+    http_cache.set_cache_mode('off' if args.no_cache else 'refresh' if args.refresh else 'use')
+    run(cities=args.cities, max_pages=args.pages, concurrency=args.concurrency)
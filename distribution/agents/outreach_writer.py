@@ -2,17 +2,57 @@
 Agent 3 — Outreach Writer
 Takes contacts + building data and generates personalized cold emails
 using Claude API. Stores drafts in outreach_emails table.
+
+Personalization runs on a pool of worker threads behind an adaptive
+concurrency cap: rate-limit / overload errors halve the number of requests
+in flight and pause briefly, successes grow it back. Drafts are inserted in
+batches as results arrive.
+
+Bodies are personalized per building, not per contact: the model writes a
+skeleton with a {first_name} slot, which is cached on disk and filled in for
+every contact at that building (this run or later ones).
+
+--batch sends everything as one Message Batch instead (cheaper, finishes
+within hours); the batch id is persisted so an interrupted run resumes.
 """
 
+from concurrent.futures import ThreadPoolExecutor, as_completed
+import hashlib
+import json
+import random
+import threading
+import time
 import sys
 import os
 sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
-from anthropic import Anthropic
-from utils.db import get_contacts, insert_outreach_email, get_outreach_emails
+from anthropic import Anthropic, APIConnectionError
+from utils.db import iter_contacts, insert_outreach_emails, get_outreach_sequences, print_payload_stats
 from utils.config import ANTHROPIC_API_KEY
+from utils.ratelimit import AdaptiveLimiter
+from utils import ai_batch
+from utils.ai_usage import TokenUsage
+from utils.kvcache import DiskCache
 from templates.emails import SEQUENCE, get_template
 
+AI_CONCURRENCY = int(os.getenv('AI_CONCURRENCY', '8'))
+AI_MAX_ATTEMPTS = 5
+RETRY_STATUSES = {429, 500, 502, 503, 529}  # 529 = overloaded
+DRAFT_BATCH_SIZE = 25  # drafts per bulk insert
+MODEL = 'claude-haiku-4-5-20251001'
+
+# Personalized bodies are cached per (prompt version, building context) as
+# skeletons with a name slot, so later contacts at a building skip the LLM call
+NAME_SLOT = '{first_name}'
+SKELETON_CACHE_TTL_DAYS = int(os.getenv('SKELETON_CACHE_TTL_DAYS', '30'))
+skeleton_cache = DiskCache('skeletons', ttl=SKELETON_CACHE_TTL_DAYS * 86400, max_entries=20000)
+_inflight = {}
+_inflight_lock = threading.Lock()
+
+ai_stats = {'latencies': [], 'retries': 0, 'fallbacks': 0}
+_stats_lock = threading.Lock()  # ai_stats is updated from the writer pool's workers
+ai_usage = TokenUsage()
+
 client = None
 
 def get_client():
@@ -20,7 +60,8 @@ def get_client():
     if client is None:
         if not ANTHROPIC_API_KEY:
             raise ValueError("ANTHROPIC_API_KEY must be set in .env")
-        client = Anthropic(api_key=ANTHROPIC_API_KEY)
+        # Retries happen in personalize_with_backoff so overloads reach the limiter
+        client = Anthropic(api_key=ANTHROPIC_API_KEY, max_retries=0)
     return client
 
 
@@ -42,10 +83,8 @@ Rules:
 """
 
 
-def personalize_email(template_body: str, contact: dict, building: dict) -> str:
-    """Use Claude to personalize an email template."""
-    ai = get_client()
-
+def building_context(building: dict) -> str:
+    """The building / company facts the model personalizes against."""
     context_parts = []
     if building.get('name'):
         context_parts.append(f"Building: {building['name']}")
@@ -55,38 +94,269 @@ def personalize_email(template_body: str, contact: dict, building: dict) -> str:
         context_parts.append(f"City: {building['city']}, {building.get('state', '')}")
     if building.get('unit_count'):
         context_parts.append(f"Units: {building['unit_count']}")
-    if contact.get('full_name') and contact['full_name'] != 'Unknown':
-        context_parts.append(f"Contact: {contact['full_name']}")
-    if contact.get('title'):
-        context_parts.append(f"Title: {contact['title']}")
-
-    context = '\n'.join(context_parts)
-
-    response = ai.messages.create(
-        model='claude-haiku-4-5-20251001',
-        max_tokens=500,
-        system=SYSTEM_PROMPT,
-        messages=[{
-            'role': 'user',
-            'content': f"""Personalize this email template for the contact below.
+    return '\n'.join(context_parts)
+
+
+def skeleton_key(template_body: str, building: dict) -> str:
+    """Cache key: the prompt version (model, system prompt, template) plus the building context."""
+    raw = json.dumps([MODEL, SYSTEM_PROMPT, template_body, building_context(building)])
+    return hashlib.sha256(raw.encode()).hexdigest()
+
+
+def first_name_of(contact: dict) -> str:
+    name = contact.get('full_name', 'Unknown')
+    return name.split()[0] if name and name != 'Unknown' else 'there'
+
+
+def fill_skeleton(skeleton: str, contact: dict) -> str:
+    return skeleton.replace(NAME_SLOT, first_name_of(contact))
 
-TEMPLATE:
-{template_body}
+
+def personalize_params(template_body: str, building: dict) -> dict:
+    """messages.create() arguments for one personalization (shared by the live and batch paths).
+
+    The result is a skeleton for every contact at the building: the recipient's
+    name is left as the NAME_SLOT placeholder and filled in afterwards.
+    """
+    # System prompt + template are identical for every building of a run; only
+    # the building context varies per request.
+    return {
+        'model': MODEL,
+        'max_tokens': 500,
+        'system': f"{SYSTEM_PROMPT}\nTEMPLATE:\n{template_body}",
+        'messages': [{
+            'role': 'user',
+            'content': f"""Personalize the template for the building below.
 
 CONTEXT:
-{context}
+{building_context(building)}
 
+Keep the {NAME_SLOT} placeholder exactly as written; it is replaced with each recipient's first name.
 Return only the personalized email body, nothing else."""
-        }]
-    )
+        }],
+    }
+
 
+def personalize_skeleton(template_body: str, building: dict) -> str:
+    """Use Claude to personalize an email template for a building (one call, no cache)."""
+    response = get_client().messages.create(**personalize_params(template_body, building))
+    ai_usage.add(response.usage)
     return response.content[0].text
 
 
-def run(limit: int = 50, sequence_number: int = 1, use_ai: bool = True):
-    """Generate outreach emails for contacts that haven't been emailed yet."""
+def personalize_email(template_body: str, contact: dict, building: dict) -> str:
+    """Use Claude to personalize an email template."""
+    return fill_skeleton(personalize_skeleton(template_body, building), contact)
+
+
+def retry_delay(error: Exception, attempt: int):
+    """Seconds to back off before retrying a failed AI call, or None if it shouldn't be retried."""
+    if getattr(error, 'status_code', None) not in RETRY_STATUSES and not isinstance(error, APIConnectionError):
+        return None
+    response = getattr(error, 'response', None)
+    try:
+        return float(response.headers.get('retry-after'))
+    except (AttributeError, TypeError, ValueError):
+        return min(2 ** attempt, 30) + random.uniform(0, 1)
+
+
+def personalize_with_backoff(template_body: str, building: dict, limiter: AdaptiveLimiter) -> str:
+    """personalize_skeleton under the shared concurrency cap, retrying overloads. Safe to call from workers."""
+    for attempt in range(AI_MAX_ATTEMPTS):
+        with limiter:
+            started = time.monotonic()
+            try:
+                skeleton = personalize_skeleton(template_body, building)
+            except Exception as e:
+                error = e
+            else:
+                with _stats_lock:
+                    ai_stats['latencies'].append(time.monotonic() - started)
+                limiter.success()
+                return skeleton
+
+        delay = retry_delay(error, attempt)
+        if delay is None or attempt == AI_MAX_ATTEMPTS - 1:
+            raise error
+        with _stats_lock:
+            ai_stats['retries'] += 1
+        limiter.backoff(delay)
+
+
+def cached_skeleton(template_body: str, building: dict, limiter: AdaptiveLimiter) -> str:
+    """The building's personalized skeleton, from the cache or one AI call.
+
+    Concurrent workers writing for the same building share that call.
+    """
+    key = skeleton_key(template_body, building)
+    with _inflight_lock:
+        key_lock = _inflight.setdefault(key, threading.Lock())
+
+    with key_lock:
+        skeleton = skeleton_cache.get(key)
+        if skeleton is None:
+            skeleton = personalize_with_backoff(template_body, building, limiter)
+            skeleton_cache.set(key, skeleton)
+        return skeleton
+
+
+def template_draft(contact: dict, template: dict, sequence_number: int) -> dict:
+    """A draft row filled from the template alone."""
+    building = contact.get('buildings') or {}
+    building_name = building.get('name', 'your building')
+
+    variables = {
+        'first_name': first_name_of(contact),
+        'building_name': building_name,
+    }
+
+    return {
+        'contact_id': contact['id'],
+        'building_id': building.get('id'),
+        'sequence_number': sequence_number,
+        'subject': template['subject'].format(**variables),
+        'body': template['body'].format(**variables),
+        'status': 'draft',
+    }
+
+
+def write_draft(contact: dict, template: dict, sequence_number: int, limiter: AdaptiveLimiter = None) -> dict:
+    """Build one draft row; personalized by AI when a limiter is given, else a template fill."""
+    draft = template_draft(contact, template, sequence_number)
+    if limiter is not None:
+        building = contact.get('buildings') or {}
+        try:
+            draft['body'] = fill_skeleton(cached_skeleton(template['body'], building, limiter), contact)
+        except Exception as e:
+            print(f"  AI error for {contact.get('full_name', 'Unknown')}, falling back to template: {e}")
+            with _stats_lock:
+                ai_stats['fallbacks'] += 1
+    return draft
+
+
+def save_drafts(drafts: list) -> list:
+    """Bulk insert a batch of (contact, row) drafts. Returns the inserted rows.
+
+    Drafts another writer already created are skipped.
+    """
+    try:
+        inserted = insert_outreach_emails([row for _, row in drafts])
+    except Exception as e:
+        print(f"  Error saving {len(drafts)} drafts: {e}")
+        return []
+    saved = {row['contact_id'] for row in inserted}
+    for contact, _ in drafts:
+        name = contact.get('full_name', 'Unknown')
+        if contact['id'] in saved:
+            print(f"  ✓ Draft for {name} ({contact['email']})")
+        else:
+            print(f"  Skipping {name} — draft already exists")
+    return inserted
+
+
+def print_ai_stats(limiter: AdaptiveLimiter):
+    print_skeleton_stats()
+    latencies = sorted(ai_stats['latencies'])
+    if not latencies:
+        return
+    n = len(latencies)
+    print(f"AI: {n} calls, latency avg {sum(latencies) / n:.2f}s, p50 {latencies[n // 2]:.2f}s, "
+          f"p95 {latencies[min(n - 1, int(n * 0.95))]:.2f}s, max {latencies[-1]:.2f}s")
+    print(f"    {ai_stats['retries']} retries, {limiter.stats['backoffs']} backoffs "
+          f"(concurrency {limiter.max_concurrency} → low {limiter.stats['lowest_limit']}), "
+          f"{ai_stats['fallbacks']} template fallbacks")
+
+
+def print_skeleton_stats():
+    lookups = skeleton_cache.stats['hits'] + skeleton_cache.stats['misses']
+    if not lookups:
+        return
+    print(f"Skeleton cache: {skeleton_cache.stats['hits']}/{lookups} hits ({skeleton_cache.hit_rate():.0%}), "
+          f"{skeleton_cache.stats['hits']} LLM calls avoided")
+
+
+def set_cache_mode(mode: str):
+    """'use' (default), 'refresh' (re-personalize, overwrite) or 'off' (no cache)."""
+    skeleton_cache.mode = mode
+
+
+def submit_batch(contacts: list, template: dict, sequence_number: int) -> dict:
+    """Submit one Message Batch with a request per uncached building; template fills are kept as fallbacks.
+
+    Returns the batch state, or None when every skeleton was already cached.
+    """
+    drafts = {}
+    keys = {}  # contact_id -> skeleton key still to be personalized
+    requests = {}
+    for contact in contacts:
+        building = contact.get('buildings') or {}
+        draft = drafts[contact['id']] = template_draft(contact, template, sequence_number)
+        key = skeleton_key(template['body'], building)
+        skeleton = skeleton_cache.get(key)
+        if skeleton is not None:
+            draft['body'] = fill_skeleton(skeleton, contact)
+            continue
+        keys[contact['id']] = key
+        if key not in requests:
+            requests[key] = {'custom_id': key, 'params': personalize_params(template['body'], building)}
+
+    if not requests:
+        return {'batch_id': None, 'meta': {'drafts': drafts, 'keys': {}, 'names': {}}}
+    names = {contact['id']: first_name_of(contact) for contact in contacts if contact['id'] in keys}
+    return ai_batch.submit(get_client(), 'write', list(requests.values()),
+                           {'drafts': drafts, 'keys': keys, 'names': names})
+
+
+def finish_batch(state: dict, poll_seconds: float = ai_batch.BATCH_POLL_SECONDS) -> int:
+    """Wait for a submitted batch, cache its skeletons, then bulk insert the drafts."""
+    ai_usage.reset()
+    skeletons = {}
+    if state['batch_id']:
+        ai = get_client()
+        ai_batch.wait(ai, state, poll_seconds)
+        skeletons = ai_batch.results(ai, state['batch_id'], usage=ai_usage)
+        for key, skeleton in skeletons.items():
+            skeleton_cache.set(key, skeleton)
+
+    meta = state['meta']
+    drafts = meta['drafts']
+    fallbacks = 0
+    for contact_id, key in meta['keys'].items():
+        if key in skeletons:
+            drafts[contact_id]['body'] = fill_skeleton(skeletons[key], {'full_name': meta['names'][contact_id]})
+        else:
+            fallbacks += 1
+    rows = list(drafts.values())
+    written = len(insert_outreach_emails(rows))
+    if state['batch_id']:
+        ai_batch.finish('write')
+
+    print(f"\n{'='*50}")
+    print(f"Wrote {written} email drafts" + (f" from batch {state['batch_id']}" if state['batch_id'] else ''))
+    if written < len(rows):
+        print(f"  {len(rows) - written} skipped — drafts already existed")
+    print(f"  {len(skeletons)} buildings personalized, {len(rows) - len(meta['keys'])} drafts from cache, "
+          f"{fallbacks} template fallbacks")
+    print_skeleton_stats()
+    print(ai_usage.summary())
+    print(f"{'='*50}")
+    return written
+
+
+def run(limit: int = 50, sequence_number: int = 1, use_ai: bool = True, concurrency: int = AI_CONCURRENCY,
+        batch: bool = False):
+    """Generate outreach emails for contacts that haven't been emailed yet.
+
+    With batch=True, personalization goes through one Message Batch. A batch
+    left unfinished by an earlier run is resumed instead of submitting a new one.
+    """
+    if batch and use_ai:
+        state = ai_batch.pending('write')
+        if state:
+            print(f"Resuming batch {state['batch_id']} ({state['count']} buildings)...")
+            return finish_batch(state)
     # Get contacts with status 'new' (never emailed)
-    contacts = get_contacts(status='new', limit=limit)
+    contacts = list(iter_contacts(status='new', limit=limit, projection='write'))
 
     if not contacts:
         print("No new contacts to write emails for. Run contact_enricher first.")
@@ -99,14 +369,15 @@ def run(limit: int = 50, sequence_number: int = 1, use_ai: bool = True):
 
     print(f"Writing sequence #{sequence_number} emails for {len(contacts)} contacts...")
     if use_ai:
-        print("Using AI personalization (Claude Haiku)\n")
+        print(f"Using AI personalization (Claude Haiku, up to {concurrency} concurrent)\n")
     else:
         print("Using template fill (no AI)\n")
 
-    written = 0
+    # One lightweight query for the whole candidate set instead of a lookup per contact
+    existing = get_outreach_sequences([contact['id'] for contact in contacts])
 
+    pending_contacts = []
     for contact in contacts:
-        building = contact.get('buildings') or {}
         name = contact.get('full_name', 'Unknown')
         email = contact.get('email')
 
@@ -114,48 +385,53 @@ def run(limit: int = 50, sequence_number: int = 1, use_ai: bool = True):
             print(f"  Skipping {name} — no email")
             continue
 
-        # Check if we already have an email for this contact at this sequence
-        existing = get_outreach_emails(contact_id=contact['id'])
-        if any(e.get('sequence_number') == sequence_number for e in existing):
+        if (contact['id'], sequence_number) in existing:
             print(f"  Skipping {name} — already has sequence #{sequence_number}")
             continue
 
-        first_name = name.split()[0] if name != 'Unknown' else 'there'
-        building_name = building.get('name', 'your building')
+        pending_contacts.append(contact)
 
-        variables = {
-            'first_name': first_name,
-            'building_name': building_name,
-        }
+    skeleton_cache.stats.update(dict.fromkeys(skeleton_cache.stats, 0))
+    if batch and use_ai:
+        if not pending_contacts:
+            print("Nothing to write.")
+            return 0
+        return finish_batch(submit_batch(pending_contacts, template, sequence_number))
+
+    ai_stats.update({'latencies': [], 'retries': 0, 'fallbacks': 0})
+    ai_usage.reset()
+    limiter = AdaptiveLimiter(concurrency) if use_ai else None
+    started = time.monotonic()
+    written = 0
+    pending = []
 
-        if use_ai:
+    with ThreadPoolExecutor(max_workers=concurrency if use_ai else 1) as pool:
+        futures = {
+            pool.submit(write_draft, contact, template, sequence_number, limiter): contact
+            for contact in pending_contacts
+        }
+        for future in as_completed(futures):
+            contact = futures[future]
             try:
-                body = personalize_email(template['body'], contact, building)
+                pending.append((contact, future.result()))
             except Exception as e:
-                print(f"  AI error for {name}, falling back to template: {e}")
-                body = template['body'].format(**variables)
-        else:
-            body = template['body'].format(**variables)
+                print(f"  Error writing draft for {contact.get('full_name', 'Unknown')}: {e}")
 
-        subject = template['subject'].format(**variables)
+            if len(pending) >= DRAFT_BATCH_SIZE:
+                written += len(save_drafts(pending))
+                pending = []
 
-        # Save as draft
-        try:
-            insert_outreach_email({
-                'contact_id': contact['id'],
-                'building_id': building.get('id'),
-                'sequence_number': sequence_number,
-                'subject': subject,
-                'body': body,
-                'status': 'draft',
-            })
-            written += 1
-            print(f"  ✓ Draft for {name} ({email})")
-        except Exception as e:
-            print(f"  Error saving draft for {name}: {e}")
+    if pending:
+        written += len(save_drafts(pending))
 
+    elapsed = time.monotonic() - started
     print(f"\n{'='*50}")
     print(f"Wrote {written} email drafts")
+    print(f"Time: {elapsed:.1f}s ({written / max(elapsed, 1e-6):.2f} drafts/s)")
+    if limiter is not None:
+        print_ai_stats(limiter)
+        print(ai_usage.summary())
+    print_payload_stats()
     print(f"{'='*50}")
     return written
 
@@ -163,8 +439,14 @@ def run(limit: int = 50, sequence_number: int = 1, use_ai: bool = True):
 if __name__ == '__main__':
     import argparse
     parser = argparse.ArgumentParser(description='Outreach Writer — generate personalized emails')
-    parser.add_argument('--limit', type=int, default=50, help='Max contacts to write for')
+    parser.add_argument('--limit', type=int, default=50, help='Max contacts to write for (0 = all)')
     parser.add_argument('--sequence', type=int, default=1, help='Sequence number (1=intro, 2=follow-up, 3=final)')
     parser.add_argument('--no-ai', action='store_true', help='Skip AI personalization, use templates only')
+    parser.add_argument('--concurrency', type=int, default=AI_CONCURRENCY, help='Max AI requests in flight')
+    parser.add_argument('--batch', action='store_true', help='Personalize via the Message Batches API (resumable)')
+    parser.add_argument('--no-cache', action='store_true', help='Bypass the personalization cache')
+    parser.add_argument('--refresh', action='store_true', help='Re-personalize and overwrite cached skeletons')
     args = parser.parse_args()
-    run(limit=args.limit, sequence_number=args.sequence, use_ai=not args.no_ai)
+    set_cache_mode('off' if args.no_cache else 'refresh' if args.refresh else 'use')
+    run(limit=args.limit or None, sequence_number=args.sequence, use_ai=not args.no_ai, concurrency=args.concurrency,
+        batch=args.batch)
@@ -0,0 +1,222 @@
+"""
+Streaming pipeline: source → enrich → write → send, with the stages overlapped.
+
+Instead of scraping every city before enriching anything, each page of
+buildings flows into enrichment as soon as it's saved, each building's
+contacts into writing as soon as they're found, and each batch of drafts
+out to Resend as soon as it's inserted. Stages run on their own workers with
+bounded queues between them (utils.pipeline), so a slow stage applies
+backpressure upstream instead of buffering everything in memory.
+
+Buildings and contacts already waiting in the database ('new') are fed in
+alongside the freshly sourced ones. Follow-ups, and any drafts left queued,
+go out afterwards as before.
+
+With a RunJournal every page, building, draft and send is recorded; resuming
+the run skips what's done (replaying stored drafts rather than re-calling the
+model) and retries what failed.
+"""
+
+import asyncio
+import threading
+import sys
+import os
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from utils.db import iter_buildings, get_buildings_by_ids, iter_contacts, get_outreach_sequences, upsert_buildings, \
+    transition_ids, print_payload_stats
+from utils.config import TARGET_CITIES, RESEND_API_KEY
+from utils.pipeline import Stage, run_pipeline, print_pipeline_stats
+from utils.journal import RunJournal
+from utils.ratelimit import AdaptiveLimiter
+from utils import http_cache
+from utils.http import print_stats
+from agents import lead_sourcer, contact_enricher, outreach_writer, email_sender
+
+QUEUE_SIZE = 50  # items waiting between two stages
+
+
+def sourced_buildings(cities: list, max_pages: int, concurrency: int, counts: dict, journal: RunJournal = None,
+                      stop: threading.Event = None):
+    """produce() for the enrich stage: save each scraped page and emit its buildings still 'new'.
+
+    Setting `stop` cancels the scrape; pages already saved stay saved.
+    """
+    def produce(emit):
+        known = [city for city in cities if city in lead_sourcer.CITY_STATES]
+        for city in set(cities) - set(known):
+            print(f"Unknown city: {city}, skipping (add to CITY_STATES)")
+        skip = set(journal.completed('source')) if journal else set()
+        if skip:
+            print(f"Skipping {len(skip)} pages already sourced in this run")
+
+        def on_page(page_id, city, buildings):
+            if buildings is None:
+                if journal:
+                    journal.record('source', page_id, 'failed', error='fetch failed')
+                return
+            try:
+                ids = upsert_buildings(buildings) if buildings else []
+                fresh = get_buildings_by_ids([building_id for building_id in ids if building_id], status='new',
+                                             projection='enrich')
+            except Exception as e:
+                print(f"  Error saving leads for {city}: {e}")
+                if journal:
+                    journal.record('source', page_id, 'failed', error=str(e))
+                return
+            if journal:
+                journal.record('source', page_id, 'done')
+            counts['sourced'] += len(buildings)
+            for building in fresh:
+                emit(building)
+
+        if known:
+            asyncio.run(lead_sourcer.source_cities(known, max_pages, concurrency, on_page=on_page, skip=skip,
+                                                   stop=stop))
+    return produce
+
+
+def enrich_one(use_apollo: bool):
+    def enrich(building: dict) -> list:
+        contacts = contact_enricher.enrich_building(building, use_apollo)
+        contact_enricher.save_batch([(building, contacts)])
+        return [{**contact, 'buildings': building} for contact in contacts if contact.get('id')]
+    return enrich
+
+
+def pending_contacts(limit: int):
+    """seed() for the write stage: 'new' contacts from earlier runs that have no intro yet."""
+    def seed() -> list:
+        contacts = [contact for contact in iter_contacts(status='new', limit=limit, projection='write')
+                    if contact.get('email')]
+        existing = get_outreach_sequences([contact['id'] for contact in contacts])
+        return [contact for contact in contacts if (contact['id'], 1) not in existing]
+    return seed
+
+
+def write_one(template: dict, limiter: AdaptiveLimiter):
+    def write(contact: dict) -> list:
+        if not contact.get('email'):
+            return []
+        return [(contact, outreach_writer.write_draft(contact, template, 1, limiter))]
+    return write
+
+
+def save_many(drafts: list) -> list:
+    contacts = {contact['id']: contact for contact, _ in drafts}
+    return [(row, contacts[row['contact_id']]) for row in outreach_writer.save_drafts(drafts)]
+
+
+def send_many(pacer):
+    def send(batch: list) -> list:
+        # Only send the drafts this call moved to queued; any other row was claimed elsewhere
+        claimed = set(transition_ids('outreach_emails', [email['id'] for email, _ in batch], 'draft', 'queued'))
+        batch = [(email, contact) for email, contact in batch if email['id'] in claimed]
+        if not batch:
+            return []
+        if pacer:
+            pacer.acquire(len(batch))
+        sent, bounced = email_sender.deliver(batch)
+        email_sender.record_delivery(sent, bounced)
+        return sent
+    return send
+
+
+def run(cities: list = None, max_pages: int = 3, limit: int = 50, use_ai: bool = True, dry_run: bool = False,
+        source_concurrency: int = lead_sourcer.MAX_CONCURRENCY, enrich_workers: int = contact_enricher.WORKERS,
+        write_concurrency: int = outreach_writer.AI_CONCURRENCY, queue_size: int = QUEUE_SIZE,
+        journal: RunJournal = None) -> dict:
+    """Stream new buildings through enrichment, writing and sending. `limit` caps buildings and contacts.
+
+    Items are recorded in `journal` when given, and those it already has done are skipped.
+    """
+    cities = cities or TARGET_CITIES
+
+    use_apollo = bool(contact_enricher.APOLLO_API_KEY)
+    if not use_apollo:
+        print("Note: APOLLO_API_KEY not set. Using website scraping only.")
+    if use_ai and not outreach_writer.ANTHROPIC_API_KEY:
+        print("Note: ANTHROPIC_API_KEY not set. Using template fill.")
+        use_ai = False
+    template = outreach_writer.get_template(1)
+    limiter = AdaptiveLimiter(write_concurrency) if use_ai else None
+
+    def journaled(stage, fn, key, batch=False):
+        return journal.wrap(stage, fn, key, batch) if journal else fn
+
+    building_id = lambda building: building['id']
+    contact_id = lambda contact: contact['id']
+    draft_contact_id = lambda draft: draft[0]['id']
+    counts = {'sourced': 0}
+    stages = [
+        Stage('enrich', journaled('enrich', enrich_one(use_apollo), building_id), workers=enrich_workers,
+              limit=limit, queue_size=queue_size, seed=lambda: iter_buildings(status='new', limit=limit, projection='enrich'),
+              key=building_id),
+        Stage('write', journaled('write', write_one(template, limiter), contact_id),
+              workers=write_concurrency if use_ai else 1, limit=limit, queue_size=queue_size,
+              seed=pending_contacts(limit), key=contact_id),
+        Stage('save', journaled('save', save_many, draft_contact_id, batch=True),
+              batch_size=outreach_writer.DRAFT_BATCH_SIZE, queue_size=queue_size),
+    ]
+
+    send_stage = None
+    if dry_run:
+        print("Dry run: drafts are written but not sent")
+    elif not RESEND_API_KEY:
+        print("Note: RESEND_API_KEY not set. Drafts are written but not sent.")
+    else:
+        warmup_limit = email_sender.get_warmup_limit()
+        remaining = warmup_limit - email_sender.get_today_send_count()
+        if remaining > 0:
+            pacer = email_sender.send_pacer(warmup_limit)
+            batch_size = pacer.capacity if pacer else email_sender.BATCH_SIZE
+            send_stage = Stage('send', journaled('send', send_many(pacer), lambda pair: pair[0]['id'], batch=True),
+                               batch_size=batch_size, limit=remaining, queue_size=queue_size)
+            stages.append(send_stage)
+        else:
+            print(f"Daily limit reached ({warmup_limit} emails). Drafts are written but not sent.")
+
+    print(f"Streaming {len(cities)} cities → enrich ({enrich_workers} workers) → write "
+          f"({write_concurrency if use_ai else 1} {'AI' if use_ai else 'template'}) → send\n")
+    if use_ai:
+        outreach_writer.ai_stats.update({'latencies': [], 'retries': 0, 'fallbacks': 0})
+        outreach_writer.ai_usage.reset()
+    stop = threading.Event()
+    stats = run_pipeline(sourced_buildings(cities, max_pages, source_concurrency, counts, journal, stop), stages,
+                         stop=stop)
+
+    print(f"\n{'='*50}")
+    print(f"Sourced {counts['sourced']} buildings")
+    print_pipeline_stats(stats)
+    if journal:
+        skipped = {stage.name: stage.fn.skipped['n'] for stage in stages if stage.fn.skipped['n']}
+        if skipped:
+            print("Already done in this run: " + ', '.join(f"{n} {name}" for name, n in skipped.items()))
+    if send_stage is not None and stats['send']['first_out'] is not None:
+        print(f"First email sent after {stats['send']['first_out']:.1f}s")
+    http_cache.print_summary()
+    contact_enricher.print_apollo_stats()
+    if limiter is not None:
+        outreach_writer.print_ai_stats(limiter)
+        print(outreach_writer.ai_usage.summary())
+    print_stats()
+    print_payload_stats()
+    print(f"{'='*50}")
+    return stats
+
+
+if __name__ == '__main__':
+    import argparse
+    parser = argparse.ArgumentParser(description='Streaming pipeline — source, enrich, write and send overlapped')
+    parser.add_argument('--cities', nargs='+', help='Cities to search')
+    parser.add_argument('--pages', type=int, default=3, help='Max pages per city')
+    parser.add_argument('--limit', type=int, default=50, help='Max buildings to enrich / contacts to write')
+    parser.add_argument('--no-ai', action='store_true', help='Skip AI personalization')
+    parser.add_argument('--dry-run', action='store_true', help='Write drafts but do not send')
+    parser.add_argument('--source-concurrency', type=int, default=lead_sourcer.MAX_CONCURRENCY)
+    parser.add_argument('--enrich-workers', type=int, default=contact_enricher.WORKERS)
+    parser.add_argument('--write-concurrency', type=int, default=outreach_writer.AI_CONCURRENCY)
+    parser.add_argument('--queue-size', type=int, default=QUEUE_SIZE, help='Max items waiting between stages')
+    args = parser.parse_args()
+    run(cities=args.cities, max_pages=args.pages, limit=args.limit, use_ai=not args.no_ai, dry_run=args.dry_run,
+        source_concurrency=args.source_concurrency, enrich_workers=args.enrich_workers,
+        write_concurrency=args.write_concurrency, queue_size=args.queue_size)
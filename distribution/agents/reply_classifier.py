@@ -1,28 +1,54 @@
 """
 Agent 6 — Reply Classifier
-Uses Claude AI to classify incoming replies and take action:
+Classifies incoming replies and takes action. Auto-replies and unsubscribe
+requests are recognized locally (utils/reply_rules.py); everything else goes
+to Claude:
   - interested    → mark contact as 'replied', suggest response
   - not_interested → mark contact as 'rejected', stop sequence
   - out_of_office  → keep in sequence, retry later
   - wrong_person   → mark contact as 'rejected', note reason
   - unsubscribe    → mark contact as 'unsubscribed', stop all
   - question       → mark as 'replied', draft an answer
+  - bounced        → mark the email as 'bounced', stop sequence
 
 Usage:
     python reply_classifier.py --email "their reply text here"
-    python reply_classifier.py --check-inbox   # Check for new replies via IMAP
+    python reply_classifier.py --check-inbox   # New replies since the last check (IMAP, or --maildir DIR)
+    python reply_classifier.py --check-inbox --watch 300   # Keep polling
     python run.py classify                      # Run from main CLI
+    python run.py classify --file replies.jsonl --batch   # Bulk, via the Message Batches API
+    python run.py classify --mbox inbox.mbox             # Bulk, from a mailbox (or --maildir DIR)
 """
 
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from itertools import islice
 import sys
 import os
 import json
+import time
 from datetime import datetime, timezone
 sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
 import anthropic
-from utils.db import get_db, update_contact, update_outreach_email
-from utils.config import ANTHROPIC_API_KEY
+from utils.db import (
+    get_contacts_by_email, get_latest_sent_emails, get_outreach_by_message_ids, get_outreach_email_ids,
+    transition_many, update_contact,
+)
+from utils.config import ANTHROPIC_API_KEY, IMAP_HOST, IMAP_PORT, IMAP_USER, IMAP_PASSWORD, IMAP_FOLDER
+from utils import ai_batch
+from utils.ai_usage import TokenUsage
+from utils.mail import iter_messages
+from utils.inbox import ImapSource, MaildirSource
+from utils.reply_rules import pre_classify
+
+CLASSIFY_CONCURRENCY = 8
+MAILBOX_CHUNK_SIZE = 100  # messages matched and written back together
+INBOX_POLL_SECONDS = 300
+INBOX_MAX_ATTEMPTS = 3
+
+# Message-ID → our outreach email (or None), filled by lookup_threads
+message_index = {}
+MESSAGE_INDEX_MAX = 50000
 
 CATEGORIES = {
     'interested': {
@@ -61,35 +87,28 @@ CATEGORIES = {
         'stop_sequence': True,
         'description': 'Asking about pricing, details, how it works',
     },
+    'bounced': {
+        'contact_status': 'emailed',  # no reply; just stop writing to a dead address
+        'email_status': 'bounced',
+        'stop_sequence': True,
+        'description': 'Delivery failure notice from a mail server, not a person',
+    },
 }
 
 
-def classify_reply(reply_text: str, original_subject: str = '', contact_name: str = '') -> dict:
-    """Use Claude to classify a reply and suggest next action."""
-    if not ANTHROPIC_API_KEY:
-        print("ERROR: ANTHROPIC_API_KEY not set")
-        return {'category': 'question', 'confidence': 0, 'summary': 'Could not classify'}
-
-    client = anthropic.Anthropic(api_key=ANTHROPIC_API_KEY)
-
+def build_classify_instructions() -> str:
+    """The part of the classification prompt that never changes between replies."""
     category_descriptions = '\n'.join(
         f'  - {cat}: {info["description"]}'
         for cat, info in CATEGORIES.items()
     )
 
-    prompt = f"""Classify this email reply into one of these categories:
+    return f"""Classify email replies into one of these categories:
 {category_descriptions}
 
 Context:
 - We sent a cold outreach email about LeaseFlex (a lease flexibility product for renters)
 - We pitched it as a zero-cost amenity for property managers that increases lease conversion
-- Original subject: {original_subject}
-- Contact name: {contact_name}
-
-Their reply:
----
-{reply_text}
----
 
 Respond in JSON with:
 - "category": one of [{', '.join(CATEGORIES.keys())}]
@@ -100,26 +119,99 @@ Respond in JSON with:
 
 JSON only, no other text."""
 
-    try:
-        response = client.messages.create(
-            model='claude-haiku-4-5-20251001',
-            max_tokens=500,
-            messages=[{'role': 'user', 'content': prompt}],
-        )
 
-        text = response.content[0].text.strip()
-        # Handle potential markdown code blocks
-        if text.startswith('```'):
-            text = text.split('\n', 1)[1].rsplit('```', 1)[0].strip()
+CLASSIFY_INSTRUCTIONS = build_classify_instructions()
+
+
+def classify_params(reply_text: str, original_subject: str = '', contact_name: str = '') -> dict:
+    """messages.create() arguments for one classification (shared by the live and batch paths).
+
+    The instructions and category list are the system prompt; only the reply
+    and its context go in the user turn.
+    """
+    prompt = f"""Original subject: {original_subject}
+Contact name: {contact_name}
+
+Their reply:
+---
+{reply_text}
+---"""
+
+    return {
+        'model': 'claude-haiku-4-5-20251001',
+        'max_tokens': 500,
+        'system': CLASSIFY_INSTRUCTIONS,
+        'messages': [{'role': 'user', 'content': prompt}],
+    }
+
+
+def parse_classification(text: str) -> dict:
+    """Parse the model's JSON answer. Raises ValueError if it isn't JSON."""
+    text = text.strip()
+    # Handle potential markdown code blocks
+    if text.startswith('```'):
+        text = text.split('\n', 1)[1].rsplit('```', 1)[0].strip()
+
+    result = json.loads(text)
+
+    # Validate category
+    if result.get('category') not in CATEGORIES:
+        result['category'] = 'question'
+
+    return result
+
+
+ai_usage = TokenUsage()
+rule_stats = {'rules': 0, 'model': 0}
+
+client = None
+
+def get_client():
+    global client
+    if client is None:
+        client = anthropic.Anthropic(api_key=ANTHROPIC_API_KEY)
+    return client
+
+
+def try_rules(reply_text: str, subject: str = '', headers=None):
+    """The local pre-classifier's answer (out_of_office / unsubscribe / bounced), or None to ask the model."""
+    result = pre_classify(reply_text, subject, headers)
+    rule_stats['rules' if result else 'model'] += 1
+    return result
+
 
-        result = json.loads(text)
+def print_rule_stats():
+    total = rule_stats['rules'] + rule_stats['model']
+    if total:
+        print(f"Rules: {rule_stats['rules']}/{total} resolved locally ({rule_stats['rules'] * 100 // total}%), "
+              f"{rule_stats['rules']} LLM calls avoided")
 
-        # Validate category
-        if result.get('category') not in CATEGORIES:
-            result['category'] = 'question'
 
+def request_classification(reply_text: str, original_subject: str = '', contact_name: str = '') -> dict:
+    """One classification call. Raises on API or parse errors; safe to call from workers."""
+    response = get_client().messages.create(**classify_params(reply_text, original_subject, contact_name))
+    ai_usage.add(response.usage)
+    return parse_classification(response.content[0].text)
+
+
+def classify_reply(reply_text: str, original_subject: str = '', contact_name: str = '', subject: str = '',
+                   headers=None) -> dict:
+    """Classify a reply and suggest next action: local rules first, Claude for anything ambiguous.
+
+    `subject` and `headers` are the reply's own, which the auto-reply rules look at;
+    `original_subject` is our outreach email's, given to the model as context.
+    """
+    result = try_rules(reply_text, subject, headers)
+    if result:
         return result
 
+    if not ANTHROPIC_API_KEY:
+        print("ERROR: ANTHROPIC_API_KEY not set")
+        return {'category': 'question', 'confidence': 0, 'summary': 'Could not classify'}
+
+    try:
+        return request_classification(reply_text, original_subject, contact_name)
+
     except Exception as e:
         print(f"Classification error: {e}")
         return {
@@ -131,29 +223,91 @@ JSON only, no other text."""
         }
 
 
-def process_reply(contact_email: str, reply_text: str) -> dict:
-    """Classify a reply and update the database accordingly."""
-    db = get_db()
+def apply_classifications(items: list) -> dict:
+    """Write (contact, original_email, result) classifications back to the database in bulk.
+
+    Status changes are grouped into one guarded transition per (current, target)
+    status pair, so a row that moved on since it was read isn't overwritten;
+    only contacts whose classification carried notes get an update of their own.
+    Each group is written on its own: one that fails is logged and its contact
+    ids are returned under 'write_failed', without holding up the rest.
+    Returns counts of contacts, emails and cancelled follow-ups touched.
+    """
+    today = datetime.now().strftime('%Y-%m-%d')
+    contact_transitions = {}  # (from_status, to_status, stops sequence) -> ids
+    email_transitions = {}    # (from_status, to_status) -> [(email id, contact id)]
+    stopped = []
+    counts = {'contacts': 0, 'emails': 0, 'cancelled': 0}
+    write_failed = set()
+
+    def write(what: str, contact_ids: list, update) -> int:
+        try:
+            return update()
+        except Exception as e:
+            print(f"  ✗ {what} ({len(contact_ids)} contacts): {e}")
+            write_failed.update(contact_ids)
+            return 0
+
+    for contact, original_email, result in items:
+        category = result['category']
+        cat_config = CATEGORIES[category]
+
+        stop = cat_config['stop_sequence']
+        if result.get('notes') or contact.get('status') is None:
+            # Notes need a row update of their own, and without a known current
+            # status there's nothing to guard a bulk transition on
+            data = {'status': cat_config['contact_status']}
+            if result.get('notes'):
+                note = f"[{today}] Reply classified as {category}: {result['notes']}"
+                data['notes'] = f"{contact.get('notes') or ''}\n{note}".strip()
+            if stop:
+                data['next_action_at'] = None
+            counts['contacts'] += write(f"contact → {data['status']}", [contact['id']],
+                                        lambda: update_contact(contact['id'], data) or 1)
+        elif cat_config['contact_status'] != contact.get('status') or stop:
+            contact_transitions.setdefault(
+                (contact.get('status'), cat_config['contact_status'], stop), []).append(contact['id'])
+
+        if original_email.get('status') and cat_config['email_status'] != original_email['status']:
+            email_transitions.setdefault(
+                (original_email.get('status'), cat_config['email_status']), []).append(
+                (original_email['id'], contact['id']))
+
+        if stop:
+            stopped.append(contact['id'])
+
+    for (from_status, to_status, stop), ids in contact_transitions.items():
+        # A stopped sequence has no next follow-up for the daemon to wait on
+        extra = {'next_action_at': None} if stop else None
+        counts['contacts'] += write(f"contacts {from_status} → {to_status}", ids,
+                                    lambda: transition_many('contacts', ids, from_status, to_status, extra))
+    for (from_status, to_status), pairs in email_transitions.items():
+        counts['emails'] += write(f"emails {from_status} → {to_status}", [c for _, c in pairs],
+                                  lambda: transition_many('outreach_emails', [e for e, _ in pairs],
+                                                          from_status, to_status))
+
+    # If stop sequence, mark any pending drafts/queued as cancelled
+    if stopped:
+        def cancel() -> int:
+            pending = get_outreach_email_ids(stopped, ['draft', 'queued'])
+            # Only rows still pending; anything sent in the meantime stays sent
+            return transition_many('outreach_emails', pending, ['draft', 'queued'], 'draft') if pending else 0
+        counts['cancelled'] = write("cancel pending follow-ups", stopped, cancel)
+
+    counts['write_failed'] = sorted(write_failed)
+    return counts
+
 
+def process_reply(contact_email: str, reply_text: str, subject: str = '', headers=None) -> dict:
+    """Classify a reply (with its own subject and headers, when known) and update the database accordingly."""
     # Find the contact
-    contact_result = db.table('contacts').select('*, buildings(*)').eq('email', contact_email).execute()
-    if not contact_result.data:
+    contact = get_contacts_by_email([contact_email], projection='full').get(contact_email)
+    if not contact:
         print(f"Contact not found: {contact_email}")
         return None
 
-    contact = contact_result.data[0]
-    building = contact.get('buildings') or {}
-
     # Find the most recent outreach email to this contact
-    email_result = (db.table('outreach_emails')
-        .select('*')
-        .eq('contact_id', contact['id'])
-        .eq('status', 'sent')
-        .order('sent_at', desc=True)
-        .limit(1)
-        .execute())
-
-    original_email = email_result.data[0] if email_result.data else {}
+    original_email = get_latest_sent_emails([contact['id']]).get(contact['id'], {})
     original_subject = original_email.get('subject', '')
 
     # Classify
@@ -162,39 +316,24 @@ def process_reply(contact_email: str, reply_text: str) -> dict:
         reply_text=reply_text,
         original_subject=original_subject,
         contact_name=contact.get('full_name', ''),
+        subject=subject,
+        headers=headers,
     )
 
     category = result['category']
     cat_config = CATEGORIES[category]
 
-    print(f"  Category: {category} (confidence: {result.get('confidence', 'N/A')})")
+    source = ' via rules' if result.get('source') == 'rules' else ''
+    print(f"  Category: {category} (confidence: {result.get('confidence', 'N/A')}{source})")
     print(f"  Summary: {result.get('summary', 'N/A')}")
 
-    # Update contact status
-    contact_update = {'status': cat_config['contact_status']}
-    if result.get('notes'):
-        existing_notes = contact.get('notes') or ''
-        contact_update['notes'] = f"{existing_notes}\n[{datetime.now().strftime('%Y-%m-%d')}] Reply classified as {category}: {result.get('notes')}".strip()
-
-    update_contact(contact['id'], contact_update)
-    print(f"  Contact status → {cat_config['contact_status']}")
-
-    # Update outreach email status
-    if original_email and cat_config['email_status'] != original_email.get('status'):
-        update_outreach_email(original_email['id'], {'status': cat_config['email_status']})
+    counts = apply_classifications([(contact, original_email, result)])
+    if not counts['write_failed']:
+        print(f"  Contact status → {cat_config['contact_status']}")
+    if counts['emails']:
         print(f"  Email status → {cat_config['email_status']}")
-
-    # If stop sequence, mark any pending drafts/queued as cancelled
-    if cat_config['stop_sequence']:
-        pending = (db.table('outreach_emails')
-            .select('id')
-            .eq('contact_id', contact['id'])
-            .in_('status', ['draft', 'queued'])
-            .execute())
-        for email in (pending.data or []):
-            update_outreach_email(email['id'], {'status': 'draft'})
-        if pending.data:
-            print(f"  Cancelled {len(pending.data)} pending follow-ups")
+    if counts['cancelled']:
+        print(f"  Cancelled {counts['cancelled']} pending follow-ups")
 
     # Show suggested response
     if result.get('suggested_response'):
@@ -207,6 +346,342 @@ def process_reply(contact_email: str, reply_text: str) -> dict:
     return result
 
 
+def load_replies(path: str) -> list:
+    """Read (email, reply, subject, headers) from a JSONL file: one {"email", "reply"} object per line.
+
+    An optional "subject" (the reply's) and "headers" object are passed on to the rules.
+    """
+    replies = []
+    with open(path, encoding='utf-8') as f:
+        for line in f:
+            if line.strip():
+                item = json.loads(line)
+                replies.append((item['email'].strip().lower(), item['reply'], item.get('subject', ''),
+                                item.get('headers')))
+    return replies
+
+
+def classify_file(path: str) -> list:
+    """Classify every reply in a JSONL file with live calls, one at a time."""
+    ai_usage.reset()
+    rule_stats.update(rules=0, model=0)
+    results = [process_reply(contact_email, reply_text, subject, headers)
+               for contact_email, reply_text, subject, headers in load_replies(path)]
+    print()
+    print_rule_stats()
+    print(ai_usage.summary())
+    return results
+
+
+def submit_batch(replies: list) -> dict:
+    """Submit one Message Batch classifying every (email, reply, subject, headers) whose contact is known."""
+    contacts = get_contacts_by_email([email for email, *_ in replies], projection='full')
+    originals = get_latest_sent_emails([contact['id'] for contact in contacts.values()])
+
+    requests = []
+    items = {}
+    resolved = []
+    for i, (email, reply_text, subject, headers) in enumerate(replies):
+        contact = contacts.get(email)
+        if not contact:
+            print(f"  Contact not found: {email}")
+            continue
+        original_email = originals.get(contact['id'], {})
+        result = try_rules(reply_text, subject, headers)
+        if result:
+            resolved.append((contact, original_email, result))
+            continue
+        custom_id = f"reply-{i}"
+        requests.append({
+            'custom_id': custom_id,
+            'params': classify_params(reply_text, original_email.get('subject', ''), contact.get('full_name', '')),
+        })
+        items[custom_id] = {
+            'contact': {k: contact.get(k) for k in ('id', 'email', 'full_name', 'notes', 'status')},
+            'original_email': {k: original_email[k] for k in ('id', 'status')} if original_email else {},
+        }
+
+    if resolved:
+        apply_classifications(resolved)
+        print(f"  {len(resolved)} replies resolved by rules and applied; not sent to the batch")
+    print_rule_stats()
+
+    if not requests:
+        return None
+    return ai_batch.submit(get_client(), 'classify', requests, {'items': items})
+
+
+def finish_batch(state: dict, poll_seconds: float = ai_batch.BATCH_POLL_SECONDS) -> list:
+    """Wait for a submitted classification batch, then write every result back in bulk."""
+    ai = get_client()
+    ai_batch.wait(ai, state, poll_seconds)
+    ai_usage.reset()
+    texts = ai_batch.results(ai, state['batch_id'], usage=ai_usage)
+
+    # Statuses and notes may have moved on while the batch ran (and older
+    # batches didn't store status), so apply against the contacts as they are now
+    items = state['meta']['items']
+    current = get_contacts_by_email([item['contact']['email'] for item in items.values()], projection='full')
+
+    classified = []
+    failed = []
+    for custom_id, item in items.items():
+        try:
+            result = parse_classification(texts[custom_id])
+        except (KeyError, ValueError):
+            failed.append(item['contact']['email'])
+            continue
+        contact = {**item['contact'], **current.get(item['contact']['email'], {})}
+        classified.append((contact, item['original_email'], result))
+
+    counts = apply_classifications(classified)
+    ai_batch.finish('classify')
+
+    by_category = {}
+    for _, _, result in classified:
+        by_category[result['category']] = by_category.get(result['category'], 0) + 1
+
+    print(f"\n{'='*50}")
+    print(f"Classified {len(classified)} replies from batch {state['batch_id']}")
+    for category, n in sorted(by_category.items(), key=lambda kv: -kv[1]):
+        print(f"  {category}: {n}")
+    print(f"Updated {counts['contacts']} contacts, {counts['emails']} emails, "
+          f"cancelled {counts['cancelled']} pending follow-ups")
+    if failed:
+        print(f"✗ {len(failed)} replies could not be classified: {', '.join(failed)}")
+    if counts['write_failed']:
+        print(f"✗ {len(counts['write_failed'])} contacts could not be updated (see above)")
+    print(ai_usage.summary())
+    print(f"{'='*50}")
+    return classified
+
+
+def read_replies(path: str = None, mbox: str = None, maildir: str = None) -> list:
+    """(sender email, reply text, subject, headers) from a JSONL file, an mbox file or a Maildir."""
+    if path:
+        return load_replies(path)
+    fmt, box_path = ('mbox', mbox) if mbox else ('maildir', maildir)
+    return [(m['sender'], m['text'], m['subject'], m['message'])
+            for m in iter_messages(box_path, fmt) if m['sender'] and m['text']]
+
+
+def lookup_threads(refs: list) -> dict:
+    """Our outreach emails by Message-ID, from message_index; unknown ids are fetched in one bulk lookup."""
+    unknown = {ref for ref in refs if ref not in message_index}
+    if unknown:
+        if len(message_index) > MESSAGE_INDEX_MAX:
+            message_index.clear()
+        found = get_outreach_by_message_ids(list(unknown))
+        for ref in unknown:
+            message_index[ref] = found.get(ref)
+    return message_index
+
+
+def classify_chunk(pool, messages: list, totals: dict) -> list:
+    """Match one chunk of parsed messages to contacts, classify them on the pool and write back.
+
+    A reply whose In-Reply-To / References carries one of our Message-IDs is
+    threaded to that outreach email directly; the rest are matched by sender.
+    Returns the keys of messages whose classification or write-back failed.
+    """
+    index = lookup_threads([ref for m in messages for ref in m.get('references', [])])
+    threads = {}
+    for message in messages:
+        thread = next((index[ref] for ref in message.get('references', []) if index.get(ref)), None)
+        if thread and thread.get('contacts'):
+            threads[id(message)] = thread
+
+    unthreaded = [m['sender'] for m in messages if id(m) not in threads]
+    contacts = get_contacts_by_email(unthreaded, projection='full') if unthreaded else {}
+    originals = get_latest_sent_emails([contact['id'] for contact in contacts.values()]) if contacts else {}
+
+    futures = {}
+    ruled = []
+    failed = []
+    keys = {}  # contact id -> keys of its messages in this chunk
+    for message in messages:
+        thread = threads.get(id(message))
+        if thread:
+            contact = thread['contacts']
+            original_email = {k: v for k, v in thread.items() if k != 'contacts'}
+            totals['threaded'] += 1
+        else:
+            contact = contacts.get(message['sender'])
+            original_email = originals.get(contact['id'], {}) if contact else {}
+        if not contact or not message['text']:
+            totals['unmatched'] += 1
+            continue
+        keys.setdefault(contact['id'], []).append(message['key'])
+        result = try_rules(message['text'], message['subject'], message['message'])
+        if result:
+            ruled.append((contact, original_email, result))
+            continue
+        future = pool.submit(request_classification, message['text'],
+                             original_email.get('subject') or message['subject'], contact.get('full_name', ''))
+        futures[future] = (contact, original_email, message['key'])
+
+    items = []
+    for contact, original_email, result in ruled:
+        items.append((contact, original_email, result))
+        totals['categories'][result['category']] = totals['categories'].get(result['category'], 0) + 1
+        print(f"  ✓ {contact['email']}: {result['category']} (rules)")
+    for future in as_completed(futures):
+        contact, original_email, key = futures[future]
+        try:
+            result = future.result()
+        except Exception as e:
+            totals['failed'] += 1
+            failed.append(key)
+            print(f"  ✗ {contact['email']}: {e}")
+            continue
+        items.append((contact, original_email, result))
+        totals['categories'][result['category']] = totals['categories'].get(result['category'], 0) + 1
+        print(f"  ✓ {contact['email']}: {result['category']}")
+
+    counts = apply_classifications(items)
+    for contact_id in counts.pop('write_failed'):
+        # Not written back, so retried like a failed classification
+        retry = [key for key in keys[contact_id] if key not in failed]
+        totals['failed'] += len(retry)
+        failed.extend(retry)
+    for key, n in counts.items():
+        totals[key] += n
+    return failed
+
+
+def new_totals() -> dict:
+    return {'messages': 0, 'threaded': 0, 'unmatched': 0, 'failed': 0, 'categories': {},
+            'contacts': 0, 'emails': 0, 'cancelled': 0}
+
+
+def print_totals(totals: dict, elapsed: float):
+    classified = sum(totals['categories'].values())
+    print(f"\n{'='*50}")
+    print(f"Classified {classified} of {totals['messages']} messages "
+          f"({totals['threaded']} threaded by Message-ID, {totals['unmatched']} not from a known contact, "
+          f"{totals['failed']} failed)")
+    for category, n in sorted(totals['categories'].items(), key=lambda kv: -kv[1]):
+        print(f"  {category}: {n}")
+    print(f"Updated {totals['contacts']} contacts, {totals['emails']} emails, "
+          f"cancelled {totals['cancelled']} pending follow-ups")
+    print(f"Time: {elapsed:.1f}s ({totals['messages'] / max(elapsed, 1e-6):.1f} messages/s)")
+    print_rule_stats()
+    print(ai_usage.summary())
+    print(f"{'='*50}")
+
+
+def classify_mailbox(path: str, fmt: str, concurrency: int = CLASSIFY_CONCURRENCY) -> dict:
+    """Classify every reply in an mbox file / Maildir directory.
+
+    Messages are read as a stream in chunks; each chunk's senders are matched to
+    contacts in one lookup, classified concurrently (at most `concurrency` calls
+    in flight) and its status changes applied in bulk.
+    """
+    if not ANTHROPIC_API_KEY:
+        print("ERROR: ANTHROPIC_API_KEY not set")
+        return {}
+
+    print(f"Classifying replies from {fmt} {path} ({concurrency} concurrent)...\n")
+    ai_usage.reset()
+    rule_stats.update(rules=0, model=0)
+    started = time.monotonic()
+    totals = new_totals()
+
+    messages = iter_messages(path, fmt)
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        while True:
+            chunk = list(islice(messages, MAILBOX_CHUNK_SIZE))
+            if not chunk:
+                break
+            totals['messages'] += len(chunk)
+            classify_chunk(pool, chunk, totals)
+
+    print_totals(totals, time.monotonic() - started)
+    return totals
+
+
+def inbox_source(maildir: str = None):
+    """The --check-inbox source: a Maildir directory if given, else the IMAP account from .env."""
+    if maildir:
+        return MaildirSource(maildir)
+    if not (IMAP_HOST and IMAP_USER):
+        raise ValueError("Set IMAP_HOST / IMAP_USER / IMAP_PASSWORD in .env, or pass --maildir")
+    return ImapSource(IMAP_HOST, IMAP_USER, IMAP_PASSWORD, IMAP_FOLDER, IMAP_PORT)
+
+
+def check_inbox(source, watch: float = None, concurrency: int = CLASSIFY_CONCURRENCY,
+                batch_size: int = MAILBOX_CHUNK_SIZE) -> dict:
+    """Classify replies that arrived since the last check, `batch_size` at a time.
+
+    The source's watermark advances after each batch is written back. A
+    message whose classification or write-back fails is retried on later polls (up to
+    INBOX_MAX_ATTEMPTS) before it's skipped. With `watch`, keeps polling
+    every `watch` seconds until interrupted.
+    """
+    if not ANTHROPIC_API_KEY:
+        print("ERROR: ANTHROPIC_API_KEY not set")
+        return {}
+
+    print(f"Checking {source.name} for new replies...\n")
+    ai_usage.reset()
+    rule_stats.update(rules=0, model=0)
+    started = time.monotonic()
+    totals = new_totals()
+
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        try:
+            while True:
+                while True:
+                    messages = source.new_messages(batch_size)
+                    if not messages:
+                        break
+                    totals['messages'] += len(messages)
+                    retry = set()
+                    for key in classify_chunk(pool, messages, totals):
+                        # Failures are counted in the inbox state, so the cap holds across cron runs
+                        if source.state.add_failure(source.name, key) < INBOX_MAX_ATTEMPTS:
+                            retry.add(key)
+                    source.commit([m['key'] for m in messages], retry)
+                    if retry:
+                        break  # leave the rest for the next poll rather than hammering a failing API
+                if not watch:
+                    break
+                time.sleep(watch)
+        except KeyboardInterrupt:
+            print("\nStopped.")
+        finally:
+            source.close()
+
+    print_totals(totals, time.monotonic() - started)
+    return totals
+
+
+def run_batch(path: str = None, mbox: str = None, maildir: str = None) -> list:
+    """Classify replies (JSONL file, mbox or Maildir) through the Message Batches API.
+
+    A batch left unfinished by an earlier run is resumed first.
+    """
+    if not ANTHROPIC_API_KEY:
+        print("ERROR: ANTHROPIC_API_KEY not set")
+        return []
+
+    state = ai_batch.pending('classify')
+    if state:
+        print(f"Resuming batch {state['batch_id']} ({state['count']} replies)...")
+        return finish_batch(state)
+
+    if not (path or mbox or maildir):
+        print("No pending batch. Pass a replies file or mailbox to submit one.")
+        return []
+
+    rule_stats.update(rules=0, model=0)
+    state = submit_batch(read_replies(path, mbox, maildir))
+    if not state:
+        print("Nothing left for the model to classify.")
+        return []
+    return finish_batch(state)
+
+
 def run_interactive():
     """Interactive mode: paste in a reply and classify it."""
     print("=" * 50)
@@ -247,13 +722,29 @@ if __name__ == '__main__':
     parser.add_argument('--email', help='Contact email address')
     parser.add_argument('--reply', help='Reply text (or use interactive mode)')
     parser.add_argument('--interactive', action='store_true', help='Interactive paste mode')
+    parser.add_argument('--file', help='JSONL file of {"email", "reply"} objects')
+    parser.add_argument('--mbox', help='Classify every reply in an mbox file')
+    parser.add_argument('--maildir', help='Classify every reply in a Maildir directory')
+    parser.add_argument('--concurrency', type=int, default=CLASSIFY_CONCURRENCY, help='Max AI requests in flight')
+    parser.add_argument('--batch', action='store_true', help='Classify via the Message Batches API (resumable)')
+    parser.add_argument('--check-inbox', action='store_true', help='Classify replies that arrived since the last check')
+    parser.add_argument('--watch', type=float, nargs='?', const=INBOX_POLL_SECONDS, metavar='SECONDS',
+                        help=f'With --check-inbox, keep polling (default every {INBOX_POLL_SECONDS}s)')
     args = parser.parse_args()
 
     from dotenv import load_dotenv
     from pathlib import Path
     load_dotenv(Path(__file__).parent.parent / '.env')
 
-    if args.email and args.reply:
+    if args.check_inbox:
+        check_inbox(inbox_source(args.maildir), watch=args.watch, concurrency=args.concurrency)
+    elif args.batch:
+        run_batch(args.file, args.mbox, args.maildir)
+    elif args.mbox or args.maildir:
+        classify_mailbox(args.mbox or args.maildir, 'mbox' if args.mbox else 'maildir', args.concurrency)
+    elif args.file:
+        classify_file(args.file)
+    elif args.email and args.reply:
         classify_from_text(args.email, args.reply)
     else:
         run_interactive()
@@ -6,7 +6,7 @@ These are the companies you'll manually prospect first.
 import sys
 import os
 sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
-from utils.db import insert_building, insert_contact
+from utils.db import upsert_buildings
 
 # Top property management companies — mix of institutional and mid-size
 TARGETS = [
@@ -58,16 +58,19 @@ TARGETS = [
 def run():
     """Seed the database with target companies."""
     print(f"Seeding {len(TARGETS)} target buildings...\n")
-    added = 0
+    try:
+        ids = upsert_buildings([{**target, 'status': 'new'} for target in TARGETS])
+    except Exception as e:
+        print(f"  ✗ Seed failed: {e}")
+        return 0
 
-    for target in TARGETS:
-        try:
-            result = insert_building({**target, 'status': 'new'})
-            if result:
-                added += 1
-                print(f"  ✓ {target['name']} — {target['city']}, {target['state']}")
-        except Exception as e:
-            print(f"  ✗ {target['name']}: {e}")
+    added = 0
+    for target, building_id in zip(TARGETS, ids):
+        if building_id:
+            added += 1
+            print(f"  ✓ {target['name']} — {target['city']}, {target['state']}")
+        else:
+            print(f"  ✗ {target['name']}: not saved")
 
     print(f"\n{'='*50}")
     print(f"Seeded {added} buildings")
@@ -7,14 +7,22 @@ Runs on a schedule (via cron/launchd) to automatically:
   2. Generate follow-up drafts
   3. Send them (respecting warm-up limits)
 
+The daemon keeps a heap of contacts' next_action_at times (set when an email
+is sent, cleared when a reply stops the sequence) and sleeps until the
+earliest one, so follow-ups go out when they're due and an idle day costs
+nothing. SIGTERM / SIGINT finish the current cycle and exit.
+
 Usage:
     python auto_followup.py              # Run once (for cron)
-    python auto_followup.py --daemon     # Run continuously (checks every 6 hours)
+    python auto_followup.py --daemon     # Run continuously, waking when the next follow-up is due
     python auto_followup.py --dry-run    # Preview without sending
 """
 
 import sys
 import os
+import heapq
+import signal
+import threading
 import time
 import logging
 from datetime import datetime, timezone
@@ -22,7 +30,8 @@ from datetime import datetime, timezone
 sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
 
 from utils.config import RESEND_API_KEY
-from agents.followup_manager import run as check_followups
+from agents.followup_manager import run as check_followups, refresh_next_actions
+from utils.db import get_next_actions
 from agents.email_sender import run as send_emails
 
 # Set up logging
@@ -39,7 +48,9 @@ logging.basicConfig(
 )
 log = logging.getLogger(__name__)
 
-CHECK_INTERVAL_HOURS = 6
+SCHEDULE_SIZE = 1000     # soonest next actions held in memory
+RELOAD_MINUTES = 60      # re-read the schedule to pick up emails sent by other processes
+RETRY_MINUTES = 60       # a contact still due after a cycle (daily limit, error) waits this long
 
 
 def run_cycle(dry_run: bool = False):
@@ -74,20 +85,80 @@ def run_cycle(dry_run: bool = False):
     log.info("\nCycle complete.\n")
 
 
+def parse_time(value: str) -> float:
+    return datetime.fromisoformat(value.replace('Z', '+00:00')).timestamp()
+
+
+def load_schedule(cycle_at: float = 0, retry_at: float = 0) -> list:
+    """Heap of (due timestamp, contact_id), soonest first.
+
+    Contacts that were already due when the last cycle ran at `cycle_at`, and
+    that it left unsent, wait until `retry_at`. Later due times are kept as they are.
+    """
+    heap = []
+    for contact_id, due in get_next_actions(SCHEDULE_SIZE):
+        due = parse_time(due)
+        heap.append((retry_at if due <= cycle_at else due, contact_id))
+    heapq.heapify(heap)
+    return heap
+
+
+def pop_due(heap: list, now: float) -> set:
+    due = set()
+    while heap and heap[0][0] <= now:
+        due.add(heapq.heappop(heap)[1])
+    return due
+
+
 def run_daemon(dry_run: bool = False):
-    """Run continuously, checking every CHECK_INTERVAL_HOURS."""
-    log.info(f"Starting auto follow-up daemon (checking every {CHECK_INTERVAL_HOURS} hours)")
-    log.info("Press Ctrl+C to stop\n")
+    """Run continuously, sleeping until the next follow-up is due."""
+    stop = threading.Event()
 
-    while True:
-        try:
-            run_cycle(dry_run=dry_run)
-        except Exception as e:
-            log.error(f"Cycle error: {e}")
+    def shutdown(signum, frame):
+        log.info(f"Received {signal.Signals(signum).name}, stopping after the current cycle")
+        stop.set()
 
-        next_check = datetime.now(timezone.utc).isoformat()
-        log.info(f"Next check in {CHECK_INTERVAL_HOURS} hours...")
-        time.sleep(CHECK_INTERVAL_HOURS * 3600)
+    signal.signal(signal.SIGTERM, shutdown)
+    signal.signal(signal.SIGINT, shutdown)
+
+    log.info("Starting auto follow-up daemon")
+    try:
+        log.info(f"Scheduled follow-ups for {refresh_next_actions()} contacts")
+    except Exception as e:
+        log.error(f"Error refreshing schedule: {e}")
+
+    cycle_at = retry_at = 0.0
+    heap = []
+    loaded_at = None
+    while not stop.is_set():
+        now = time.time()
+        if loaded_at is None or now - loaded_at >= RELOAD_MINUTES * 60:
+            try:
+                heap = load_schedule(cycle_at, retry_at)
+                loaded_at = now
+            except Exception as e:
+                log.error(f"Error loading schedule: {e}")
+                loaded_at = now  # keep the current heap, try again next reload
+
+        due = pop_due(heap, now)
+        if due:
+            log.info(f"{len(due)} contacts due for follow-up")
+            cycle_at = now
+            try:
+                run_cycle(dry_run=dry_run)
+            except Exception as e:
+                log.error(f"Cycle error: {e}")
+            # Anyone the cycle couldn't send to stays due; don't retry them straight away
+            retry_at = time.time() + RETRY_MINUTES * 60
+            loaded_at = None
+            continue
+
+        wake = min(heap[0][0] if heap else float('inf'), loaded_at + RELOAD_MINUTES * 60)
+        if heap:
+            log.info(f"Next follow-up due {datetime.fromtimestamp(heap[0][0], timezone.utc).isoformat()}")
+        stop.wait(max(wake - time.time(), 0))
+
+    log.info("Daemon stopped")
 
 
 if __name__ == '__main__':
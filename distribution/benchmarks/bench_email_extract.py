@@ -0,0 +1,104 @@
+#!/usr/bin/env python3
+"""
+Microbenchmark: legacy website email extraction vs utils.email_extract.
+
+The legacy path is the pre-streaming contact_enricher logic: findall over the
+whole text, then a list of substring checks per match (run twice per site with
+two different skip lists). The new path is one precompiled pattern with set
+lookups, fed in network-sized chunks and stopped at MAX_PAGE_BYTES.
+
+Usage:
+    python benchmarks/bench_email_extract.py [--size-mb 5] [--repeat 5]
+"""
+
+import argparse
+import os
+import random
+import re
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from utils.email_extract import EmailExtractor, extract_emails, MAX_PAGE_BYTES
+
+LEGACY_SKIPS = [
+    'example.com', 'sentry', 'webpack', '.png', '.jpg',
+    'wixpress', 'schema.org', 'googleapis', 'cloudflare',
+    'noreply', 'no-reply', '@w3.org',
+]
+
+
+def legacy_extract(text: str) -> set:
+    emails = re.findall(r'[a-zA-Z0-9._%+-]+@[a-zA-Z0-9.-]+\.[a-zA-Z]{2,}', text)
+    filtered = set()
+    for email in emails:
+        email = email.lower()
+        if not any(skip in email for skip in LEGACY_SKIPS):
+            filtered.add(email)
+    return filtered
+
+
+def make_page(size_bytes: int, seed: int = 7) -> str:
+    rng = random.Random(seed)
+    filler = '<div class="card"><p>Luxury studios and one-bedrooms with rooftop access.</p></div>\n'
+    snippets = [
+        '<a href="mailto:leasing{n}@greystar.com?subject=Tour">Email us</a>\n',
+        '<p>Contact jane.doe{n}@bozzuto.com for details</p>\n',
+        '<img src="/img/logo{n}@2x.png">\n',
+        '<script>dsn="https://abc{n}@o123.ingest.sentry.io/1"</script>\n',
+        '<p>noreply{n}@mailer.example.com</p>\n',
+    ]
+    parts = []
+    total = 0
+    n = 0
+    while total < size_bytes:
+        piece = snippets[rng.randrange(len(snippets))].format(n=n) if rng.random() < 0.05 else filler
+        parts.append(piece)
+        total += len(piece)
+        n += 1
+    return ''.join(parts)
+
+
+def bench(fn, repeat: int) -> float:
+    best = float('inf')
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - started)
+    return best
+
+
+def stream(text: str, chunk_size: int = 16 * 1024, max_bytes: int = MAX_PAGE_BYTES) -> set:
+    extractor = EmailExtractor()
+    for i in range(0, min(len(text), max_bytes), chunk_size):
+        extractor.feed(text[i:i + chunk_size])
+    return extractor.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark email extraction on large pages')
+    parser.add_argument('--size-mb', type=float, default=5, help='Synthetic page size')
+    parser.add_argument('--repeat', type=int, default=5, help='Runs per variant (best time wins)')
+    args = parser.parse_args()
+
+    text = make_page(int(args.size_mb * 1024 * 1024))
+    print(f"Page: {len(text) / (1024 * 1024):.1f} MB, byte cap {MAX_PAGE_BYTES // 1024} KB\n")
+
+    legacy = bench(lambda: legacy_extract(text), args.repeat)
+    full = bench(lambda: extract_emails(text), args.repeat)
+    chunked = bench(lambda: stream(text, max_bytes=len(text)), args.repeat)
+    capped = bench(lambda: stream(text), args.repeat)
+
+    print(f"  legacy (findall + substring skips): {legacy * 1000:8.1f} ms")
+    print(f"  single pass, whole page:            {full * 1000:8.1f} ms  ({legacy / full:.1f}x)")
+    print(f"  single pass, streamed in chunks:    {chunked * 1000:8.1f} ms  ({legacy / chunked:.1f}x)")
+    print(f"  single pass, streamed + byte cap:   {capped * 1000:8.1f} ms  ({legacy / capped:.1f}x)")
+
+    found_legacy = legacy_extract(text)
+    found_new = extract_emails(text)
+    print(f"\n  emails: legacy {len(found_legacy)}, new {len(found_new)} "
+          f"(new-only: {len(found_new - found_legacy)}, legacy-only: {len(found_legacy - found_new)})")
+
+
+if __name__ == '__main__':
+    main()
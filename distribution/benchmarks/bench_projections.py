@@ -0,0 +1,149 @@
+#!/usr/bin/env python3
+"""
+Microbenchmark: response payload of the utils.db projection profiles.
+
+Builds synthetic rows shaped like the real tables (full email bodies, notes,
+every building column, the joined contact and building), cuts them down to
+each profile's column list the way PostgREST would, and reports the JSON size
+of a page and the time to decode it. Each hot caller's profile is compared
+against 'full', which is what it used to fetch.
+
+Usage:
+    python benchmarks/bench_projections.py [--rows 500] [--repeat 20]
+"""
+
+import argparse
+import json
+import os
+import random
+import sys
+import time
+import uuid
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from utils.db import PROJECTIONS, PAGE_SIZE
+
+# (table, profile, caller) for the paths that page through whole statuses
+HOT_CALLERS = [
+    ('outreach_emails', 'ids', 'email_sender.queue_drafts'),
+    ('outreach_emails', 'send', 'email_sender.run'),
+    ('contacts', 'write', 'outreach_writer.run / pipeline seed'),
+    ('buildings', 'enrich', 'contact_enricher.run / pipeline seed'),
+]
+
+WORDS = ('flexible lease terms furnished units corporate housing occupancy vacancy renewal '
+         'portfolio residents amenities rooftop concierge downtown quarterly pricing').split()
+
+
+def sentence(rng: random.Random, words: int) -> str:
+    return ' '.join(rng.choice(WORDS) for _ in range(words)).capitalize() + '.'
+
+
+def make_building(rng: random.Random, n: int) -> dict:
+    return {
+        'id': str(uuid.UUID(int=rng.getrandbits(128))),
+        'created_at': f'2026-03-{n % 28 + 1:02d}T12:00:00.000000+00:00',
+        'name': f'The Residences at {n} Main', 'company': 'Greystar Real Estate Partners',
+        'address': f'{n} Main Street, Suite {n % 40}', 'city': 'New York', 'state': 'NY',
+        'unit_count': 100 + n % 300, 'property_url': f'https://www.apartments.com/residences-{n}-main/abc{n}/',
+        'source': 'apartments_com', 'status': 'new', 'notes': ' '.join(sentence(rng, 12) for _ in range(4)),
+    }
+
+
+def make_contact(rng: random.Random, n: int, building: dict) -> dict:
+    return {
+        'id': str(uuid.UUID(int=rng.getrandbits(128))), 'created_at': building['created_at'],
+        'building_id': building['id'], 'full_name': f'Jordan Lee{n}', 'title': 'Regional Asset Manager',
+        'email': f'jordan.lee{n}@greystar.com', 'linkedin_url': f'https://www.linkedin.com/in/jordan-lee-{n}',
+        'phone': f'+1 212 555 {n % 10000:04d}', 'source': 'apollo', 'status': 'new', 'next_action_at': None,
+        'buildings': building,
+    }
+
+
+def make_email(rng: random.Random, n: int, contact: dict) -> dict:
+    building = contact['buildings']
+    return {
+        'id': str(uuid.UUID(int=rng.getrandbits(128))), 'created_at': contact['created_at'],
+        'contact_id': contact['id'], 'building_id': building['id'], 'sequence_number': 1,
+        'subject': f"Flexible leases at {building['name']}",
+        'body': '\n\n'.join(' '.join(sentence(rng, 14) for _ in range(3)) for _ in range(4)),
+        'status': 'queued', 'message_id': f'<{uuid.UUID(int=rng.getrandbits(128))}@leaseflex.io>',
+        'sent_at': None, 'delivered_at': None, 'opened_at': None, 'clicked_at': None, 'bounced_at': None,
+        'complained_at': None, 'replied_at': None,
+        'contacts': {k: v for k, v in contact.items() if k != 'buildings'}, 'buildings': building,
+    }
+
+
+def parse_columns(columns: str) -> list:
+    """PostgREST select list → [(column, nested columns or None)]."""
+    parts, depth, start = [], 0, 0
+    for i, char in enumerate(columns + ','):
+        if char == '(':
+            depth += 1
+        elif char == ')':
+            depth -= 1
+        elif char == ',' and depth == 0:
+            parts.append(columns[start:i].strip())
+            start = i + 1
+    parsed = []
+    for part in parts:
+        if '(' in part:
+            name, _, inner = part.partition('(')
+            parsed.append((name.strip(), parse_columns(inner[:-1])))
+        else:
+            parsed.append((part, None))
+    return parsed
+
+
+def project(row: dict, columns: list) -> dict:
+    out = {}
+    for name, nested in columns:
+        if name == '*':
+            out.update({k: v for k, v in row.items() if not isinstance(v, dict)})
+        elif nested is not None:
+            out[name] = project(row[name], nested) if row.get(name) else None
+        else:
+            out[name] = row.get(name)
+    return out
+
+
+def bench_decode(payload: str, repeat: int) -> float:
+    best = float('inf')
+    for _ in range(repeat):
+        started = time.perf_counter()
+        json.loads(payload)
+        best = min(best, time.perf_counter() - started)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark payload size and decode time per projection profile')
+    parser.add_argument('--rows', type=int, default=PAGE_SIZE, help='Rows per page')
+    parser.add_argument('--repeat', type=int, default=20, help='Decodes per payload (best time wins)')
+    args = parser.parse_args()
+
+    rng = random.Random(7)
+    buildings = [make_building(rng, n) for n in range(args.rows)]
+    contacts = [make_contact(rng, n, building) for n, building in enumerate(buildings)]
+    rows = {
+        'buildings': buildings,
+        'contacts': contacts,
+        'outreach_emails': [make_email(rng, n, contact) for n, contact in enumerate(contacts)],
+    }
+
+    def page(table: str, profile: str) -> str:
+        columns = parse_columns(PROJECTIONS[table][profile])
+        return json.dumps([project(row, columns) for row in rows[table]], separators=(',', ':'))
+
+    print(f"One page of {args.rows} rows, JSON size and decode time\n")
+    print(f"  {'caller':<38} {'profile':<20} {'KB':>8} {'decode ms':>10} {'vs full':>8}")
+    for table, profile, caller in HOT_CALLERS:
+        full, narrow = page(table, 'full'), page(table, profile)
+        full_ms, narrow_ms = bench_decode(full, args.repeat) * 1000, bench_decode(narrow, args.repeat) * 1000
+        print(f"  {caller:<38} {table + '[full]':<20} {len(full) / 1024:>8.1f} {full_ms:>10.2f}")
+        print(f"  {'':<38} {f'{table}[{profile}]':<20} {len(narrow) / 1024:>8.1f} {narrow_ms:>10.2f} "
+              f"{len(full) / len(narrow):>7.1f}x")
+
+
+if __name__ == '__main__':
+    main()
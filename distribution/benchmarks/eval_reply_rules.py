@@ -0,0 +1,72 @@
+#!/usr/bin/env python3
+"""
+Precision / coverage of the rule-based reply pre-classifier (utils.reply_rules).
+
+Runs pre_classify over a labeled corpus (JSONL: label, subject, headers, text;
+label 'other' = should be left to the model) and reports, per category, how
+many decisions were right (precision) and how many of the labeled replies the
+rules resolved (coverage). Any rule decision on an 'other' reply counts against
+precision. Exits non-zero when precision falls below --min-precision.
+
+Usage:
+    python benchmarks/eval_reply_rules.py [--corpus benchmarks/data/reply_corpus.jsonl] [--verbose]
+"""
+
+import argparse
+import json
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from utils.reply_rules import pre_classify
+
+DEFAULT_CORPUS = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data', 'reply_corpus.jsonl')
+
+
+def load_corpus(path: str) -> list:
+    with open(path, encoding='utf-8') as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def evaluate(corpus: list, verbose: bool = False) -> dict:
+    stats = {}  # category -> {'decided', 'correct', 'labeled'}
+    for item in corpus:
+        result = pre_classify(item['text'], item.get('subject', ''), item.get('headers') or {})
+        predicted = result['category'] if result else None
+        stats.setdefault(item['label'], {'decided': 0, 'correct': 0, 'labeled': 0})['labeled'] += 1
+        if predicted:
+            s = stats.setdefault(predicted, {'decided': 0, 'correct': 0, 'labeled': 0})
+            s['decided'] += 1
+            s['correct'] += predicted == item['label']
+        if verbose and predicted != (item['label'] if item['label'] != 'other' else None):
+            print(f"  ✗ {item['label']} → {predicted or 'model'}: {item['subject']!r} {item['text'][:70]!r}")
+    return stats
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--corpus', default=DEFAULT_CORPUS)
+    parser.add_argument('--min-precision', type=float, default=0.95)
+    parser.add_argument('--verbose', action='store_true', help='List every reply the rules got wrong or missed')
+    args = parser.parse_args()
+
+    corpus = load_corpus(args.corpus)
+    stats = evaluate(corpus, args.verbose)
+
+    decided = sum(s['decided'] for s in stats.values())
+    correct = sum(s['correct'] for s in stats.values())
+    print(f"{len(corpus)} labeled replies, {decided} resolved by rules ({decided * 100 // len(corpus)}% LLM calls avoided)")
+    for category, s in sorted(stats.items()):
+        if category == 'other':
+            continue
+        precision = s['correct'] / s['decided'] if s['decided'] else 1.0
+        coverage = s['correct'] / s['labeled'] if s['labeled'] else 0.0
+        print(f"  {category:15} precision {precision:6.1%} ({s['correct']}/{s['decided']})   "
+              f"coverage {coverage:6.1%} ({s['correct']}/{s['labeled']})")
+    overall = correct / decided if decided else 1.0
+    print(f"  {'overall':15} precision {overall:6.1%}")
+    sys.exit(0 if overall >= args.min_precision else 1)
+
+
+if __name__ == '__main__':
+    main()
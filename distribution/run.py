@@ -7,19 +7,27 @@ AI-powered outbound system for landlord acquisition.
 
 Usage:
     python run.py pipeline          # Run full pipeline: source → enrich → write → send
+    python run.py pipeline --resume RUN_ID   # Resume a crashed run (--runs lists them)
     python run.py source            # Find new buildings
     python run.py enrich            # Find contacts at buildings
     python run.py write             # Generate personalized emails
     python run.py send              # Send queued emails
     python run.py followup          # Generate follow-up emails
     python run.py status            # Show pipeline stats
+    python run.py status --json     # Stats as JSON (add --watch 30 to poll)
     python run.py send --dry-run    # Preview without sending
     python run.py classify           # Classify a reply (interactive)
+    python run.py classify --mbox inbox.mbox   # Classify a whole mailbox (or --maildir DIR)
+    python run.py classify --check-inbox --watch   # Poll for new replies (IMAP, or --maildir DIR)
+    python run.py write --batch      # Personalize via the Message Batches API
 """
 
 import sys
 import os
+import json
+import time
 import argparse
+from datetime import datetime, timezone
 
 # Add parent to path
 sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
@@ -27,7 +35,7 @@ sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
 
 def cmd_import(args):
     from agents.csv_importer import run
-    run(args.csv_file, args.city, args.state)
+    run(args.csv_files, args.city, args.state, chunk_size=args.chunk_size)
 
 
 def cmd_seed(args):
@@ -35,20 +43,29 @@ def cmd_seed(args):
     run()
 
 
+def apply_cache_flags(args):
+    from utils.http_cache import set_cache_mode
+    set_cache_mode('off' if args.no_cache else 'refresh' if args.refresh else 'use')
+
+
 def cmd_source(args):
     from agents.lead_sourcer import run
+    apply_cache_flags(args)
     cities = args.cities if args.cities else None
-    run(cities=cities, max_pages=args.pages)
+    run(cities=cities, max_pages=args.pages, concurrency=args.concurrency)
 
 
 def cmd_enrich(args):
-    from agents.contact_enricher import run
-    run(limit=args.limit)
+    from agents.contact_enricher import run, set_cache_mode
+    set_cache_mode('off' if args.no_cache else 'refresh' if args.refresh else 'use')
+    run(limit=args.limit or None, workers=args.workers)
 
 
 def cmd_write(args):
-    from agents.outreach_writer import run
-    run(limit=args.limit, sequence_number=args.sequence, use_ai=not args.no_ai)
+    from agents.outreach_writer import run, set_cache_mode
+    set_cache_mode('off' if args.no_cache else 'refresh' if args.refresh else 'use')
+    run(limit=args.limit or None, sequence_number=args.sequence, use_ai=not args.no_ai, concurrency=args.concurrency,
+        batch=args.batch)
 
 
 def cmd_send(args):
@@ -62,122 +79,184 @@ def cmd_followup(args):
 
 
 def cmd_classify(args):
-    from agents.reply_classifier import classify_from_text, run_interactive
-    if args.email and args.reply:
+    from agents.reply_classifier import (
+        classify_from_text, run_interactive, run_batch, classify_file, classify_mailbox, check_inbox, inbox_source,
+    )
+    if args.check_inbox:
+        check_inbox(inbox_source(args.maildir), watch=args.watch, concurrency=args.concurrency)
+    elif args.batch:
+        run_batch(args.file, args.mbox, args.maildir)
+    elif args.mbox or args.maildir:
+        classify_mailbox(args.mbox or args.maildir, 'mbox' if args.mbox else 'maildir', args.concurrency)
+    elif args.file:
+        classify_file(args.file)
+    elif args.email and args.reply:
         classify_from_text(args.email, args.reply)
     else:
         run_interactive()
 
 
+PIPELINE_PARAMS = ('cities', 'pages', 'limit', 'no_ai', 'dry_run', 'source_concurrency', 'enrich_workers',
+                   'write_concurrency', 'queue_size')
+
+
+def print_runs():
+    from utils.journal import list_runs
+    runs = list_runs()
+    if not runs:
+        print("No pipeline runs recorded yet.")
+        return
+    for run in runs:
+        started = datetime.fromtimestamp(run['started_at']).strftime('%Y-%m-%d %H:%M')
+        items = ', '.join(f"{n} {status}" for status, n in sorted(run['items'].items())) or 'no items'
+        print(f"  {run['run_id']}  {run['status']:<11} started {started}  ({items})")
+
+
+def interrupted(journal):
+    """Journal a pipeline run as cut short so --resume picks it up."""
+    journal.finish('interrupted')
+    print(f"\nRun {journal.run_id} stopped. Resume with: python run.py pipeline --resume {journal.run_id}")
+
+
 def cmd_pipeline(args):
-    """Run the full pipeline end-to-end."""
+    """Run the full pipeline end-to-end, with source → enrich → write → send streaming into each other.
+
+    Every run is journaled; `--resume RUN_ID` reruns it with its original
+    settings, skipping work already done and retrying what failed.
+    """
+    if args.runs:
+        print_runs()
+        return
+
+    from utils.journal import RunJournal
+    if args.resume:
+        journal = RunJournal.resume(args.resume)
+        for name, value in journal.params().items():
+            setattr(args, name, value)
+    else:
+        journal = RunJournal.start({name: getattr(args, name) for name in PIPELINE_PARAMS})
+
     print("=" * 60)
     print("  LeaseFlex Distribution Pipeline")
+    print(f"  Run {journal.run_id}{' (resumed)' if args.resume else ''}")
     print("=" * 60)
 
-    # Step 1: Source leads
-    print("\n\n🔍 STEP 1: Sourcing leads...")
-    print("-" * 40)
-    from agents.lead_sourcer import run as source
-    cities = args.cities if args.cities else None
-    source(cities=cities, max_pages=args.pages)
-
-    # Step 2: Enrich contacts
-    print("\n\n👤 STEP 2: Enriching contacts...")
-    print("-" * 40)
-    from agents.contact_enricher import run as enrich
-    enrich(limit=args.limit)
-
-    # Step 3: Write emails
-    print("\n\n✍️  STEP 3: Writing personalized emails...")
-    print("-" * 40)
-    from agents.outreach_writer import run as write
-    write(limit=args.limit, use_ai=not args.no_ai)
-
-    # Step 4: Check for follow-ups
-    print("\n\n🔄 STEP 4: Checking follow-ups...")
-    print("-" * 40)
-    from agents.followup_manager import run as followup
-    followup(dry_run=args.dry_run)
-
-    # Step 5: Send (only if not dry run)
-    if not args.dry_run:
-        print("\n\n📨 STEP 5: Sending emails...")
+    try:
+        # Steps 1-3 (+5): buildings flow into enrichment, contacts into writing, drafts into sending
+        print("\n\n🔍 STEPS 1-3: Sourcing → enriching → writing (streamed)...")
         print("-" * 40)
-        from agents.email_sender import run as send
-        send(auto_queue=True)
-    else:
-        print("\n\n📨 STEP 5: Skipped sending (dry run mode)")
-
+        apply_cache_flags(args)
+        from agents.pipeline import run as stream
+        stats = stream(cities=args.cities, max_pages=args.pages, limit=args.limit, use_ai=not args.no_ai,
+               dry_run=args.dry_run, source_concurrency=args.source_concurrency, enrich_workers=args.enrich_workers,
+               write_concurrency=args.write_concurrency, queue_size=args.queue_size, journal=journal)
+        if stats['_interrupted']:
+            print("\nInterrupted: skipping follow-ups and sending")
+            interrupted(journal)
+            return
+
+        # Step 4: Check for follow-ups
+        print("\n\n🔄 STEP 4: Checking follow-ups...")
+        print("-" * 40)
+        if 'followup' in journal.completed('steps'):
+            print("Already done in this run")
+        else:
+            from agents.followup_manager import run as followup
+            followup(dry_run=args.dry_run)
+            journal.record('steps', 'followup', 'done')
+
+        # Step 5: Send follow-ups and anything left queued (only if not dry run)
+        if not args.dry_run:
+            print("\n\n📨 STEP 5: Sending remaining emails...")
+            print("-" * 40)
+            from agents.email_sender import run as send
+            send(auto_queue=True)
+        else:
+            print("\n\n📨 STEP 5: Skipped sending (dry run mode)")
+    except BaseException:
+        interrupted(journal)
+        raise
+
+    journal.finish()
     print("\n" + "=" * 60)
     print("  Pipeline complete!")
+    print(f"  Run {journal.run_id} — resume or inspect with --resume / --runs")
     print("=" * 60)
 
 
-def cmd_status(args):
-    """Show pipeline statistics."""
-    from utils.db import get_db
-    db = get_db()
+STATUS_ORDER = {
+    'buildings': ['new', 'enriched', 'contacted', 'replied', 'meeting', 'onboarded', 'rejected'],
+    'contacts': ['new', 'emailed', 'replied', 'meeting', 'closed', 'unsubscribed', 'rejected'],
+    'outreach_emails': ['draft', 'queued', 'sent', 'opened', 'replied', 'bounced'],
+}
+
+
+def build_status_report() -> dict:
+    """Pipeline stats from the pipeline_status_counts view (one request)."""
+    from utils.db import get_status_counts
+    counts = get_status_counts()
+
+    report = {'generated_at': datetime.now(timezone.utc).isoformat()}
+    for entity, order in STATUS_ORDER.items():
+        by_status = counts.get(entity, {})
+        statuses = {status: by_status[status] for status in order if by_status.get(status)}
+        statuses.update({status: n for status, n in by_status.items() if status not in statuses and n})
+        report[entity] = {'total': sum(by_status.values()), 'statuses': statuses}
+
+    b = report['buildings']
+    c = report['contacts']['statuses']
+    report['funnel'] = {
+        'enriched': [b['statuses'].get('enriched', 0), b['total']],
+        'replied': [c.get('replied', 0), c.get('emailed', 0)],
+        'meeting': [c.get('meeting', 0), c.get('replied', 0)],
+    }
+    return report
 
+
+def print_status_report(report: dict):
     print("=" * 50)
     print("  LeaseFlex Distribution — Pipeline Status")
     print("=" * 50)
 
-    # Buildings
-    buildings = db.table('buildings').select('status', count='exact').execute()
-    b_total = buildings.count or 0
-
-    b_statuses = {}
-    for status in ['new', 'enriched', 'contacted', 'replied', 'meeting', 'onboarded', 'rejected']:
-        result = db.table('buildings').select('id', count='exact').eq('status', status).execute()
-        count = result.count or 0
-        if count > 0:
-            b_statuses[status] = count
-
-    print(f"\nBuildings: {b_total}")
-    for status, count in b_statuses.items():
-        print(f"  {status}: {count}")
-
-    # Contacts
-    contacts = db.table('contacts').select('id', count='exact').execute()
-    c_total = contacts.count or 0
-
-    c_statuses = {}
-    for status in ['new', 'emailed', 'replied', 'meeting', 'closed', 'unsubscribed']:
-        result = db.table('contacts').select('id', count='exact').eq('status', status).execute()
-        count = result.count or 0
-        if count > 0:
-            c_statuses[status] = count
-
-    print(f"\nContacts: {c_total}")
-    for status, count in c_statuses.items():
-        print(f"  {status}: {count}")
-
-    # Emails
-    emails = db.table('outreach_emails').select('id', count='exact').execute()
-    e_total = emails.count or 0
-
-    e_statuses = {}
-    for status in ['draft', 'queued', 'sent', 'opened', 'replied', 'bounced']:
-        result = db.table('outreach_emails').select('id', count='exact').eq('status', status).execute()
-        count = result.count or 0
-        if count > 0:
-            e_statuses[status] = count
-
-    print(f"\nEmails: {e_total}")
-    for status, count in e_statuses.items():
-        print(f"  {status}: {count}")
-
-    # Conversion funnel
+    for entity, label in (('buildings', 'Buildings'), ('contacts', 'Contacts'), ('outreach_emails', 'Emails')):
+        print(f"\n{label}: {report[entity]['total']}")
+        for status, count in report[entity]['statuses'].items():
+            print(f"  {status}: {count}")
+
+    b_total = report['buildings']['total']
     if b_total > 0:
+        enriched, _ = report['funnel']['enriched']
+        replied, emailed = report['funnel']['replied']
+        meeting, replied_total = report['funnel']['meeting']
         print(f"\nConversion funnel:")
-        print(f"  Buildings → Enriched: {b_statuses.get('enriched', 0)}/{b_total} ({b_statuses.get('enriched', 0)*100//max(b_total,1)}%)")
-        print(f"  Contacted → Replied:  {c_statuses.get('replied', 0)}/{c_statuses.get('emailed', 0) or 0}")
-        print(f"  Replied → Meeting:    {c_statuses.get('meeting', 0)}/{c_statuses.get('replied', 0) or 0}")
+        print(f"  Buildings → Enriched: {enriched}/{b_total} ({enriched*100//max(b_total,1)}%)")
+        print(f"  Contacted → Replied:  {replied}/{emailed}")
+        print(f"  Replied → Meeting:    {meeting}/{replied_total}")
 
     print()
 
 
+def cmd_status(args):
+    """Show pipeline statistics."""
+    while True:
+        report = build_status_report()
+        if args.json:
+            print(json.dumps(report), flush=True)
+        else:
+            if args.watch:
+                print("\033[2J\033[H", end='')
+            print_status_report(report)
+            if args.watch:
+                print(f"Updated {report['generated_at']} — refreshing every {args.watch:g}s (Ctrl+C to stop)")
+
+        if not args.watch:
+            return
+        try:
+            time.sleep(args.watch)
+        except KeyboardInterrupt:
+            return
+
+
 def main():
     parser = argparse.ArgumentParser(
         description='LeaseFlex Distribution Engine',
@@ -198,18 +277,28 @@ Examples:
     p_source = subparsers.add_parser('source', help='Find new buildings')
     p_source.add_argument('--cities', nargs='+', help='Cities to search')
     p_source.add_argument('--pages', type=int, default=3, help='Max pages per city')
+    p_source.add_argument('--concurrency', type=int, default=8, help='Max requests in flight')
+    p_source.add_argument('--no-cache', action='store_true', help='Bypass the HTTP response cache')
+    p_source.add_argument('--refresh', action='store_true', help='Revalidate every cached page')
     p_source.set_defaults(func=cmd_source)
 
     # Enrich
     p_enrich = subparsers.add_parser('enrich', help='Find contacts at buildings')
-    p_enrich.add_argument('--limit', type=int, default=50, help='Max buildings to process')
+    p_enrich.add_argument('--limit', type=int, default=50, help='Max buildings to process (0 = all)')
+    p_enrich.add_argument('--workers', type=int, default=4, help='Concurrent enrichment workers')
+    p_enrich.add_argument('--no-cache', action='store_true', help='Bypass the HTTP and Apollo caches')
+    p_enrich.add_argument('--refresh', action='store_true', help='Revalidate cached pages, re-query Apollo')
     p_enrich.set_defaults(func=cmd_enrich)
 
     # Write
     p_write = subparsers.add_parser('write', help='Generate personalized emails')
-    p_write.add_argument('--limit', type=int, default=50, help='Max contacts')
+    p_write.add_argument('--limit', type=int, default=50, help='Max contacts (0 = all)')
     p_write.add_argument('--sequence', type=int, default=1, help='Sequence number')
     p_write.add_argument('--no-ai', action='store_true', help='Skip AI personalization')
+    p_write.add_argument('--concurrency', type=int, default=8, help='Max AI requests in flight')
+    p_write.add_argument('--batch', action='store_true', help='Personalize via the Message Batches API (resumable)')
+    p_write.add_argument('--no-cache', action='store_true', help='Bypass the personalization cache')
+    p_write.add_argument('--refresh', action='store_true', help='Re-personalize and overwrite cached skeletons')
     p_write.set_defaults(func=cmd_write)
 
     # Send
@@ -230,13 +319,22 @@ Examples:
     p_pipeline.add_argument('--limit', type=int, default=50, help='Max items per step')
     p_pipeline.add_argument('--no-ai', action='store_true', help='Skip AI personalization')
     p_pipeline.add_argument('--dry-run', action='store_true', help='Preview without sending')
+    p_pipeline.add_argument('--source-concurrency', type=int, default=8, help='Max scrape requests in flight')
+    p_pipeline.add_argument('--enrich-workers', type=int, default=4, help='Concurrent enrichment workers')
+    p_pipeline.add_argument('--write-concurrency', type=int, default=8, help='Max AI requests in flight')
+    p_pipeline.add_argument('--queue-size', type=int, default=50, help='Max items waiting between stages')
+    p_pipeline.add_argument('--no-cache', action='store_true', help='Bypass the HTTP response cache')
+    p_pipeline.add_argument('--refresh', action='store_true', help='Revalidate every cached page')
+    p_pipeline.add_argument('--resume', metavar='RUN_ID', help='Resume a run: skip finished items, retry failures')
+    p_pipeline.add_argument('--runs', action='store_true', help='List recent pipeline runs')
     p_pipeline.set_defaults(func=cmd_pipeline)
 
     # Import CSV
     p_import = subparsers.add_parser('import', help='Import contacts from CSV (Apollo, LinkedIn export)')
-    p_import.add_argument('csv_file', help='Path to CSV file')
+    p_import.add_argument('csv_files', nargs='+', help='CSV files or glob patterns')
     p_import.add_argument('--city', default='New York', help='Default city')
     p_import.add_argument('--state', default='NY', help='Default state')
+    p_import.add_argument('--chunk-size', type=int, default=1000, help='Rows per bulk write')
     p_import.set_defaults(func=cmd_import)
 
     # Seed
@@ -247,10 +345,21 @@ Examples:
     p_classify = subparsers.add_parser('classify', help='Classify an incoming reply')
     p_classify.add_argument('--email', help='Contact email address')
     p_classify.add_argument('--reply', help='Reply text')
+    p_classify.add_argument('--file', help='JSONL file of {"email", "reply"} objects')
+    p_classify.add_argument('--mbox', help='Classify every reply in an mbox file')
+    p_classify.add_argument('--maildir', help='Classify every reply in a Maildir directory')
+    p_classify.add_argument('--concurrency', type=int, default=8, help='Max AI requests in flight')
+    p_classify.add_argument('--batch', action='store_true', help='Classify via the Message Batches API (resumable)')
+    p_classify.add_argument('--check-inbox', action='store_true', help='Classify replies that arrived since the last check')
+    p_classify.add_argument('--watch', type=float, nargs='?', const=300, metavar='SECONDS',
+                            help='With --check-inbox, keep polling (default every 300s)')
     p_classify.set_defaults(func=cmd_classify)
 
     # Status
     p_status = subparsers.add_parser('status', help='Show pipeline statistics')
+    p_status.add_argument('--json', action='store_true', help='Print the stats as JSON')
+    p_status.add_argument('--watch', type=float, nargs='?', const=10, metavar='SECONDS',
+                          help='Refresh every SECONDS (default 10)')
     p_status.set_defaults(func=cmd_status)
 
     args = parser.parse_args()
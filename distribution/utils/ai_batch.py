@@ -0,0 +1,69 @@
+"""
+Anthropic Message Batches for large, latency-insensitive runs.
+
+A job (e.g. 'write', 'classify') submits all of its prompts as one batch and
+the batch id is stored on disk together with whatever the caller needs to
+write results back. If the process stops while the batch is processing,
+the next run with the same job name resumes polling that batch instead of
+submitting a new one. Batches cost half as much as interactive calls and
+their results stay downloadable for 29 days.
+"""
+
+import time
+
+from .kvcache import DiskCache
+
+BATCH_POLL_SECONDS = 60
+RESULTS_TTL = 29 * 86400
+
+_jobs = DiskCache('ai_batches', ttl=RESULTS_TTL, max_entries=100)
+
+
+def pending(job: str):
+    """The stored state of an unfinished batch for this job, or None."""
+    return _jobs.get(job)
+
+
+def submit(client, job: str, requests: list, meta: dict) -> dict:
+    """Create a batch from [{'custom_id', 'params'}] requests and persist its id with meta."""
+    batch = client.messages.batches.create(requests=requests)
+    state = {'batch_id': batch.id, 'submitted_at': time.time(), 'count': len(requests), 'meta': meta}
+    _jobs.set(job, state)
+    print(f"Submitted batch {batch.id} with {len(requests)} requests")
+    return state
+
+
+def wait(client, state: dict, poll_seconds: float = BATCH_POLL_SECONDS):
+    """Poll until the batch has ended. Safe to interrupt; the job resumes on the next run."""
+    batch_id = state['batch_id']
+    while True:
+        try:
+            batch = client.messages.batches.retrieve(batch_id)
+        except Exception as e:
+            print(f"  Error polling batch {batch_id}: {e}")
+        else:
+            counts = batch.request_counts
+            done = counts.succeeded + counts.errored + counts.canceled + counts.expired
+            print(f"  Batch {batch_id}: {batch.processing_status}, {done}/{state['count']} done")
+            if batch.processing_status == 'ended':
+                return
+        time.sleep(poll_seconds)
+
+
+def results(client, batch_id: str, usage=None) -> dict:
+    """{custom_id: response text} for every succeeded request. Failed ones are absent.
+
+    `usage` (a TokenUsage) is credited with each response's token counts.
+    """
+    texts = {}
+    for entry in client.messages.batches.results(batch_id):
+        if entry.result.type == 'succeeded':
+            texts[entry.custom_id] = entry.result.message.content[0].text
+            if usage is not None:
+                usage.add(entry.result.message.usage)
+    return texts
+
+
+def finish(job: str):
+    """Forget the job's batch once its results have been written back."""
+    _jobs.delete(job)
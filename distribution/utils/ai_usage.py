@@ -0,0 +1,43 @@
+"""
+Token accounting for Claude calls.
+
+Prompts aren't marked for prompt caching: their fixed parts (system prompt,
+template, category list) are a few hundred tokens, far below Haiku 4.5's
+minimum cacheable prefix, so the API would bill them as plain input anyway.
+Cache reads and writes are still totalled in case a prompt grows past it.
+"""
+
+import threading
+
+FIELDS = ('input_tokens', 'cache_creation_input_tokens', 'cache_read_input_tokens', 'output_tokens')
+
+
+class TokenUsage:
+    """Thread-safe running totals of response.usage across a run."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self.calls = 0
+            self.totals = dict.fromkeys(FIELDS, 0)
+
+    def add(self, usage):
+        if usage is None:
+            return
+        with self._lock:
+            self.calls += 1
+            for field in FIELDS:
+                self.totals[field] += getattr(usage, field, None) or 0
+
+    def summary(self) -> str:
+        t = self.totals
+        prompt = t['input_tokens'] + t['cache_creation_input_tokens'] + t['cache_read_input_tokens']
+        cached = ''
+        if t['cache_read_input_tokens'] or t['cache_creation_input_tokens']:
+            rate = t['cache_read_input_tokens'] * 100 // prompt
+            cached = (f" ({t['cache_read_input_tokens']} cache read, "
+                      f"{t['cache_creation_input_tokens']} cache write, {rate}% from cache)")
+        return f"Tokens: {prompt} prompt{cached}, {t['output_tokens']} output over {self.calls} calls"
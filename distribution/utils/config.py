@@ -12,4 +12,25 @@ ANTHROPIC_API_KEY = os.getenv('ANTHROPIC_API_KEY', '')
 RESEND_API_KEY = os.getenv('RESEND_API_KEY', '')
 FROM_EMAIL = os.getenv('FROM_EMAIL', 'justin@leaseflex.com')
 DAILY_EMAIL_LIMIT = int(os.getenv('DAILY_EMAIL_LIMIT', '50'))
+# Minutes to spread the day's sends over; unset = paced from the warm-up limit, 0 = send the quota at once
+SEND_SPREAD_MINUTES = float(os.getenv('SEND_SPREAD_MINUTES')) if os.getenv('SEND_SPREAD_MINUTES') else None
 TARGET_CITIES = [c.strip() for c in os.getenv('TARGET_CITIES', 'New York').split(',')]
+CACHE_DIR = os.getenv('CACHE_DIR', str(Path(__file__).parent.parent / '.cache'))
+HTTP_CACHE_DIR = os.getenv('HTTP_CACHE_DIR', str(Path(CACHE_DIR) / 'http'))
+HTTP_CACHE_MAX_MB = int(os.getenv('HTTP_CACHE_MAX_MB', '500'))
+DB_PAYLOAD_STATS = os.getenv('DB_PAYLOAD_STATS', '0') == '1'  # tally response sizes per projection
+
+# Shared HTTP client (utils/http.py)
+HTTP_TIMEOUT = float(os.getenv('HTTP_TIMEOUT', '15'))
+HTTP_CONNECT_TIMEOUT = float(os.getenv('HTTP_CONNECT_TIMEOUT', '5'))
+HTTP_MAX_CONNECTIONS = int(os.getenv('HTTP_MAX_CONNECTIONS', '50'))
+HTTP_MAX_KEEPALIVE = int(os.getenv('HTTP_MAX_KEEPALIVE', '20'))
+HTTP_KEEPALIVE_EXPIRY = float(os.getenv('HTTP_KEEPALIVE_EXPIRY', '30'))
+HTTP2_ENABLED = os.getenv('HTTP2', '0') == '1'
+
+# Reply inbox for `classify --check-inbox` (utils/inbox.py)
+IMAP_HOST = os.getenv('IMAP_HOST', '')
+IMAP_PORT = int(os.getenv('IMAP_PORT', '993'))
+IMAP_USER = os.getenv('IMAP_USER', '')
+IMAP_PASSWORD = os.getenv('IMAP_PASSWORD', '')
+IMAP_FOLDER = os.getenv('IMAP_FOLDER', 'INBOX')
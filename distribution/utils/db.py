@@ -1,5 +1,9 @@
+import json
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
 from supabase import create_client
-from .config import SUPABASE_URL, SUPABASE_KEY
+from .config import SUPABASE_URL, SUPABASE_KEY, DB_PAYLOAD_STATS
 
 _client = None
 
@@ -12,25 +16,165 @@ def get_db():
     return _client
 
 
+# Rows per bulk request. Large enough to keep round trips low, small enough
+# that PostgREST request bodies and `in.(...)` lookup URLs stay reasonable.
+BATCH_SIZE = 500
+LOOKUP_BATCH_SIZE = 100
+# Rows per page when streaming a table with the iter_* generators
+PAGE_SIZE = 500
+
+# Named column sets per table. Readers pick one explicitly so hot paths don't
+# pull email bodies, notes and whole joined rows they never look at. Every
+# profile keeps id and created_at, which the iter_* generators page on.
+PROJECTIONS = {
+    'buildings': {
+        'ids': 'id, status, created_at',
+        'enrich': 'id, status, created_at, name, company, city, state, unit_count, property_url',
+        'full': '*',
+    },
+    'contacts': {
+        'ids': 'id, status, created_at',
+        'write': 'id, status, created_at, building_id, full_name, email, '
+                 'buildings(id, name, company, city, state, unit_count)',
+        'full': '*, buildings(*)',
+    },
+    'outreach_emails': {
+        'ids': 'id, status, created_at',
+        'send': 'id, status, created_at, contact_id, sequence_number, subject, body, message_id, '
+                'contacts(id, full_name, email)',
+        'full': '*, contacts(*), buildings(*)',
+    },
+}
+
+# Response payload per (table, projection) when DB_PAYLOAD_STATS=1
+payload_stats = {}
+_stats_lock = threading.Lock()
+
+
+def _columns(table: str, projection: str) -> str:
+    try:
+        return PROJECTIONS[table][projection]
+    except KeyError:
+        raise ValueError(f"Unknown projection for {table}: {projection!r} "
+                         f"(have {', '.join(PROJECTIONS.get(table, {}))})") from None
+
+
+def _measured(table: str, projection: str, rows: list) -> list:
+    """Count a response's rows and JSON size against its projection (only with DB_PAYLOAD_STATS)."""
+    if DB_PAYLOAD_STATS:
+        size = len(json.dumps(rows, separators=(',', ':'), default=str))
+        with _stats_lock:
+            stats = payload_stats.setdefault((table, projection), {'requests': 0, 'rows': 0, 'bytes': 0})
+            stats['requests'] += 1
+            stats['rows'] += len(rows)
+            stats['bytes'] += size
+    return rows
+
+
+def print_payload_stats():
+    if not payload_stats:
+        return
+    print("DB payloads:")
+    for (table, projection), stats in sorted(payload_stats.items()):
+        per_row = stats['bytes'] // stats['rows'] if stats['rows'] else 0
+        print(f"  {table}[{projection}]: {stats['requests']} requests, {stats['rows']} rows, "
+              f"{stats['bytes'] / 1024:.1f} KB ({per_row} B/row)")
+
+
+def _chunks(rows: list, size: int):
+    for i in range(0, len(rows), size):
+        yield rows[i:i + size]
+
+
+def _same_columns(rows: list) -> list:
+    """Split rows into groups that share one key set, as [(input positions, rows)].
+
+    PostgREST takes the column list of a bulk insert from the rows. Padding a
+    row's missing keys with None would send explicit NULLs and override column
+    defaults (status, created_at), so rows with different keys go in separate
+    requests instead.
+    """
+    groups = {}
+    for i, row in enumerate(rows):
+        positions, grouped = groups.setdefault(frozenset(row), ([], []))
+        positions.append(i)
+        grouped.append(row)
+    return list(groups.values())
+
+
+def _upsert_ids(table: str, rows: list, key_cols: tuple, batch_size: int) -> list:
+    """Insert rows that don't exist yet (by key_cols) and return every row's id in input order.
+
+    Existing rows are left untouched, matching the old select-then-insert behaviour.
+    Rows missing part of the key can never conflict and are plain-inserted.
+    """
+    db = get_db()
+    ids = [None] * len(rows)
+
+    for start in range(0, len(rows), batch_size):
+        chunk = rows[start:start + batch_size]
+        keyed = {}      # key -> first row with that key
+        positions = {}  # key -> input indices sharing that key
+        keyless = []    # (input index, row)
+
+        for offset, row in enumerate(chunk):
+            key = tuple(row.get(col) for col in key_cols)
+            if any(v is None for v in key):
+                keyless.append((start + offset, row))
+                continue
+            keyed.setdefault(key, row)
+            positions.setdefault(key, []).append(start + offset)
+
+        resolved = {}
+        if keyed:
+            for _, group in _same_columns(list(keyed.values())):
+                result = (db.table(table)
+                    .upsert(group, on_conflict=','.join(key_cols), ignore_duplicates=True)
+                    .execute())
+                for r in result.data or []:
+                    resolved[tuple(r.get(col) for col in key_cols)] = r['id']
+
+            # Conflicting rows aren't returned by ON CONFLICT DO NOTHING — look them up
+            missing = [key for key in keyed if key not in resolved]
+            for lookup in _chunks(missing, LOOKUP_BATCH_SIZE):
+                query = db.table(table).select(','.join(('id',) + key_cols))
+                for i, col in enumerate(key_cols):
+                    query = query.in_(col, sorted({key[i] for key in lookup}))
+                for r in query.execute().data or []:
+                    resolved.setdefault(tuple(r.get(col) for col in key_cols), r['id'])
+
+        for key, indices in positions.items():
+            for index in indices:
+                ids[index] = resolved.get(key)
+
+        for positions, group in _same_columns([row for _, row in keyless]):
+            result = db.table(table).insert(group).execute()
+            for position, r in zip(positions, result.data or []):
+                ids[keyless[position][0]] = r['id']
+
+    return ids
+
+
+def upsert_buildings(rows: list, batch_size: int = BATCH_SIZE) -> list:
+    """Bulk insert buildings, skipping duplicates by name + city. Returns ids in input order."""
+    return _upsert_ids('buildings', rows, ('name', 'city'), batch_size)
+
+
+def upsert_contacts(rows: list, batch_size: int = BATCH_SIZE) -> list:
+    """Bulk insert contacts, skipping duplicates by email. Returns ids in input order."""
+    return _upsert_ids('contacts', rows, ('email',), batch_size)
+
+
 def insert_building(data: dict) -> dict:
     """Insert a building, skip if duplicate by name + city."""
-    db = get_db()
-    existing = db.table('buildings').select('id').eq('name', data['name']).eq('city', data['city']).execute()
-    if existing.data:
-        return existing.data[0]
-    result = db.table('buildings').insert(data).execute()
-    return result.data[0] if result.data else {}
+    building_id = upsert_buildings([data])[0]
+    return {'id': building_id} if building_id else {}
 
 
 def insert_contact(data: dict) -> dict:
     """Insert a contact, skip if duplicate by email."""
-    db = get_db()
-    if data.get('email'):
-        existing = db.table('contacts').select('id').eq('email', data['email']).execute()
-        if existing.data:
-            return existing.data[0]
-    result = db.table('contacts').insert(data).execute()
-    return result.data[0] if result.data else {}
+    contact_id = upsert_contacts([data])[0]
+    return {'id': contact_id} if contact_id else {}
 
 
 def insert_outreach_email(data: dict) -> dict:
@@ -39,37 +183,213 @@ def insert_outreach_email(data: dict) -> dict:
     return result.data[0] if result.data else {}
 
 
-def get_buildings(status: str = None, city: str = None, limit: int = 100) -> list:
+def insert_outreach_emails(rows: list, batch_size: int = BATCH_SIZE) -> list:
+    """Bulk insert outreach emails, one request per batch. Returns the inserted rows.
+
+    Rows for a (contact_id, sequence_number) that already exists are skipped.
+    """
+    db = get_db()
+    inserted = []
+    for chunk in _chunks(rows, batch_size):
+        for _, group in _same_columns(chunk):
+            result = (db.table('outreach_emails')
+                .upsert(group, on_conflict='contact_id,sequence_number', ignore_duplicates=True)
+                .execute())
+            inserted.extend(result.data or [])
+    return inserted
+
+
+def _iter_keyset(table: str, projection: str, filters: dict, page_size: int, prefetch: bool, limit: int):
+    """Yield rows ordered by (created_at, id), one page per request, up to `limit` rows (None = all).
+
+    Each page starts after the last (created_at, id) seen rather than at an
+    offset, so it's an index range scan however deep it goes, and rows that
+    change status while being consumed don't shift later pages. With
+    `prefetch`, the next page is fetched in the background while the current
+    one is being consumed.
+    """
+    db = get_db()
+    columns = _columns(table, projection)
+
+    def fetch(after, size):
+        query = db.table(table).select(columns)
+        for col, value in filters.items():
+            if value is not None:
+                query = query.eq(col, value)
+        if after:
+            created_at, row_id = after
+            query = query.or_(f'created_at.gt."{created_at}",and(created_at.eq."{created_at}",id.gt.{row_id})')
+        return _measured(table, projection, query.order('created_at').order('id').limit(size).execute().data or [])
+
+    pool = ThreadPoolExecutor(max_workers=1) if prefetch else None
+    remaining = limit
+    try:
+        page = fetch(None, min(page_size, remaining) if remaining is not None else page_size)
+        while page:
+            if remaining is not None:
+                remaining -= len(page)
+            size = min(page_size, remaining) if remaining is not None else page_size
+            more = len(page) == page_size and size > 0
+            after = (page[-1]['created_at'], page[-1]['id'])
+            upcoming = pool.submit(fetch, after, size) if more and pool else None
+            yield from page
+            if not more:
+                return
+            page = upcoming.result() if upcoming else fetch(after, size)
+    finally:
+        if pool:
+            pool.shutdown(wait=False, cancel_futures=True)
+
+
+def iter_buildings(status: str = None, city: str = None, page_size: int = PAGE_SIZE, prefetch: bool = False,
+                   limit: int = None, projection: str = 'full'):
+    """Stream buildings oldest first in keyset pages; constant memory for any table size."""
+    return _iter_keyset('buildings', projection, {'status': status, 'city': city}, page_size, prefetch, limit)
+
+
+def iter_contacts(status: str = None, building_id: str = None, page_size: int = PAGE_SIZE, prefetch: bool = False,
+                  limit: int = None, projection: str = 'full'):
+    """Stream contacts (with buildings) oldest first in keyset pages."""
+    return _iter_keyset('contacts', projection, {'status': status, 'building_id': building_id},
+                        page_size, prefetch, limit)
+
+
+def iter_outreach_emails(status: str = None, contact_id: str = None, page_size: int = PAGE_SIZE,
+                         prefetch: bool = False, limit: int = None, projection: str = 'full'):
+    """Stream outreach emails (with contacts and buildings) oldest first in keyset pages."""
+    return _iter_keyset('outreach_emails', projection, {'status': status, 'contact_id': contact_id},
+                        page_size, prefetch, limit)
+
+
+def get_buildings(status: str = None, city: str = None, limit: int = 100, projection: str = 'full') -> list:
     db = get_db()
-    query = db.table('buildings').select('*')
+    query = db.table('buildings').select(_columns('buildings', projection))
     if status:
         query = query.eq('status', status)
     if city:
         query = query.eq('city', city)
     result = query.limit(limit).execute()
-    return result.data or []
+    return _measured('buildings', projection, result.data or [])
 
 
-def get_contacts(status: str = None, building_id: str = None, limit: int = 100) -> list:
+def get_buildings_by_ids(ids: list, status: str = None, projection: str = 'full') -> list:
+    """Buildings with the given ids (optionally only those in `status`), in chunked lookups."""
     db = get_db()
-    query = db.table('contacts').select('*, buildings(*)')
+    buildings = []
+    for chunk in _chunks(sorted(set(ids)), LOOKUP_BATCH_SIZE):
+        query = db.table('buildings').select(_columns('buildings', projection)).in_('id', chunk)
+        if status:
+            query = query.eq('status', status)
+        buildings.extend(_measured('buildings', projection, query.execute().data or []))
+    return buildings
+
+
+def get_contacts(status: str = None, building_id: str = None, limit: int = 100, projection: str = 'full') -> list:
+    db = get_db()
+    query = db.table('contacts').select(_columns('contacts', projection))
     if status:
         query = query.eq('status', status)
     if building_id:
         query = query.eq('building_id', building_id)
     result = query.limit(limit).execute()
-    return result.data or []
+    return _measured('contacts', projection, result.data or [])
 
 
-def get_outreach_emails(status: str = None, contact_id: str = None, limit: int = 100) -> list:
+def get_outreach_emails(status: str = None, contact_id: str = None, limit: int = 100,
+                        projection: str = 'full') -> list:
     db = get_db()
-    query = db.table('outreach_emails').select('*, contacts(*), buildings(*)')
+    query = db.table('outreach_emails').select(_columns('outreach_emails', projection))
     if status:
         query = query.eq('status', status)
     if contact_id:
         query = query.eq('contact_id', contact_id)
     result = query.order('created_at', desc=True).limit(limit).execute()
-    return result.data or []
+    return _measured('outreach_emails', projection, result.data or [])
+
+
+def get_contacts_by_email(emails: list, projection: str = 'full') -> dict:
+    """{email: contact (with buildings)} for the given addresses, in chunked lookups."""
+    db = get_db()
+    contacts = {}
+    for chunk in _chunks(sorted(set(emails)), LOOKUP_BATCH_SIZE):
+        result = db.table('contacts').select(_columns('contacts', projection)).in_('email', chunk).execute()
+        for contact in _measured('contacts', projection, result.data or []):
+            contacts[contact['email']] = contact
+    return contacts
+
+
+def get_latest_sent_emails(contact_ids: list) -> dict:
+    """{contact_id: most recent sent outreach email} for the given contacts."""
+    db = get_db()
+    latest = {}
+    for chunk in _chunks(sorted(set(contact_ids)), LOOKUP_BATCH_SIZE):
+        result = (db.table('outreach_emails')
+            .select('*')
+            .in_('contact_id', chunk)
+            .eq('status', 'sent')
+            .order('sent_at', desc=True)
+            .execute())
+        for email in result.data or []:
+            latest.setdefault(email['contact_id'], email)
+    return latest
+
+
+def get_outreach_by_message_ids(message_ids: list) -> dict:
+    """{message_id: outreach email (with contacts)} for the given Message-IDs that are ours."""
+    db = get_db()
+    found = {}
+    for chunk in _chunks(sorted(set(message_ids)), LOOKUP_BATCH_SIZE):
+        result = db.table('outreach_emails').select('*, contacts(*)').in_('message_id', chunk).execute()
+        for email in result.data or []:
+            found[email['message_id']] = email
+    return found
+
+
+def get_outreach_email_ids(contact_ids: list, statuses: list) -> list:
+    """Ids of the given contacts' outreach emails that are in one of `statuses`."""
+    db = get_db()
+    ids = []
+    for chunk in _chunks(sorted(set(contact_ids)), LOOKUP_BATCH_SIZE):
+        result = (db.table('outreach_emails')
+            .select('id')
+            .in_('contact_id', chunk)
+            .in_('status', statuses)
+            .execute())
+        ids.extend(row['id'] for row in result.data or [])
+    return ids
+
+
+def get_outreach_sequences(contact_ids: list) -> set:
+    """(contact_id, sequence_number) pairs that already have an outreach email."""
+    db = get_db()
+    pairs = set()
+    for chunk in _chunks(sorted(set(contact_ids)), LOOKUP_BATCH_SIZE):
+        result = db.table('outreach_emails').select('contact_id, sequence_number').in_('contact_id', chunk).execute()
+        pairs.update((row['contact_id'], row['sequence_number']) for row in result.data or [])
+    return pairs
+
+
+def get_next_actions(limit: int = 1000) -> list:
+    """(contact_id, next_action_at) for emailed contacts with a follow-up scheduled, soonest first."""
+    db = get_db()
+    result = (db.table('contacts')
+        .select('id, next_action_at')
+        .eq('status', 'emailed')
+        .not_.is_('next_action_at', 'null')
+        .order('next_action_at')
+        .limit(limit)
+        .execute())
+    return [(row['id'], row['next_action_at']) for row in result.data or []]
+
+
+def get_status_counts() -> dict:
+    """All funnel counts in one request: {'buildings': {status: n}, 'contacts': {...}, 'outreach_emails': {...}}."""
+    db = get_db()
+    result = db.table('pipeline_status_counts').select('entity, status, count').execute()
+    counts = {'buildings': {}, 'contacts': {}, 'outreach_emails': {}}
+    for row in result.data or []:
+        counts.setdefault(row['entity'], {})[row['status']] = row['count']
+    return counts
 
 
 def update_building(building_id: str, data: dict):
@@ -82,6 +402,44 @@ def update_contact(contact_id: str, data: dict):
     db.table('contacts').update(data).eq('id', contact_id).execute()
 
 
+def update_many(table: str, ids: list, data: dict) -> int:
+    """Apply the same update to many rows, one in() request per chunk. Returns rows updated."""
+    db = get_db()
+    updated = 0
+    for chunk in _chunks(list(ids), LOOKUP_BATCH_SIZE):
+        result = db.table(table).update(data).in_('id', chunk).execute()
+        updated += len(result.data or [])
+    return updated
+
+
+def transition_ids(table: str, ids: list, from_status, to_status: str, extra: dict = None) -> list:
+    """Move rows from `from_status` (a status or list of them) to `to_status`, one in() request per chunk.
+
+    Each update is guarded by the current status, so a row another run has
+    already moved on is left alone. `extra` columns are set alongside the
+    status. Returns the ids actually transitioned, i.e. the rows this call claimed.
+    """
+    if from_status is None:
+        raise ValueError(f"transition_ids({table!r}): from_status is required (the rows' current status)")
+    db = get_db()
+    data = {**(extra or {}), 'status': to_status}
+    from_statuses = [from_status] if isinstance(from_status, str) else list(from_status)
+    moved = []
+    for chunk in _chunks(list(dict.fromkeys(ids)), LOOKUP_BATCH_SIZE):
+        query = db.table(table).update(data).in_('id', chunk)
+        if len(from_statuses) == 1:
+            query = query.eq('status', from_statuses[0])
+        else:
+            query = query.in_('status', from_statuses)
+        moved.extend(row['id'] for row in query.execute().data or [])
+    return moved
+
+
+def transition_many(table: str, ids: list, from_status, to_status: str, extra: dict = None) -> int:
+    """transition_ids(), returning how many rows were actually transitioned."""
+    return len(transition_ids(table, ids, from_status, to_status, extra))
+
+
 def update_outreach_email(email_id: str, data: dict):
     db = get_db()
     db.table('outreach_emails').update(data).eq('id', email_id).execute()
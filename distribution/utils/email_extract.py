@@ -0,0 +1,146 @@
+"""
+Single-pass email extraction for scraped pages.
+
+Instead of running a regex from every character of the page, the scanner
+jumps between '@' signs with str.find and applies one precompiled address
+pattern in a small window around each. `mailto:` links are picked up too,
+including percent-encoded ones. Junk is rejected with set lookups on the
+address parts (domain suffixes, domain labels, file-extension TLDs, no-reply
+mailboxes) instead of scanning a list of substrings per match.
+
+Pages are read as a stream and scanning stops at a byte cap, so a huge page
+costs no more than its first MAX_PAGE_BYTES. A page cut off at the cap isn't
+cached, so nothing later mistakes the prefix for the whole page.
+"""
+
+import re
+from urllib.parse import unquote
+
+from . import http_cache
+
+MAX_PAGE_BYTES = 512 * 1024
+
+ADDRESS_PATTERN = re.compile(r'[a-zA-Z0-9._%+-]{1,64}@[a-zA-Z0-9.-]+\.[a-zA-Z]{2,}')
+MAILTO_PATTERN = re.compile(r'mailto:([^\s"\'<>?#&,;]+)')
+VALID_EMAIL = re.compile(r'^[a-z0-9._%+-]+@[a-z0-9.-]+\.[a-z]{2,}$')
+
+# Registrable domains (and their subdomains) that never belong to a real contact
+JUNK_DOMAINS = {
+    'example.com', 'example.org', 'schema.org', 'w3.org',
+    'sentry.io', 'wixpress.com', 'googleapis.com', 'cloudflare.com',
+}
+# Any domain label (split on '.' and '-') in this set marks tooling / CDN addresses
+JUNK_LABELS = {'sentry', 'webpack', 'wixpress', 'cloudflare', 'googleapis'}
+# Asset filenames like logo@2x.png look like addresses
+JUNK_TLDS = {'png', 'jpg', 'jpeg', 'gif', 'svg', 'webp', 'css', 'js'}
+JUNK_LOCALS = {'noreply', 'donotreply'}
+
+# How far left of an '@' a local part may start, and how far right a match may run
+_LOCAL_WINDOW = 64
+_TAIL = 320
+
+
+def is_junk(email: str) -> bool:
+    local, _, domain = email.rpartition('@')
+    labels = domain.split('.')
+    if labels[-1] in JUNK_TLDS:
+        return True
+    if local.replace('-', '').replace('_', '') in JUNK_LOCALS:
+        return True
+    for i in range(len(labels) - 1):
+        if '.'.join(labels[i:]) in JUNK_DOMAINS:
+            return True
+    return not JUNK_LABELS.isdisjoint(re.split(r'[.-]', domain))
+
+
+class EmailExtractor:
+    """Incremental extractor: feed() text chunks in order, then close() for the result set."""
+
+    def __init__(self):
+        self.emails = set()
+        self._carry = ''
+
+    def _add(self, email: str):
+        email = email.strip().lower()
+        if VALID_EMAIL.match(email) and not is_junk(email):
+            self.emails.add(email)
+
+    def _scan(self, buf: str, final: bool) -> int:
+        """Scan buf, leaving anything near the end for the next chunk. Returns where the carry starts."""
+        limit = len(buf) if final else len(buf) - _TAIL
+        pos = 0  # end of the last accepted address
+
+        i = buf.find('@')
+        while i != -1 and i < limit:
+            window_end = i + _TAIL
+            match = ADDRESS_PATTERN.search(buf, max(pos, i - _LOCAL_WINDOW), window_end)
+            while match and match.end() <= i:
+                match = ADDRESS_PATTERN.search(buf, match.end(), window_end)
+            if match and match.start() <= i:
+                self._add(match.group())
+                pos = match.end()
+                i = buf.find('@', pos)
+            else:
+                i = buf.find('@', i + 1)
+
+        # Plain mailto targets were caught above; only encoded ones need decoding
+        i = buf.find('mailto:')
+        while i != -1 and i < limit:
+            match = MAILTO_PATTERN.match(buf, i)
+            if match and '%' in match.group(1):
+                self._add(unquote(match.group(1)))
+            i = buf.find('mailto:', i + 7)
+
+        return max(pos, limit - _LOCAL_WINDOW, 0)
+
+    def feed(self, text: str):
+        buf = self._carry + text
+        self._carry = buf[self._scan(buf, final=False):]
+
+    def close(self) -> set:
+        self._scan(self._carry, final=True)
+        self._carry = ''
+        return self.emails
+
+
+def extract_emails(text: str) -> set:
+    extractor = EmailExtractor()
+    extractor.feed(text)
+    return extractor.close()
+
+
+def fetch_emails(client, url: str, source: str = 'website', max_bytes: int = MAX_PAGE_BYTES,
+                 throttle=None, **kwargs) -> tuple:
+    """Stream a page through the HTTP cache and extract emails from its first max_bytes.
+
+    `throttle` (anything with .wait(url)) is only consulted when the network is hit.
+    Returns (status_code, emails, from_cache). Pages truncated at max_bytes aren't cached.
+    """
+    state, hit = http_cache.begin(url, source, kwargs)
+    if hit is not None:
+        return hit.status_code, extract_emails(hit.text[:max_bytes]), True
+
+    if throttle is not None:
+        throttle.wait(url)
+
+    extractor = EmailExtractor()
+    with client.stream('GET', url, **kwargs) as resp:
+        if resp.status_code != 200:
+            final = http_cache.finish(state, resp)
+            if final.status_code == 200:  # 304 served from cache
+                return 200, extract_emails(final.text[:max_bytes]), False
+            return resp.status_code, set(), False
+
+        chunks = []
+        truncated = False
+        for chunk in resp.iter_text():
+            chunks.append(chunk)
+            extractor.feed(chunk)
+            if resp.num_bytes_downloaded >= max_bytes:
+                truncated = True
+                break
+        body = ''.join(chunks)
+        http_cache.finish(state, http_cache.CachedResponse(200, body, resp.headers, from_cache=False),
+                          store=not truncated)
+
+    return 200, extractor.close(), False
@@ -0,0 +1,124 @@
+"""
+Shared HTTP clients for every outbound fetch.
+
+One pooled httpx.Client (and an AsyncClient factory with the same settings)
+instead of module-level httpx.get/post, so repeated requests to the same host
+reuse a kept-alive connection instead of paying TCP + TLS setup each time.
+
+Connection reuse is measured with httpcore's "trace" extension: a new
+connection emits connect_tcp / start_tls events, a reused one doesn't.
+"""
+
+import atexit
+import importlib.util
+import threading
+
+import httpx
+
+from .config import (
+    HTTP_TIMEOUT, HTTP_CONNECT_TIMEOUT, HTTP_MAX_CONNECTIONS,
+    HTTP_MAX_KEEPALIVE, HTTP_KEEPALIVE_EXPIRY, HTTP2_ENABLED,
+)
+
+HEADERS = {
+    'User-Agent': 'Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36'
+}
+
+_client = None
+_client_lock = threading.Lock()
+_stats_lock = threading.Lock()
+_stats = {'requests': 0, 'connections': 0, 'tls_handshakes': 0, 'hosts': {}}
+
+
+def _http2_available() -> bool:
+    if not HTTP2_ENABLED:
+        return False
+    # Optional, installed via `pip install httpx[http2]`
+    if importlib.util.find_spec('h2') is not None:
+        return True
+    print("Note: HTTP2=1 but the h2 package isn't installed; using HTTP/1.1")
+    return False
+
+
+def _client_options() -> dict:
+    return {
+        'headers': HEADERS,
+        'timeout': httpx.Timeout(HTTP_TIMEOUT, connect=HTTP_CONNECT_TIMEOUT),
+        'limits': httpx.Limits(
+            max_connections=HTTP_MAX_CONNECTIONS,
+            max_keepalive_connections=HTTP_MAX_KEEPALIVE,
+            keepalive_expiry=HTTP_KEEPALIVE_EXPIRY,
+        ),
+        'http2': _http2_available(),
+        'follow_redirects': True,
+    }
+
+
+def _record(event_name: str, host: str):
+    with _stats_lock:
+        if event_name == 'connection.connect_tcp.complete':
+            _stats['connections'] += 1
+            _stats['hosts'].setdefault(host, [0, 0])[1] += 1
+        elif event_name == 'connection.start_tls.complete':
+            _stats['tls_handshakes'] += 1
+
+
+def _count_request(request: httpx.Request):
+    with _stats_lock:
+        _stats['requests'] += 1
+        _stats['hosts'].setdefault(request.url.host, [0, 0])[0] += 1
+
+
+def _on_request(request: httpx.Request):
+    _count_request(request)
+    host = request.url.host
+    request.extensions['trace'] = lambda event_name, info: _record(event_name, host)
+
+
+async def _on_request_async(request: httpx.Request):
+    _count_request(request)
+    host = request.url.host
+
+    async def trace(event_name, info):
+        _record(event_name, host)
+
+    request.extensions['trace'] = trace
+
+
+def get_http_client() -> httpx.Client:
+    """The process-wide pooled client. Thread-safe; closed at exit."""
+    global _client
+    if _client is None:
+        with _client_lock:
+            if _client is None:
+                _client = httpx.Client(event_hooks={'request': [_on_request]}, **_client_options())
+                atexit.register(_client.close)
+    return _client
+
+
+def make_async_client(**overrides) -> httpx.AsyncClient:
+    """A new AsyncClient with the shared pool settings and stats. Use it as `async with`."""
+    options = {**_client_options(), **overrides}
+    return httpx.AsyncClient(event_hooks={'request': [_on_request_async]}, **options)
+
+
+def get_stats() -> dict:
+    with _stats_lock:
+        stats = {k: v for k, v in _stats.items() if k != 'hosts'}
+        stats['hosts'] = {host: tuple(counts) for host, counts in _stats['hosts'].items()}
+    stats['reused'] = max(stats['requests'] - stats['connections'], 0)
+    return stats
+
+
+def reset_stats():
+    with _stats_lock:
+        _stats.update({'requests': 0, 'connections': 0, 'tls_handshakes': 0, 'hosts': {}})
+
+
+def print_stats():
+    stats = get_stats()
+    if not stats['requests']:
+        return
+    rate = stats['reused'] * 100 // stats['requests']
+    print(f"HTTP: {stats['requests']} requests over {stats['connections']} connections "
+          f"({stats['reused']} reused, {rate}%), {stats['tls_handshakes']} TLS handshakes")
@@ -0,0 +1,262 @@
+"""
+Persistent on-disk HTTP response cache for the scrapers and enrichment.
+
+Bodies are stored content-addressed (blobs/<sha256 of body>) so identical pages
+are kept once. A small SQLite index maps each request key — sha256 of method,
+URL and params — to its blob, validators (ETag / Last-Modified) and timestamps.
+
+  - Fresh entries (younger than their source's TTL) are served without a request
+  - Stale entries are revalidated with If-None-Match / If-Modified-Since; a 304
+    refreshes the entry and serves the stored body
+  - Total size is bounded; least recently used entries are evicted first
+
+Modes: 'use' (default), 'refresh' (always revalidate), 'off' (bypass entirely).
+"""
+
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+
+from .config import HTTP_CACHE_DIR, HTTP_CACHE_MAX_MB
+
+# Seconds a cached response stays fresh, per source
+SOURCE_TTLS = {
+    'apartments_com': 24 * 3600,
+    'google': 12 * 3600,
+    'website': 7 * 24 * 3600,
+}
+DEFAULT_TTL = 24 * 3600
+
+MODES = ('use', 'refresh', 'off')
+
+_cache = None
+_mode = 'use'
+
+
+class CachedResponse:
+    """The subset of httpx.Response the agents read, served from disk."""
+
+    def __init__(self, status_code: int, text: str, headers: dict, from_cache: bool = True):
+        self.status_code = status_code
+        self.text = text
+        self.headers = headers
+        self.from_cache = from_cache
+
+
+class HttpCache:
+    def __init__(self, path: str = HTTP_CACHE_DIR, max_bytes: int = HTTP_CACHE_MAX_MB * 1024 * 1024,
+                 ttls: dict = None):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.ttls = ttls if ttls is not None else SOURCE_TTLS
+        self.stats = {'hits': 0, 'revalidated': 0, 'misses': 0, 'stored': 0, 'evicted': 0}
+        self._lock = threading.Lock()
+
+        os.makedirs(os.path.join(path, 'blobs'), exist_ok=True)
+        self._db = sqlite3.connect(os.path.join(path, 'index.sqlite'), check_same_thread=False)
+        self._db.execute("""
+            create table if not exists entries (
+                key text primary key,
+                url text not null,
+                source text,
+                blob text not null,
+                size integer not null,
+                status integer not null,
+                etag text,
+                last_modified text,
+                stored_at real not null,
+                accessed_at real not null
+            )""")
+        self._db.execute("create index if not exists idx_entries_accessed on entries (accessed_at)")
+        self._db.execute("create index if not exists idx_entries_blob on entries (blob)")
+        self._db.commit()
+        self._total = self._db.execute("select coalesce(sum(size), 0) from entries").fetchone()[0]
+
+    @staticmethod
+    def key_for(url: str, params: dict = None, method: str = 'GET') -> str:
+        raw = json.dumps([method.upper(), url, sorted((params or {}).items())], default=str)
+        return hashlib.sha256(raw.encode()).hexdigest()
+
+    def _blob_path(self, digest: str) -> str:
+        return os.path.join(self.path, 'blobs', digest[:2], digest)
+
+    def lookup(self, key: str):
+        """Return the cached entry as a dict (with 'body'), or None."""
+        with self._lock:
+            row = self._db.execute(
+                "select url, source, blob, status, etag, last_modified, stored_at from entries where key = ?",
+                (key,),
+            ).fetchone()
+            if not row:
+                return None
+            url, source, blob, status, etag, last_modified, stored_at = row
+            try:
+                with open(self._blob_path(blob), 'r', encoding='utf-8') as f:
+                    body = f.read()
+            except OSError:
+                self._delete(key)
+                return None
+            self._db.execute("update entries set accessed_at = ? where key = ?", (time.time(), key))
+            self._db.commit()
+        return {
+            'url': url, 'source': source, 'body': body, 'status': status,
+            'etag': etag, 'last_modified': last_modified, 'stored_at': stored_at,
+        }
+
+    def is_fresh(self, entry: dict, source: str) -> bool:
+        return time.time() - entry['stored_at'] < self.ttls.get(source, DEFAULT_TTL)
+
+    def store(self, key: str, url: str, source: str, status: int, headers, body: str):
+        data = body.encode('utf-8')
+        digest = hashlib.sha256(data).hexdigest()
+        blob_path = self._blob_path(digest)
+        now = time.time()
+
+        with self._lock:
+            if not os.path.exists(blob_path):
+                os.makedirs(os.path.dirname(blob_path), exist_ok=True)
+                tmp = f"{blob_path}.{os.getpid()}.tmp"
+                with open(tmp, 'wb') as f:
+                    f.write(data)
+                os.replace(tmp, blob_path)
+
+            self._delete(key)
+            self._db.execute(
+                "insert into entries (key, url, source, blob, size, status, etag, last_modified, stored_at, accessed_at)"
+                " values (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (key, url, source, digest, len(data), status,
+                 headers.get('etag'), headers.get('last-modified'), now, now),
+            )
+            self._total += len(data)
+            self.stats['stored'] += 1
+            self._evict()
+            self._db.commit()
+
+    def count(self, stat: str):
+        """Bump a hit/miss/revalidated counter; callers run on worker threads and the event loop."""
+        with self._lock:
+            self.stats[stat] += 1
+
+    def mark_revalidated(self, key: str):
+        with self._lock:
+            now = time.time()
+            self._db.execute("update entries set stored_at = ?, accessed_at = ? where key = ?", (now, now, key))
+            self._db.commit()
+
+    def _delete(self, key: str):
+        row = self._db.execute("select blob, size from entries where key = ?", (key,)).fetchone()
+        if not row:
+            return
+        blob, size = row
+        self._db.execute("delete from entries where key = ?", (key,))
+        self._total -= size
+        if not self._db.execute("select 1 from entries where blob = ? limit 1", (blob,)).fetchone():
+            try:
+                os.remove(self._blob_path(blob))
+            except OSError:
+                pass
+
+    def _evict(self):
+        """Drop least recently used entries until the cache fits in max_bytes."""
+        while self._total > self.max_bytes:
+            rows = self._db.execute("select key from entries order by accessed_at limit 100").fetchall()
+            if not rows:
+                break
+            for (key,) in rows:
+                self._delete(key)
+                self.stats['evicted'] += 1
+                if self._total <= self.max_bytes:
+                    break
+
+    def summary(self) -> str:
+        s = self.stats
+        return (f"HTTP cache: {s['hits']} hits, {s['revalidated']} revalidated, {s['misses']} misses, "
+                f"{self._total / (1024 * 1024):.1f} MB on disk")
+
+
+def set_cache_mode(mode: str):
+    """'use' (default), 'refresh' (revalidate everything) or 'off' (no reads or writes)."""
+    global _mode
+    if mode not in MODES:
+        raise ValueError(f"Unknown cache mode: {mode}")
+    _mode = mode
+
+
+def get_cache():
+    """The shared cache, or None when caching is off."""
+    global _cache
+    if _mode == 'off':
+        return None
+    if _cache is None:
+        _cache = HttpCache()
+    return _cache
+
+
+def begin(url: str, source: str, kwargs: dict):
+    """Start a cached request. Returns (state, hit).
+
+    `hit` is a CachedResponse when a fresh entry can be served without a request.
+    Otherwise do the request yourself (kwargs may have gained validator headers)
+    and pass the response to finish(state, resp).
+    """
+    cache = get_cache()
+    if cache is None:
+        return (None, None, None, url, source), None
+
+    key = HttpCache.key_for(url, kwargs.get('params'))
+    entry = cache.lookup(key)
+    if entry and _mode == 'use' and cache.is_fresh(entry, source):
+        cache.count('hits')
+        return (cache, key, entry, url, source), CachedResponse(entry['status'], entry['body'], {})
+
+    if entry:
+        validators = {}
+        if entry['etag']:
+            validators['If-None-Match'] = entry['etag']
+        if entry['last_modified']:
+            validators['If-Modified-Since'] = entry['last_modified']
+        if validators:
+            kwargs['headers'] = {**(kwargs.get('headers') or {}), **validators}
+    return (cache, key, entry, url, source), None
+
+
+def finish(state: tuple, resp, store: bool = True):
+    """Record a network response. Returns what the caller should use (the cached body on a 304).
+
+    With store=False (e.g. a body cut short) the miss is counted but nothing is cached.
+    """
+    cache, key, entry, url, source = state
+    if cache is None:
+        return resp
+    if resp.status_code == 304 and entry:
+        cache.mark_revalidated(key)
+        cache.count('revalidated')
+        return CachedResponse(entry['status'], entry['body'], dict(resp.headers))
+    cache.count('misses')
+    if resp.status_code == 200 and store:
+        cache.store(key, url, source, resp.status_code, resp.headers, resp.text)
+    return resp
+
+
+def cached_get(client, url: str, source: str, **kwargs):
+    """GET through the cache. `client` is anything with httpx's .get() (a Client, or the httpx module)."""
+    state, hit = begin(url, source, kwargs)
+    if hit is not None:
+        return hit
+    return finish(state, client.get(url, **kwargs))
+
+
+async def cached_get_async(client, url: str, source: str, **kwargs):
+    """Async variant of cached_get for an httpx.AsyncClient."""
+    state, hit = begin(url, source, kwargs)
+    if hit is not None:
+        return hit
+    return finish(state, await client.get(url, **kwargs))
+
+
+def print_summary():
+    if _cache is not None:
+        print(_cache.summary())
@@ -0,0 +1,302 @@
+"""
+Incremental reply ingestion: each poll fetches only messages not seen before.
+
+Two sources with the same interface — new_messages(limit) returns up to
+`limit` parsed messages (utils.mail.parse_message dicts, 'key' = marker) and
+commit(markers, retry) records them as processed, except those in `retry`:
+
+  - ImapSource keeps a high-water mark per mailbox: the last processed UID
+    under the folder's UIDVALIDITY, and asks the server only for UIDs above
+    it. A message held back for retry stops the mark; UIDs processed after
+    it are remembered individually so they aren't read again. A UIDVALIDITY
+    change (mailbox rebuilt) starts over from the beginning.
+  - MaildirSource keeps the set of processed Maildir keys (unique, stable
+    filenames) and never touches the mailbox itself.
+
+Both also remember the Message-IDs they've processed, so a second copy of a
+message (delivered twice, or copied back into the folder under a new UID or
+filename) is skipped rather than classified again.
+
+State is a small SQLite file under CACHE_DIR and only advances on commit(),
+so a crash mid-batch means that batch is read again, not lost. Failed
+attempts per message are kept there too, so a retry cap holds across runs.
+"""
+
+import email
+import imaplib
+import mailbox
+import os
+import re
+import sqlite3
+import threading
+
+from .config import CACHE_DIR
+from .mail import parse_message
+
+FETCH_CHUNK = 50  # UIDs per IMAP FETCH
+LOOKUP_CHUNK = 500  # Message-IDs per SQLite in() lookup
+_UID = re.compile(rb'UID (\d+)')
+
+
+class InboxState:
+    def __init__(self, path: str = os.path.join(CACHE_DIR, 'inbox.sqlite')):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.execute("""
+            create table if not exists watermarks (
+                source text primary key,
+                uidvalidity integer,
+                last_uid integer not null
+            )""")
+        self._db.execute("""
+            create table if not exists seen (
+                source text not null,
+                key text not null,
+                primary key (source, key)
+            )""")
+        self._db.execute("""
+            create table if not exists message_ids (
+                source text not null,
+                message_id text not null,
+                primary key (source, message_id)
+            )""")
+        self._db.execute("""
+            create table if not exists attempts (
+                source text not null,
+                key text not null,
+                failures integer not null,
+                primary key (source, key)
+            )""")
+        self._db.commit()
+        self._lock = threading.Lock()
+
+    def watermark(self, source: str) -> tuple:
+        """(uidvalidity, last_uid), or (None, 0) for a new source."""
+        with self._lock:
+            row = self._db.execute(
+                "select uidvalidity, last_uid from watermarks where source = ?", (source,)).fetchone()
+        return row if row else (None, 0)
+
+    def set_watermark(self, source: str, uidvalidity: int, last_uid: int):
+        with self._lock:
+            self._db.execute(
+                "insert or replace into watermarks (source, uidvalidity, last_uid) values (?, ?, ?)",
+                (source, uidvalidity, last_uid))
+            self._db.commit()
+
+    def seen_keys(self, source: str) -> set:
+        with self._lock:
+            return {row[0] for row in self._db.execute("select key from seen where source = ?", (source,))}
+
+    def add_seen(self, source: str, keys: list):
+        with self._lock:
+            self._db.executemany("insert or ignore into seen (source, key) values (?, ?)",
+                                 [(source, key) for key in keys])
+            self._db.commit()
+
+    def remove_seen(self, source: str, keys: list):
+        with self._lock:
+            self._db.executemany("delete from seen where source = ? and key = ?", [(source, key) for key in keys])
+            self._db.commit()
+
+    def processed_ids(self, source: str, message_ids: list) -> set:
+        """The subset of `message_ids` already committed for this source."""
+        found = set()
+        with self._lock:
+            for start in range(0, len(message_ids), LOOKUP_CHUNK):
+                chunk = message_ids[start:start + LOOKUP_CHUNK]
+                found.update(row[0] for row in self._db.execute(
+                    f"select message_id from message_ids where source = ? and message_id in "
+                    f"({','.join('?' * len(chunk))})", (source, *chunk)))
+        return found
+
+    def add_processed_ids(self, source: str, message_ids: list):
+        with self._lock:
+            self._db.executemany("insert or ignore into message_ids (source, message_id) values (?, ?)",
+                                 [(source, message_id) for message_id in message_ids])
+            self._db.commit()
+
+    def add_failure(self, source: str, key) -> int:
+        """Count a failed attempt at a message. Returns its failures so far, across runs."""
+        with self._lock:
+            self._db.execute(
+                "insert into attempts (source, key, failures) values (?, ?, 1)"
+                " on conflict (source, key) do update set failures = failures + 1", (source, str(key)))
+            self._db.commit()
+            return self._db.execute(
+                "select failures from attempts where source = ? and key = ?", (source, str(key))).fetchone()[0]
+
+    def clear_failures(self, source: str, keys: list):
+        with self._lock:
+            self._db.executemany("delete from attempts where source = ? and key = ?",
+                                 [(source, str(key)) for key in keys])
+            self._db.commit()
+
+
+class _Source:
+    """What both sources share: skipping copies of messages already processed, by Message-ID.
+
+    Subclasses implement _fetch(limit) and _commit(keys, retry). A skipped
+    copy is committed along with the next batch, so the source moves past it.
+    """
+
+    def __init__(self, name: str, state: InboxState = None):
+        self.name = name
+        self.state = state or InboxState()
+        self._message_ids = {}  # key -> Message-ID of each message handed out and not yet committed
+        self._duplicates = []   # keys of skipped copies, committed with the next batch
+
+    def new_messages(self, limit: int) -> list:
+        """Up to `limit` new messages, without copies of ones already processed (or earlier in the batch)."""
+        while True:
+            messages = self._fetch(limit)
+            ids = [m['message_id'] for m in messages if m['message_id']]
+            done = self.state.processed_ids(self.name, ids) if ids else set()
+            done.update(self._message_ids.values())
+            fresh = []
+            for message in messages:
+                message_id = message['message_id']
+                if message_id and message_id in done:
+                    self._duplicates.append(message['key'])
+                    continue
+                if message_id:
+                    done.add(message_id)
+                    self._message_ids[message['key']] = message_id
+                fresh.append(message)
+            if fresh or not messages:
+                return fresh
+            self.commit([])  # the whole batch was copies: record them and read on
+
+    def commit(self, keys: list, retry: set = ()):
+        """Record `keys` (and any skipped copies) as processed, except those in `retry`."""
+        keys = [*keys, *self._duplicates]
+        self._duplicates = []
+        self._commit(keys, retry)
+        ids = {key: self._message_ids.pop(key) for key in keys if key in self._message_ids}
+        self.state.add_processed_ids(self.name, [message_id for key, message_id in ids.items() if key not in retry])
+
+
+class MaildirSource(_Source):
+    def __init__(self, path: str, state: InboxState = None):
+        super().__init__(f"maildir:{os.path.abspath(path)}", state)
+        self.path = path
+        self._seen = None
+
+    def _fetch(self, limit: int) -> list:
+        if self._seen is None:
+            self._seen = self.state.seen_keys(self.name)
+        box = mailbox.Maildir(self.path, create=False)
+        # Maildir keys start with the delivery time, so sorting reads oldest first
+        keys = sorted(key for key in box.iterkeys() if key not in self._seen)[:limit]
+        messages = []
+        for key in keys:
+            try:
+                messages.append(parse_message(box[key], key))
+            except (KeyError, OSError):
+                continue  # moved or deleted since listing
+        return messages
+
+    def _commit(self, keys: list, retry: set = ()):
+        done = [key for key in keys if key not in retry]
+        self.state.add_seen(self.name, done)
+        self.state.clear_failures(self.name, done)
+        self._seen.update(done)
+
+    def close(self):
+        pass
+
+
+class ImapSource(_Source):
+    """IMAP folder read-only by UID. `connect` returns a logged-in imaplib.IMAP4-like object (swap in a stand-in to test)."""
+
+    def __init__(self, host: str, user: str, password: str, folder: str = 'INBOX', port: int = 993,
+                 state: InboxState = None, connect=None):
+        super().__init__(f"imap:{user}@{host}/{folder}", state)
+        self.folder = folder
+        self._connect = connect or (lambda: self._login(host, port, user, password))
+        self._conn = None
+        self._uidvalidity = None
+        self._all_pending = False  # the last new_messages() returned every unprocessed UID
+
+    def _done_above(self) -> set:
+        """UIDs above the watermark already processed (past a message held back for retry)."""
+        prefix = f"{self._uidvalidity}:"
+        return {int(key[len(prefix):]) for key in self.state.seen_keys(self.name) if key.startswith(prefix)}
+
+    @staticmethod
+    def _login(host: str, port: int, user: str, password: str):
+        conn = imaplib.IMAP4_SSL(host, port)
+        conn.login(user, password)
+        return conn
+
+    def _open(self):
+        if self._conn is None:
+            self._conn = self._connect()
+            typ, _ = self._conn.select(self.folder, readonly=True)
+            if typ != 'OK':
+                raise RuntimeError(f"Can't open IMAP folder {self.folder}")
+            _, data = self._conn.response('UIDVALIDITY')
+            self._uidvalidity = int(data[0]) if data and data[0] else None
+        return self._conn
+
+    def _fetch(self, limit: int) -> list:
+        conn = self._open()
+        conn.noop()  # let the server report new arrivals on a long-lived connection
+        uidvalidity, last_uid = self.state.watermark(self.name)
+        if uidvalidity is not None and uidvalidity != self._uidvalidity:
+            print(f"  {self.name}: UIDVALIDITY changed, rescanning the folder")
+            last_uid = 0
+
+        _, data = conn.uid('SEARCH', None, f'UID {last_uid + 1}:*')
+        # "n:*" always matches the newest message, even when its UID is below n
+        done = self._done_above()
+        pending = sorted(uid for uid in (int(u) for u in (data[0] or b'').split())
+                         if uid > last_uid and uid not in done)
+        uids = pending[:limit]
+        self._all_pending = len(pending) <= limit
+
+        messages = []
+        for start in range(0, len(uids), FETCH_CHUNK):
+            chunk = uids[start:start + FETCH_CHUNK]
+            _, fetched = conn.uid('FETCH', ','.join(map(str, chunk)), '(UID RFC822)')
+            for item in fetched or []:
+                if not isinstance(item, tuple):
+                    continue
+                match = _UID.search(item[0])
+                if match:
+                    messages.append(parse_message(email.message_from_bytes(item[1]), int(match.group(1))))
+        messages.sort(key=lambda m: m['key'])
+        return messages
+
+    def _commit(self, uids: list, retry: set = ()):
+        """Advance the watermark past `uids`, stopping short of the first one to retry.
+
+        Processed UIDs above a retried one are recorded individually, and
+        dropped again once the watermark moves past them.
+        """
+        done = [uid for uid in uids if uid not in retry]
+        self.state.clear_failures(self.name, done)
+        uidvalidity, last_uid = self.state.watermark(self.name)
+        if uidvalidity != self._uidvalidity:
+            last_uid = 0
+        held = min(retry) if retry else None
+        mark = max([last_uid, *(uid for uid in done if held is None or uid < held)])
+        if held is None and self._all_pending:
+            # Nothing else is waiting, so every UID recorded above the mark is done too
+            mark = max([mark, *self._done_above()])
+
+        known = self.state.seen_keys(self.name)
+        prefix = f"{self._uidvalidity}:"
+        self.state.add_seen(self.name, [f"{prefix}{uid}" for uid in done if uid > mark])
+        self.state.remove_seen(self.name, [key for key in known
+                                           if not key.startswith(prefix) or int(key[len(prefix):]) <= mark])
+        if mark != last_uid or uidvalidity != self._uidvalidity:
+            self.state.set_watermark(self.name, self._uidvalidity, mark)
+
+    def close(self):
+        if self._conn is not None:
+            try:
+                self._conn.logout()
+            except Exception:
+                pass
+            self._conn = None
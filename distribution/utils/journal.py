@@ -0,0 +1,169 @@
+"""
+Local run journal for resumable pipeline runs.
+
+Every run gets an id and its parameters are recorded. Each item a stage
+handles (a scraped page, a building, a contact's draft, a send) is written
+down with its outcome, and for single-item stages with its outputs too.
+Resuming a run skips items already done, replaying their outputs downstream
+instead of redoing the scrape or the LLM call. Failed items are retried.
+
+Stored in CACHE_DIR/runs.sqlite next to the other local caches.
+"""
+
+import json
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from datetime import datetime
+
+from .config import CACHE_DIR
+
+
+class RunJournal:
+    def __init__(self, run_id: str, path: str = os.path.join(CACHE_DIR, 'runs.sqlite')):
+        self.run_id = run_id
+        self._db = _connect(path)
+        self._lock = threading.Lock()
+
+    @classmethod
+    def start(cls, params: dict, path: str = os.path.join(CACHE_DIR, 'runs.sqlite')) -> 'RunJournal':
+        run_id = f"{datetime.now().strftime('%Y%m%d-%H%M%S')}-{uuid.uuid4().hex[:4]}"
+        journal = cls(run_id, path)
+        with journal._lock:
+            journal._db.execute(
+                "insert into runs (run_id, params, status, started_at) values (?, ?, 'running', ?)",
+                (run_id, json.dumps(params), time.time()))
+            journal._db.commit()
+        return journal
+
+    @classmethod
+    def resume(cls, run_id: str, path: str = os.path.join(CACHE_DIR, 'runs.sqlite')) -> 'RunJournal':
+        journal = cls(run_id, path)
+        if journal.params() is None:
+            raise ValueError(f"No such run: {run_id}")
+        with journal._lock:
+            journal._db.execute("update runs set status = 'running', finished_at = null where run_id = ?", (run_id,))
+            journal._db.commit()
+        return journal
+
+    def params(self) -> dict:
+        with self._lock:
+            row = self._db.execute("select params from runs where run_id = ?", (self.run_id,)).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def finish(self, status: str = 'done'):
+        with self._lock:
+            self._db.execute("update runs set status = ?, finished_at = ? where run_id = ?",
+                             (status, time.time(), self.run_id))
+            self._db.commit()
+
+    def record(self, stage: str, key: str, status: str, outputs: list = None, error: str = None):
+        with self._lock:
+            self._db.execute(
+                "insert or replace into items (run_id, stage, key, status, outputs, error, updated_at)"
+                " values (?, ?, ?, ?, ?, ?, ?)",
+                (self.run_id, stage, str(key), status,
+                 json.dumps(outputs, default=str) if outputs is not None else None, error, time.time()))
+            self._db.commit()
+
+    def completed(self, stage: str) -> dict:
+        """{key: stored outputs (or None)} for the stage's items that finished."""
+        with self._lock:
+            rows = self._db.execute(
+                "select key, outputs from items where run_id = ? and stage = ? and status = 'done'",
+                (self.run_id, stage)).fetchall()
+        return {key: json.loads(outputs) if outputs else None for key, outputs in rows}
+
+    def counts(self) -> dict:
+        """{stage: {status: n}} for this run."""
+        with self._lock:
+            rows = self._db.execute(
+                "select stage, status, count(*) from items where run_id = ? group by stage, status",
+                (self.run_id,)).fetchall()
+        counts = {}
+        for stage, status, n in rows:
+            counts.setdefault(stage, {})[status] = n
+        return counts
+
+    def wrap(self, stage: str, fn, key, batch: bool = False):
+        """A stage fn that journals each item's outcome and skips items this run already finished.
+
+        Single-item stages replay a finished item's stored outputs; batch
+        stages only record outcomes.
+        """
+        done = self.completed(stage)
+        skipped = {'n': 0}
+
+        if batch:
+            def run_batch(items: list) -> list:
+                todo = [item for item in items if str(key(item)) not in done]
+                skipped['n'] += len(items) - len(todo)
+                if not todo:
+                    return []
+                try:
+                    outputs = fn(todo)
+                except Exception as e:
+                    for item in todo:
+                        self.record(stage, key(item), 'failed', error=str(e))
+                    raise
+                for item in todo:
+                    self.record(stage, key(item), 'done')
+                return outputs
+            run_batch.skipped = skipped
+            return run_batch
+
+        def run_one(item) -> list:
+            item_key = str(key(item))
+            if item_key in done:
+                skipped['n'] += 1
+                return done[item_key] or []
+            try:
+                outputs = fn(item) or []
+            except Exception as e:
+                self.record(stage, item_key, 'failed', error=str(e))
+                raise
+            self.record(stage, item_key, 'done', outputs)
+            return outputs
+        run_one.skipped = skipped
+        return run_one
+
+
+def _connect(path: str):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    db = sqlite3.connect(path, check_same_thread=False)
+    db.execute("""
+        create table if not exists runs (
+            run_id text primary key,
+            params text not null,
+            status text not null,
+            started_at real not null,
+            finished_at real
+        )""")
+    db.execute("""
+        create table if not exists items (
+            run_id text not null,
+            stage text not null,
+            key text not null,
+            status text not null,
+            outputs text,
+            error text,
+            updated_at real not null,
+            primary key (run_id, stage, key)
+        )""")
+    db.commit()
+    return db
+
+
+def list_runs(limit: int = 10, path: str = os.path.join(CACHE_DIR, 'runs.sqlite')) -> list:
+    """Most recent runs as dicts with run_id, status, started_at, finished_at and per-status item counts."""
+    db = _connect(path)
+    runs = []
+    for run_id, status, started_at, finished_at in db.execute(
+            "select run_id, status, started_at, finished_at from runs order by started_at desc limit ?", (limit,)):
+        items = dict(db.execute("select status, count(*) from items where run_id = ? group by status", (run_id,)))
+        runs.append({'run_id': run_id, 'status': status, 'started_at': started_at,
+                     'finished_at': finished_at, 'items': items})
+    db.close()
+    return runs
@@ -0,0 +1,95 @@
+"""
+Small persistent key/value cache for expensive lookups (API results, LLM output).
+
+Values are JSON, stored in one SQLite file per cache under CACHE_DIR. Entries
+expire after `ttl` seconds and the least recently used are evicted once the
+cache holds more than `max_entries`.
+
+Modes: 'use' (default), 'refresh' (skip reads, still write), 'off' (bypass).
+"""
+
+import json
+import os
+import sqlite3
+import threading
+import time
+
+from .config import CACHE_DIR
+
+
+class DiskCache:
+    def __init__(self, name: str, ttl: float, max_entries: int = 10000, path: str = CACHE_DIR):
+        self.name = name
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.mode = 'use'
+        self.stats = {'hits': 0, 'misses': 0, 'stored': 0, 'evicted': 0}
+        self._path = os.path.join(path, f'{name}.sqlite')
+        self._db = None
+        self._lock = threading.Lock()
+
+    def _conn(self):
+        if self._db is None:
+            os.makedirs(os.path.dirname(self._path), exist_ok=True)
+            self._db = sqlite3.connect(self._path, check_same_thread=False)
+            self._db.execute("""
+                create table if not exists entries (
+                    key text primary key,
+                    value text not null,
+                    stored_at real not null,
+                    accessed_at real not null
+                )""")
+            self._db.execute("create index if not exists idx_entries_accessed on entries (accessed_at)")
+            self._db.commit()
+        return self._db
+
+    def get(self, key: str):
+        """The cached value, or None on a miss / expired entry."""
+        if self.mode != 'use':
+            self.stats['misses'] += 1
+            return None
+        with self._lock:
+            db = self._conn()
+            row = db.execute("select value, stored_at from entries where key = ?", (key,)).fetchone()
+            now = time.time()
+            if row and now - row[1] < self.ttl:
+                db.execute("update entries set accessed_at = ? where key = ?", (now, key))
+                db.commit()
+                self.stats['hits'] += 1
+                return json.loads(row[0])
+            if row:
+                db.execute("delete from entries where key = ?", (key,))
+                db.commit()
+            self.stats['misses'] += 1
+            return None
+
+    def set(self, key: str, value):
+        if self.mode == 'off':
+            return
+        with self._lock:
+            db = self._conn()
+            now = time.time()
+            db.execute(
+                "insert or replace into entries (key, value, stored_at, accessed_at) values (?, ?, ?, ?)",
+                (key, json.dumps(value), now, now),
+            )
+            self.stats['stored'] += 1
+            count = db.execute("select count(*) from entries").fetchone()[0]
+            if count > self.max_entries:
+                excess = count - self.max_entries
+                db.execute(
+                    "delete from entries where key in (select key from entries order by accessed_at limit ?)",
+                    (excess,),
+                )
+                self.stats['evicted'] += excess
+            db.commit()
+
+    def delete(self, key: str):
+        with self._lock:
+            db = self._conn()
+            db.execute("delete from entries where key = ?", (key,))
+            db.commit()
+
+    def hit_rate(self) -> float:
+        lookups = self.stats['hits'] + self.stats['misses']
+        return self.stats['hits'] / lookups if lookups else 0.0
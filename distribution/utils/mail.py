@@ -0,0 +1,94 @@
+"""
+Reading replies out of local mailboxes (mbox files and Maildir directories).
+
+Messages are yielded one at a time, so a large mailbox is never loaded whole.
+Each is reduced to what the classifier needs: the sender's address, subject,
+Message-ID, headers, and the new text of the reply with quoted history cut off.
+"""
+
+import html
+import mailbox
+import re
+from email.utils import parseaddr
+
+MAX_REPLY_CHARS = 4000  # classification only needs the top of a reply
+
+QUOTE_HEADER = re.compile(r'^(On .+wrote:|-{2,} ?Original Message ?-{2,}|From: .+|Sent from my .+)$', re.IGNORECASE)
+TAG = re.compile(r'<[^>]+>')
+MESSAGE_ID = re.compile(r'<[^<>\s]+>')
+
+
+def open_mailbox(path: str, fmt: str):
+    """A read-only mailbox.mbox or mailbox.Maildir for `fmt` ('mbox' or 'maildir')."""
+    if fmt == 'mbox':
+        return mailbox.mbox(path, create=False)
+    if fmt == 'maildir':
+        return mailbox.Maildir(path, create=False)
+    raise ValueError(f"Unknown mailbox format: {fmt}")
+
+
+def _decode(part) -> str:
+    payload = part.get_payload(decode=True) or b''
+    try:
+        return payload.decode(part.get_content_charset() or 'utf-8', errors='replace')
+    except LookupError:
+        return payload.decode('utf-8', errors='replace')
+
+
+def message_text(msg) -> str:
+    """The message's text/plain body, or its HTML body with tags stripped."""
+    parts = [part for part in msg.walk() if not part.is_multipart() and not part.get_filename()]
+    for content_type in ('text/plain', 'text/html'):
+        for part in parts:
+            if part.get_content_type() == content_type:
+                text = _decode(part)
+                if content_type == 'text/html':
+                    text = html.unescape(TAG.sub(' ', re.sub(r'(?i)<br\s*/?>|</p>', '\n', text)))
+                return text
+    return ''
+
+
+def strip_quoted(text: str) -> str:
+    """Drop the quoted conversation below a reply ('> ...' lines, 'On ... wrote:' and what follows)."""
+    lines = []
+    for line in text.splitlines():
+        stripped = line.strip()
+        if stripped.startswith('>'):
+            continue
+        if QUOTE_HEADER.match(stripped):
+            break
+        lines.append(line.rstrip())
+    return '\n'.join(lines).strip()[:MAX_REPLY_CHARS]
+
+
+def references(msg) -> list:
+    """Message-IDs this message replies to, most direct first (In-Reply-To, then References newest first)."""
+    refs = MESSAGE_ID.findall(msg.get('In-Reply-To') or '')
+    refs += reversed(MESSAGE_ID.findall(msg.get('References') or ''))
+    return list(dict.fromkeys(refs))
+
+
+def parse_message(msg, key: str = None) -> dict:
+    return {
+        'key': key,
+        'message_id': (msg.get('Message-ID') or '').strip(),
+        'references': references(msg),
+        'sender': parseaddr(msg.get('From', ''))[1].strip().lower(),
+        'subject': msg.get('Subject', ''),
+        'text': strip_quoted(message_text(msg)),
+        'message': msg,
+    }
+
+
+def iter_messages(path: str, fmt: str):
+    """Yield parse_message() dicts for every message in a mailbox, one at a time."""
+    box = open_mailbox(path, fmt)
+    try:
+        for key in box.iterkeys():
+            try:
+                msg = box[key]
+            except (KeyError, OSError):
+                continue  # removed while we were reading
+            yield parse_message(msg, key)
+    finally:
+        box.close()
@@ -0,0 +1,221 @@
+"""
+Streaming stage executor: items flow through a chain of stages as soon as
+they're produced instead of each stage waiting for the previous one to finish.
+
+Each Stage has its own worker threads and a bounded input queue. A full queue
+blocks the stage feeding it, so a slow consumer throttles its producers and
+memory stays flat no matter how many items pass through.
+
+    stages = [
+        Stage('enrich', enrich_one, workers=4),
+        Stage('save', save_many, batch_size=25),
+    ]
+    run_pipeline(produce, stages)
+
+`produce(emit)` calls emit(item) for every item entering the first stage.
+A stage's `fn` takes one item (or, with batch_size > 1, a list of up to
+batch_size items already waiting) and returns the items to pass downstream.
+`seed()` feeds extra items into a stage alongside its upstream (e.g. a
+backlog already in the database); with `key`, an item whose key the stage
+has already taken is skipped. An exception drops the item, not the run.
+"""
+
+import queue
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, wait
+
+_DONE = object()
+
+
+class Stage:
+    def __init__(self, name: str, fn, workers: int = 1, batch_size: int = 1, limit: int = None,
+                 queue_size: int = None, seed=None, key=None):
+        self.name = name
+        self.fn = fn
+        self.workers = workers
+        self.batch_size = batch_size
+        self.limit = limit
+        self.seed = seed
+        self.key = key
+        self.queue = queue.Queue(maxsize=queue_size or max(2 * workers, batch_size))
+        self.stats = {'in': 0, 'out': 0, 'errors': 0, 'dropped': 0, 'busy': 0.0,
+                      'first_out': None, 'last_out': None, 'max_queue': 0}
+        self._lock = threading.Lock()
+        self._producers = 0
+        self._seen = set()
+
+    def _take(self, item) -> bool:
+        """Count an item in; False for a repeated key or once the limit is reached (the item is dropped)."""
+        with self._lock:
+            key = self.key(item) if self.key else None
+            if key is not None and key in self._seen:
+                self.stats['dropped'] += 1
+                return False
+            if self.limit is not None and self.stats['in'] >= self.limit:
+                self.stats['dropped'] += 1
+                return False
+            if key is not None:
+                self._seen.add(key)
+            self.stats['in'] += 1
+            return True
+
+
+def _put(stage: Stage, item):
+    stage.queue.put(item)
+    depth = stage.queue.qsize()
+    if depth > stage.stats['max_queue']:
+        stage.stats['max_queue'] = depth
+
+
+def _finish_producer(stage: Stage):
+    """One of the stage's producers is done; the last one closes the stage's input."""
+    with stage._lock:
+        stage._producers -= 1
+        last = stage._producers == 0
+    if last:
+        for _ in range(stage.workers):
+            stage.queue.put(_DONE)
+
+
+def _worker(stage: Stage, downstream: Stage, started: float, stop: threading.Event):
+    closed = False
+    while not closed:
+        item = stage.queue.get()
+        if item is _DONE:
+            break
+        batch = [item]
+        while len(batch) < stage.batch_size:
+            try:
+                item = stage.queue.get_nowait()
+            except queue.Empty:
+                break
+            if item is _DONE:
+                closed = True
+                break
+            batch.append(item)
+
+        batch = [item for item in batch if stage._take(item)]
+        if not batch or stop.is_set():
+            continue
+
+        began = time.monotonic()
+        try:
+            outputs = stage.fn(batch if stage.batch_size > 1 else batch[0]) or []
+        except Exception as e:
+            with stage._lock:
+                stage.stats['errors'] += len(batch)
+            print(f"  ✗ {stage.name}: {e}")
+            outputs = []
+        now = time.monotonic()
+        with stage._lock:
+            stage.stats['busy'] += now - began
+            if outputs:
+                stage.stats['out'] += len(outputs)
+                if stage.stats['first_out'] is None:
+                    stage.stats['first_out'] = now - started
+                stage.stats['last_out'] = now - started
+
+        if downstream is not None:
+            for output in outputs:
+                _put(downstream, output)
+
+    if downstream is not None:
+        _finish_producer(downstream)
+
+
+def _feed(produce, stage: Stage, stop: threading.Event):
+    def emit(item):
+        if not stop.is_set():
+            _put(stage, item)
+    try:
+        produce(emit)
+    except Exception as e:
+        print(f"  ✗ feeding {stage.name}: {e}")
+    finally:
+        _finish_producer(stage)
+
+
+def run_pipeline(produce, stages: list, stop: threading.Event = None) -> dict:
+    """Run `produce` into the first stage and stream through the rest. Returns {stage name: stats}.
+
+    On Ctrl+C the items in flight finish and the rest are skipped; the stats
+    then carry `_interrupted` so callers don't carry on as if the run completed.
+    `stop` is set at that point too, so a producer that was handed it (e.g.
+    a scrape) can stop early instead of running to the end.
+    """
+    started = time.monotonic()
+    stop = stop or threading.Event()
+
+    feeders = [(produce, stages[0])] if produce is not None else []
+    for stage in stages:
+        if stage.seed is not None:
+            seed = stage.seed
+            feeders.append((lambda emit, seed=seed: [emit(item) for item in seed()], stage))
+    for i, stage in enumerate(stages):
+        # Every upstream worker and every feeder closes its share of the stage's input
+        upstream = stages[i - 1].workers if i > 0 else 0
+        stage._producers = upstream + sum(1 for _, target in feeders if target is stage)
+
+    threads = []
+    for i, stage in enumerate(stages):
+        if stage._producers == 0:  # nothing will ever feed it
+            for _ in range(stage.workers):
+                stage.queue.put(_DONE)
+        downstream = stages[i + 1] if i + 1 < len(stages) else None
+        for _ in range(stage.workers):
+            threads.append(threading.Thread(target=_worker, args=(stage, downstream, started, stop), daemon=True))
+    threads += [threading.Thread(target=_feed, args=(fn, stage, stop), daemon=True) for fn, stage in feeders]
+
+    for thread in threads:
+        thread.start()
+    try:
+        for thread in threads:
+            while thread.is_alive():
+                thread.join(timeout=0.5)
+    except KeyboardInterrupt:
+        # Let in-flight items finish; everything still queued is skipped
+        print("\nStopping: finishing items in flight...")
+        stop.set()
+        for thread in threads:
+            thread.join()
+
+    stats = {stage.name: dict(stage.stats) for stage in stages}
+    stats['_elapsed'] = time.monotonic() - started
+    stats['_interrupted'] = stop.is_set()
+    return stats
+
+
+def print_pipeline_stats(stats: dict):
+    print(f"{'stage':<10} {'in':>6} {'out':>6} {'errors':>6} {'dropped':>7} {'busy s':>8} "
+          f"{'first out':>9} {'max queue':>9}")
+    for name, s in stats.items():
+        if name.startswith('_'):
+            continue
+        first = f"{s['first_out']:.1f}s" if s['first_out'] is not None else '-'
+        print(f"{name:<10} {s['in']:>6} {s['out']:>6} {s['errors']:>6} {s['dropped']:>7} {s['busy']:>8.1f} "
+              f"{first:>9} {s['max_queue']:>9}")
+    print(f"Wall clock: {stats['_elapsed']:.1f}s{' (interrupted)' if stats.get('_interrupted') else ''}")
+
+
+def iter_completed(pool, fn, items, max_pending: int):
+    """Yield (item, future) as fn(item) calls finish, keeping at most `max_pending` submitted.
+
+    Lets a worker pool consume a stream of any length (e.g. a db.iter_* generator)
+    without materializing it or its futures.
+    """
+    pending = {}
+    items = iter(items)
+    exhausted = False
+    while pending or not exhausted:
+        while not exhausted and len(pending) < max_pending:
+            item = next(items, _DONE)
+            if item is _DONE:
+                exhausted = True
+            else:
+                pending[pool.submit(fn, item)] = item
+        if not pending:
+            break
+        done, _ = wait(pending, return_when=FIRST_COMPLETED)
+        for future in done:
+            yield pending.pop(future), future
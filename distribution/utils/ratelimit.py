@@ -0,0 +1,134 @@
+"""
+Rate limiting helpers shared by the agents.
+Politeness comes from spacing requests per host, not from blanket sleeps.
+"""
+
+import asyncio
+import threading
+import time
+from urllib.parse import urlsplit
+
+
+def host_of(url: str) -> str:
+    return (urlsplit(url).hostname or '').lower()
+
+
+class HostRateLimiter:
+    """Async per-host spacing: request starts to the same host are at least `interval` seconds apart.
+
+    Different hosts never wait on each other. Meant for a single event loop.
+    """
+
+    def __init__(self, default_interval: float = 1.0, intervals: dict = None):
+        self.default_interval = default_interval
+        self.intervals = intervals or {}
+        self._next_slot = {}
+
+    def interval_for(self, host: str) -> float:
+        return self.intervals.get(host, self.default_interval)
+
+    async def wait(self, url: str):
+        """Reserve the next slot for this URL's host and sleep until it arrives."""
+        host = host_of(url)
+        now = time.monotonic()
+        slot = max(now, self._next_slot.get(host, now))
+        self._next_slot[host] = slot + self.interval_for(host)
+        if slot > now:
+            await asyncio.sleep(slot - now)
+
+
+class HostThrottle:
+    """Thread-safe per-host spacing for worker pools (the blocking twin of HostRateLimiter)."""
+
+    def __init__(self, default_interval: float = 1.0, intervals: dict = None):
+        self.default_interval = default_interval
+        self.intervals = intervals or {}
+        self._next_slot = {}
+        self._lock = threading.Lock()
+
+    def wait(self, url: str):
+        host = host_of(url)
+        with self._lock:
+            now = time.monotonic()
+            slot = max(now, self._next_slot.get(host, now))
+            self._next_slot[host] = slot + self.intervals.get(host, self.default_interval)
+        if slot > now:
+            time.sleep(slot - now)
+
+
+class TokenBucket:
+    """Thread-safe token bucket: `rate` tokens per second, bursts up to `capacity`."""
+
+    def __init__(self, rate: float, capacity: float = 1):
+        self.rate = rate
+        self.capacity = capacity
+        self._tokens = capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self, tokens: float = 1):
+        """Block until `tokens` are available, then take them."""
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self._tokens >= tokens:
+                    self._tokens -= tokens
+                    return
+                wait = (tokens - self._tokens) / self.rate
+            time.sleep(wait)
+
+
+class AdaptiveLimiter:
+    """Thread-safe concurrency cap that halves on overload and creeps back up on success (AIMD).
+
+    Wrap each call in `with limiter:`. Report the outcome with success() or
+    backoff(delay); a backoff also pauses new calls for `delay` seconds.
+    """
+
+    def __init__(self, max_concurrency: int, min_concurrency: int = 1):
+        self.max_concurrency = max_concurrency
+        self.min_concurrency = min_concurrency
+        self.limit = max_concurrency
+        self.stats = {'backoffs': 0, 'lowest_limit': max_concurrency}
+        self._active = 0
+        self._successes = 0
+        self._resume_at = 0.0
+        self._cond = threading.Condition()
+
+    def __enter__(self):
+        with self._cond:
+            while True:
+                pause = self._resume_at - time.monotonic()
+                if pause <= 0 and self._active < self.limit:
+                    break
+                self._cond.wait(timeout=pause if pause > 0 else None)
+            self._active += 1
+        return self
+
+    def __exit__(self, *exc):
+        with self._cond:
+            self._active -= 1
+            self._cond.notify_all()
+        return False
+
+    def success(self):
+        """One more slot after `limit` consecutive successes, up to max_concurrency."""
+        with self._cond:
+            self._successes += 1
+            if self._successes >= self.limit and self.limit < self.max_concurrency:
+                self.limit += 1
+                self._successes = 0
+                self._cond.notify_all()
+
+    def backoff(self, delay: float):
+        """Halve the limit and pause for `delay`. Overloads inside one pause count once."""
+        with self._cond:
+            now = time.monotonic()
+            if now >= self._resume_at:
+                self.limit = max(self.min_concurrency, self.limit // 2)
+                self.stats['backoffs'] += 1
+                self.stats['lowest_limit'] = min(self.stats['lowest_limit'], self.limit)
+            self._successes = 0
+            self._resume_at = max(self._resume_at, now + delay)
@@ -0,0 +1,139 @@
+"""
+Deterministic pre-classifier for replies that don't need a model.
+
+Auto-responders announce themselves in headers (Auto-Submitted: auto-replied,
+X-Autoreply, Precedence: auto_reply) or in a stock subject line, delivery
+failures in DSN headers or a mailer-daemon subject, and unsubscribe requests
+are short and formulaic. Those are resolved here with high confidence; anything
+ambiguous (a question, a sign of interest, a referral to someone else, a
+contact who has left, a long reply) returns None and goes to the model.
+
+Precision matters more than coverage: a miss only costs one LLM call, a wrong
+answer changes a contact's status. benchmarks/eval_reply_rules.py measures
+both against a labeled corpus.
+"""
+
+import re
+
+# auto-generated / auto-notified also cover bounces, ticket acknowledgements and read receipts
+AUTO_SUBMITTED = re.compile(r'^auto-replied', re.IGNORECASE)
+AUTO_REPLY_HEADERS = ('X-Autoreply', 'X-Autorespond', 'X-Autoresponder')
+OOO_SUBJECT = re.compile(
+    r'^\s*(automatic reply|auto[- ]?reply|autoresponse|out of (the )?office|ooo\b|away from (the )?office'
+    r'|abwesenheitsnotiz|r[ée]ponse automatique|respuesta autom[áa]tica)',
+    re.IGNORECASE,
+)
+OOO_BODY = re.compile(
+    r"\b(i am|i'm|i will be|i'll be|currently)\s+(out of (the )?office|away|on (annual |parental |maternity |paternity )?leave"
+    r"|on vacation|on holiday|travell?ing)\b"
+    r"|\b(limited|no) access to (my )?e-?mail\b"
+    r"|\bthis is an automat(ic|ed) (reply|response|message)\b",
+    re.IGNORECASE,
+)
+RETURN_DATE = re.compile(
+    r"\b(?:back|return(?:ing)?|office|away|leave|vacation)\s+(?:on|by|until|till|after|through)\s+"
+    r"((?:mon|tues|wednes|thurs|fri|satur|sun)day,?\s+)?([a-z]+\.?\s+\d{1,2}(?:st|nd|rd|th)?|\d{1,2}/\d{1,2}(?:/\d{2,4})?)",
+    re.IGNORECASE,
+)
+BOUNCE_SUBJECT = re.compile(
+    r'^\s*(undeliverable|undelivered mail|delivery status notification|delivery (has )?failed|delivery failure'
+    r'|mail delivery (failed|failure|subsystem)|returned mail|failure notice|message not delivered)',
+    re.IGNORECASE,
+)
+BOUNCE_SENDER = re.compile(r'\b(mailer-daemon|postmaster)@', re.IGNORECASE)
+UNSUBSCRIBE = re.compile(
+    r"\b(unsubscribe|remove me|take me off|opt[- ]?(me )?out|stop (e-?mailing|contacting|sending|messaging)"
+    r"|(do not|don't|dont) (e-?mail|contact|reach out)|no (more|further) e-?mails|not (to )?(be )?contacted)\b",
+    re.IGNORECASE,
+)
+# Anything that reads like a human engaging sends the reply to the model
+ENGAGED = re.compile(
+    r"\?|\b((?<!not )interested|curious|let'?s (chat|talk|connect|set up)|happy to|would love|sounds (good|great)"
+    r"|call me|give me a call|pricing|how does|send (me |us |over )?(more|details|info|a proposal|a deck)"
+    r"|loop in|cc'?ing|reach out to)\b",
+    re.IGNORECASE,
+)
+# The contact has left or isn't the one to ask: a wrong_person reply for the
+# model to read (and pick up the referral), even when it also says "remove me"
+# or comes from an auto-responder
+LEFT = re.compile(
+    r"\b(no longer (with|at|employed|work(s|ing)? (at|for|with|here))|(i|i've|i have|she has|he has) left (the|\w+)"
+    r"|(has|have) retired|my last day (was|at))\b",
+    re.IGNORECASE,
+)
+REFERRAL = re.compile(
+    r"\b(not the (right|best|correct|appropriate) (person|contact)|wrong (person|contact)"
+    r"|(talk|speak) (to|with)|(contact|e-?mail|ask|try) \w+( \w+)? instead|instead,? (contact|e-?mail|talk|speak|reach)"
+    r"|you(?:'d| would|'ll| will| should) (want|need) to|(handles|runs|manages|oversees|in charge of) (our |the )?\w+"
+    r"|forward(ed|ing)? (this|it|your)|use my (work|other|business|new) (e-?mail|address)|send (it|them|these) to)\b"
+    r"|[\w.+-]+@[\w-]+\.\w+",
+    re.IGNORECASE,
+)
+
+MAX_UNSUBSCRIBE_CHARS = 300
+MAX_OOO_CHARS = 1500
+
+
+def _header(headers, name: str) -> str:
+    if headers is None:
+        return ''
+    return str(headers.get(name) or '').strip()
+
+
+def _result(category: str, confidence: float, summary: str, notes: str = None) -> dict:
+    return {
+        'category': category,
+        'confidence': confidence,
+        'summary': summary,
+        'suggested_response': None,
+        'notes': notes,
+        'source': 'rules',
+    }
+
+
+def _return_note(text: str):
+    match = RETURN_DATE.search(text)
+    return f"Out of office: {match.group(0)}" if match else None
+
+
+def is_bounce(headers, subject: str = '') -> bool:
+    """A delivery status notification: DSN headers, a mailer-daemon sender or a stock bounce subject."""
+    if 'report-type=delivery-status' in _header(headers, 'Content-Type').lower().replace(' ', ''):
+        return True
+    if _header(headers, 'X-Failed-Recipients') or BOUNCE_SENDER.search(_header(headers, 'From')):
+        return True
+    return bool(BOUNCE_SUBJECT.match(subject or ''))
+
+
+def is_auto_reply(headers) -> bool:
+    """RFC 3834 / vendor auto-responder headers."""
+    if AUTO_SUBMITTED.match(_header(headers, 'Auto-Submitted')):
+        return True
+    if any(_header(headers, name) for name in AUTO_REPLY_HEADERS):
+        return True
+    return _header(headers, 'Precedence').lower() == 'auto_reply'
+
+
+def pre_classify(text: str, subject: str = '', headers=None):
+    """Classify a reply locally when it is unambiguous. Returns a classify_reply-style dict, or None.
+
+    `headers` is anything with .get(name) (an email.message.Message or a dict).
+    """
+    text = (text or '').strip()
+
+    if is_bounce(headers, subject):
+        return _result('bounced', 0.95, 'Delivery failure notice')
+    if LEFT.search(text):
+        return None
+    if is_auto_reply(headers):
+        return _result('out_of_office', 0.99, 'Auto-reply (headers)', _return_note(text))
+    if OOO_SUBJECT.match(subject or ''):
+        return _result('out_of_office', 0.95, 'Auto-reply (subject)', _return_note(text))
+
+    engaged = ENGAGED.search(text)
+    if (not engaged and not REFERRAL.search(text) and len(text) <= MAX_UNSUBSCRIBE_CHARS
+            and UNSUBSCRIBE.search(text)):
+        return _result('unsubscribe', 0.95, 'Asked to be removed')
+    if not engaged and len(text) <= MAX_OOO_CHARS and OOO_BODY.search(text):
+        return _result('out_of_office', 0.9, 'Out-of-office reply', _return_note(text))
+    return None
@@ -0,0 +1,28 @@
+-- Natural keys for bulk upserts from the distribution engine
+
+-- Merge duplicates left behind by the old select-then-insert path.
+-- The oldest row wins; children are repointed before the rest are deleted.
+create temporary table building_dupes on commit drop as
+select id, keep_id from (
+  select id, first_value(id) over (partition by name, city order by created_at, id) as keep_id
+  from buildings
+) ranked
+where id <> keep_id;
+
+update contacts c set building_id = d.keep_id from building_dupes d where c.building_id = d.id;
+update outreach_emails e set building_id = d.keep_id from building_dupes d where e.building_id = d.id;
+delete from buildings b using building_dupes d where b.id = d.id;
+
+create temporary table contact_dupes on commit drop as
+select id, keep_id from (
+  select id, first_value(id) over (partition by email order by created_at, id) as keep_id
+  from contacts
+  where email is not null
+) ranked
+where id <> keep_id;
+
+update outreach_emails e set contact_id = d.keep_id from contact_dupes d where e.contact_id = d.id;
+delete from contacts c using contact_dupes d where c.id = d.id;
+
+create unique index if not exists uq_buildings_name_city on buildings (name, city);
+create unique index if not exists uq_contacts_email on contacts (email);
@@ -0,0 +1,69 @@
+-- Follow-ups due, computed in one set-based query instead of one history
+-- lookup per emailed contact.
+--
+-- delays maps the next sequence number to its delay in days, e.g. {"2": 4, "3": 7}
+-- (built from distribution/templates/emails.py so the templates stay the source of truth).
+-- Results are ordered by (due_at, contact_id); pass the last pair seen as
+-- after_due / after_contact to read the next page (keyset pagination).
+
+create index if not exists idx_outreach_contact_sequence on outreach_emails (contact_id, sequence_number);
+
+create or replace function followups_due(
+  delays jsonb,
+  as_of timestamptz default now(),
+  after_due timestamptz default null,
+  after_contact uuid default null,
+  page_size integer default 500
+)
+returns table (
+  contact_id uuid,
+  contact jsonb,
+  building jsonb,
+  latest_sequence integer,
+  sent_at timestamptz,
+  next_sequence integer,
+  due_at timestamptz
+)
+language sql stable
+as $$
+  with latest as (
+    select distinct on (e.contact_id) e.contact_id, e.sequence_number, e.sent_at
+    from outreach_emails e
+    join contacts c on c.id = e.contact_id
+    where c.status = 'emailed'
+      and e.status = 'sent'
+      and e.sent_at is not null
+    order by e.contact_id, e.sequence_number desc, e.sent_at desc
+  ),
+  scheduled as (
+    select l.*,
+           l.sequence_number + 1 as next_sequence,
+           l.sent_at + make_interval(days => (delays ->> (l.sequence_number + 1)::text)::int) as due_at
+    from latest l
+    where delays ? (l.sequence_number + 1)::text
+  )
+  select s.contact_id,
+         to_jsonb(c) as contact,
+         to_jsonb(b) as building,
+         s.sequence_number as latest_sequence,
+         s.sent_at,
+         s.next_sequence,
+         s.due_at
+  from scheduled s
+  join contacts c on c.id = s.contact_id
+  left join buildings b on b.id = c.building_id
+  where s.due_at <= as_of
+    and (after_due is null or (s.due_at, s.contact_id) > (after_due, after_contact))
+    -- anyone who replied to anything is out of the sequence
+    and not exists (
+      select 1 from outreach_emails r
+      where r.contact_id = s.contact_id and r.status = 'replied'
+    )
+    -- the next step was already drafted / queued
+    and not exists (
+      select 1 from outreach_emails n
+      where n.contact_id = s.contact_id and n.sequence_number = s.next_sequence
+    )
+  order by s.due_at, s.contact_id
+  limit page_size
+$$;
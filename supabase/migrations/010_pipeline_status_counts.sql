@@ -0,0 +1,8 @@
+-- Funnel counts for `run.py status` in one grouped query instead of one
+-- count request per status value.
+create or replace view pipeline_status_counts as
+  select 'buildings'::text as entity, status, count(*)::integer as count from buildings group by status
+  union all
+  select 'contacts'::text, status, count(*)::integer from contacts group by status
+  union all
+  select 'outreach_emails'::text, status, count(*)::integer from outreach_emails group by status;
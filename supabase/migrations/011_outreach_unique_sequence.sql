@@ -0,0 +1,21 @@
+-- One outreach email per contact per sequence step, so concurrent writers
+-- (or a batch write landing after a live one) can't create duplicate drafts.
+
+-- Drop existing duplicates. The row furthest along wins (anything already
+-- sent over a draft), then the oldest.
+create temporary table outreach_dupes on commit drop as
+select id from (
+  select id, row_number() over (
+    partition by contact_id, sequence_number
+    order by (status in ('draft', 'queued')), created_at, id
+  ) as rank
+  from outreach_emails
+  where contact_id is not null
+) ranked
+where rank > 1;
+
+delete from outreach_emails e using outreach_dupes d where e.id = d.id;
+
+-- Replaces the plain index from 009 on the same columns
+create unique index if not exists uq_outreach_contact_sequence on outreach_emails (contact_id, sequence_number);
+drop index if exists idx_outreach_contact_sequence;
@@ -0,0 +1,7 @@
+-- Our own Message-ID for every outreach email, sent as a header so replies
+-- (In-Reply-To / References) thread straight back to the row they answer.
+-- The volatile default gives existing rows distinct ids too.
+alter table outreach_emails
+  add column if not exists message_id text default ('<' || gen_random_uuid() || '@leaseflex.io>');
+
+create unique index if not exists uq_outreach_message_id on outreach_emails (message_id);
@@ -0,0 +1,39 @@
+-- When each contact's next follow-up is due, so the follow-up daemon can
+-- sleep until the earliest one instead of rescanning on a fixed interval.
+--
+-- Maintained by the app: set from the delay of the next sequence step when an
+-- email is sent, cleared when a reply stops the sequence. refresh_next_actions
+-- recomputes it for everyone from followups_due (the daemon calls it on start,
+-- which also backfills existing rows).
+
+alter table contacts add column if not exists next_action_at timestamptz;
+
+create index if not exists idx_contacts_next_action on contacts (next_action_at)
+  where next_action_at is not null;
+
+create or replace function refresh_next_actions(delays jsonb)
+returns integer
+language plpgsql
+as $$
+declare
+  scheduled integer;
+begin
+  create temporary table due on commit drop as
+    select contact_id, due_at
+    from followups_due(delays, 'infinity'::timestamptz, null, null, 2147483647);
+
+  update contacts c
+  set next_action_at = null
+  where c.next_action_at is not null
+    and not exists (select 1 from due d where d.contact_id = c.id);
+
+  update contacts c
+  set next_action_at = d.due_at
+  from due d
+  where c.id = d.contact_id
+    and c.next_action_at is distinct from d.due_at;
+
+  select count(*) into scheduled from due;
+  return scheduled;
+end
+$$;
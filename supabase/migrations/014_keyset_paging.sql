@@ -0,0 +1,17 @@
+-- Keyset paging for the iter_* generators in distribution/utils/db.py:
+-- pages are read in (created_at, id) order, filtered by status, so each page
+-- is an index range scan instead of an ever-deeper offset.
+--
+-- created_at defaulted to now() but was nullable; a null would drop a row out
+-- of the keyset order, so backfill and enforce it.
+
+update buildings set created_at = now() where created_at is null;
+alter table buildings alter column created_at set not null;
+update contacts set created_at = now() where created_at is null;
+alter table contacts alter column created_at set not null;
+update outreach_emails set created_at = now() where created_at is null;
+alter table outreach_emails alter column created_at set not null;
+
+create index if not exists idx_buildings_status_created on buildings (status, created_at, id);
+create index if not exists idx_contacts_status_created on contacts (status, created_at, id);
+create index if not exists idx_outreach_status_created on outreach_emails (status, created_at, id);
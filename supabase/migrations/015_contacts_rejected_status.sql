@@ -0,0 +1,6 @@
+-- Reply classification marks contacts who declined, or who said they're the
+-- wrong person, as 'rejected' (buildings already have that status). The
+-- original check on contacts.status didn't allow it, so those writes failed.
+alter table contacts drop constraint if exists contacts_status_check;
+alter table contacts add constraint contacts_status_check
+  check (status in ('new', 'emailed', 'replied', 'meeting', 'closed', 'unsubscribed', 'rejected'));